@@ -9,3 +9,7 @@ class AcademicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.academic'
     verbose_name = 'Academic'
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        from . import signals  # noqa: F401
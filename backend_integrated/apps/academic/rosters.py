@@ -0,0 +1,86 @@
+"""
+Subject Rosters
+Sets of enrolled student ids: read from the database for writes, cached for pre-checks
+
+The cache is only as shared as the configured backend. With the default
+LocMemCache every worker process has its own copy and an enrollment
+change (see signals.py) only bumps the roster version in the process
+that handled it, so other workers keep their roster until it expires.
+Cached rosters are therefore kept at most LOCAL_ROSTER_TTL seconds on a
+process-local cache, and anything that writes attendance uses
+load_roster or is_enrolled, which always read the database.
+"""
+
+import time
+from typing import FrozenSet
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Subject
+
+
+# Seconds a cached roster is kept when the cache is per process
+LOCAL_ROSTER_TTL = 60
+
+
+def _version_key(subject_id) -> str:
+    return f'roster_version_{subject_id}'
+
+
+def roster_version(subject_id) -> int:
+    """Current roster version of a subject (a fresh one if the cache lost it)."""
+    version = cache.get(_version_key(subject_id))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(subject_id), version, None)
+        version = cache.get(_version_key(subject_id), version)
+    return version
+
+
+def load_roster(subject_id) -> FrozenSet[str]:
+    """Ids of the students enrolled in a subject, read from the database."""
+    return frozenset(
+        str(student_id) for student_id in Subject.enrolled_students.through.objects.filter(
+            subject_id=subject_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def _roster_ttl() -> int:
+    ttl = getattr(settings, 'ATTENDANCE_ROSTER_CACHE_TTL', 3600)
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        # Other workers never see this process's version bumps
+        return min(ttl, LOCAL_ROSTER_TTL)
+    return ttl
+
+
+def get_roster(subject_id) -> FrozenSet[str]:
+    """
+    Cached ids of the students enrolled in a subject, for pre-checks only.
+
+    Cached under the subject's roster version, so changing enrollments
+    (see signals.py) switches readers of a shared cache to a fresh key
+    instead of racing a delete. With a per-process cache the roster can
+    be up to LOCAL_ROSTER_TTL seconds old; use load_roster before writing.
+    """
+    key = f'roster_{subject_id}_{roster_version(subject_id)}'
+    roster = cache.get(key)
+    if roster is None:
+        roster = load_roster(subject_id)
+        cache.set(key, roster, _roster_ttl())
+    return roster
+
+
+def is_enrolled(subject_id, student_id) -> bool:
+    """Whether a student is enrolled in a subject, from the database (one indexed lookup)."""
+    return Subject.enrolled_students.through.objects.filter(
+        subject_id=subject_id, user_id=student_id
+    ).exists()
+
+
+def invalidate_roster(subject_id) -> None:
+    """Move a subject to a new roster version."""
+    cache.set(_version_key(subject_id), time.time_ns(), None)
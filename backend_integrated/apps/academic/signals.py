@@ -0,0 +1,30 @@
+"""
+Academic Signals
+Invalidate cached subject rosters when enrollments change
+"""
+
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from .models import Subject
+from .rosters import invalidate_roster
+
+
+@receiver(m2m_changed, sender=Subject.enrolled_students.through)
+def enrollments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_roster(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # user.enrolled_subjects.add(...) changes the rosters of the given subjects
+        for subject_id in pk_set:
+            invalidate_roster(subject_id)
+    elif action == 'pre_clear':
+        # user.enrolled_subjects.clear() doesn't pass the subjects, so read them first
+        for subject_id in instance.enrolled_subjects.values_list('id', flat=True):
+            invalidate_roster(subject_id)
+
+
+@receiver(post_delete, sender=Subject)
+def subject_deleted(sender, instance, **kwargs):
+    invalidate_roster(instance.pk)
@@ -5,6 +5,7 @@ Attendance Admin Configuration
 from django.contrib import admin
 from django import forms
 from .models import ClassSession, Attendance, AttendanceStatistics, AttendanceReport
+from .summaries import store_session_summary
 from apps.authentication.models import User
 from apps.academic.models import Subject
 
@@ -52,12 +53,12 @@ class ClassSessionAdmin(admin.ModelAdmin):
     list_display = ['subject', 'faculty', 'scheduled_date', 'start_time', 'status', 'present_count', 'attendance_percentage']
     list_filter = ['status', 'session_type', 'scheduled_date', 'subject__department']
     search_fields = ['subject__name', 'subject__code', 'faculty__email']
-    readonly_fields = ['id', 'actual_start_time', 'actual_end_time', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'timetable_entry', 'actual_start_time', 'actual_end_time', 'attendance_summary', 'created_at', 'updated_at']
     # date_hierarchy = 'scheduled_date'  # Disabled - djongo doesn't support datetime_trunc_sql()
     
     fieldsets = (
         ('Session Details', {
-            'fields': ('id', 'subject', 'faculty', 'session_type')
+            'fields': ('id', 'subject', 'faculty', 'session_type', 'timetable_entry')
         }),
         ('Schedule', {
             'fields': ('scheduled_date', 'start_time', 'end_time', 'location')
@@ -71,6 +72,10 @@ class ClassSessionAdmin(admin.ModelAdmin):
         ('Additional Info', {
             'fields': ('description',)
         }),
+        ('Attendance Summary', {
+            'fields': ('attendance_summary',),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -134,6 +139,18 @@ class AttendanceAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Corrections to a completed session refresh its stored summary
+        if obj.session.status == 'completed':
+            store_session_summary(obj.session)
+    
+    def delete_model(self, request, obj):
+        session = obj.session
+        super().delete_model(request, obj)
+        if session.status == 'completed':
+            store_session_summary(session)
 
 
 class AttendanceStatisticsAdminForm(forms.ModelForm):
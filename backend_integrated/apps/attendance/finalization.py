@@ -0,0 +1,134 @@
+"""
+Session Finalization
+Marks the absentees of an ended session in bulk, inline or on a background thread
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.academic.rosters import load_roster
+
+from .models import Attendance, ClassSession
+from .statistics import rebuild_statistics
+from .summaries import store_session_summary
+
+logger = logging.getLogger(__name__)
+
+
+def absent_student_ids(session: ClassSession) -> List[str]:
+    """Enrolled students (read from the database) without an attendance record."""
+    enrolled = load_roster(session.subject_id)
+    marked = set(str(student_id) for student_id in session.attendance_records.values_list('student_id', flat=True))
+    return sorted(enrolled - marked)
+
+
+def needs_finalization(session: ClassSession) -> bool:
+    """
+    True for a completed session whose finalization failed, or stopped
+    reporting progress for ATTENDANCE_FINALIZE_STALE_SECONDS while
+    'running' (its worker was restarted or killed).
+    """
+    if session.status != 'completed':
+        return False
+    if session.finalization_status == 'failed':
+        return True
+    if session.finalization_status != 'running':
+        return False
+    updated_at = parse_datetime((session.finalization_progress or {}).get('updated_at') or '')
+    stale_after = timedelta(seconds=getattr(settings, 'ATTENDANCE_FINALIZE_STALE_SECONDS', 600))
+    return updated_at is None or timezone.now() - updated_at > stale_after
+
+
+def _save_progress(session: ClassSession, status: str, progress: dict) -> None:
+    progress['updated_at'] = timezone.now().isoformat()
+    session.finalization_status = status
+    session.finalization_progress = progress
+    ClassSession.objects.filter(id=session.id).update(
+        finalization_status=status, finalization_progress=progress
+    )
+
+
+def finalize_session(session: ClassSession, student_ids: List[str], marked_by_id=None) -> dict:
+    """
+    Create absent records for ``student_ids``, refresh their statistics and
+    store the session's attendance summary.
+
+    Records are written with chunked bulk_create and progress is stored on
+    the session after every chunk, so a background run can be polled.
+    Students marked while finalization runs (or by an earlier, interrupted
+    run) are skipped, so finalizing a session again is safe.
+
+    Returns:
+        Final progress dict
+    """
+    chunk_size = getattr(settings, 'ATTENDANCE_FINALIZE_CHUNK_SIZE', 500)
+    progress = {
+        'absent_total': len(student_ids),
+        'absent_marked': 0,
+        'statistics_updated': 0,
+        'started_at': timezone.now().isoformat(),
+    }
+    _save_progress(session, 'running', progress)
+
+    try:
+        for start in range(0, len(student_ids), chunk_size):
+            chunk = student_ids[start:start + chunk_size]
+            marked = set(
+                str(student_id) for student_id in
+                Attendance.objects.filter(session=session, student_id__in=chunk).values_list('student_id', flat=True)
+            )
+            records = [
+                Attendance(
+                    session=session,
+                    student_id=student_id,
+                    status='absent',
+                    marking_method='auto',
+                    marked_by_id=marked_by_id
+                )
+                for student_id in chunk if str(student_id) not in marked
+            ]
+            try:
+                Attendance.objects.bulk_create(records)
+            except IntegrityError:
+                # A student was marked between the read and the insert; write the chunk row by row
+                for record in records:
+                    try:
+                        record.save(force_insert=True)
+                    except IntegrityError:
+                        pass
+            progress['absent_marked'] += len(chunk)
+            _save_progress(session, 'running', progress)
+
+        progress['statistics_updated'] = rebuild_statistics(session.subject_id, student_ids, chunk_size)
+        store_session_summary(session)
+        progress['finished_at'] = timezone.now().isoformat()
+        _save_progress(session, 'completed', progress)
+    except Exception as e:
+        logger.error(f"Finalization of session {session.id} failed: {e}", exc_info=True)
+        progress['error'] = str(e)
+        _save_progress(session, 'failed', progress)
+
+    return progress
+
+
+def start_finalization(session: ClassSession, student_ids: List[str], marked_by_id=None) -> threading.Thread:
+    """Run finalize_session on a daemon thread (the session shows 'running' until it ends)."""
+    session.finalization_status = 'running'
+    session.finalization_progress = {'absent_total': len(student_ids), 'absent_marked': 0, 'statistics_updated': 0}
+
+    def run():
+        try:
+            finalize_session(session, student_ids, marked_by_id)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name=f'session-finalize-{session.id}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,248 @@
+"""
+Kiosk Sync
+Verifies and commits bundles of face marks captured offline by classroom devices
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.academic.rosters import load_roster
+from apps.face_recognition.log_writer import enqueue_log
+from apps.face_recognition.models import FaceData, RecognitionLog
+from apps.face_recognition.runtime import get_face_engine
+
+from .models import Attendance, ClassSession
+from .statistics import rebuild_statistics
+from .summaries import store_session_summary
+
+logger = logging.getLogger(__name__)
+
+
+def verify_bundle(device_id: str, bundle: str, signature: str) -> bool:
+    """
+    Check a bundle's HMAC-SHA256 signature with the device's secret.
+
+    Devices sign the exact bundle string they send, so no canonical JSON
+    form is needed. Unknown devices never verify.
+    """
+    secret = getattr(settings, 'ATTENDANCE_KIOSK_SECRETS', {}).get(device_id)
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), bundle.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.lower())
+
+
+def _reject(row: Dict, error: str) -> Dict:
+    row.update(result='rejected', error=error)
+    return row
+
+
+def sync_marks(marks: List[Dict], device_id: str, synced_by, ip_address=None) -> List[Dict]:
+    """
+    Commit offline marks from one device bundle.
+
+    Sessions, rosters, existing attendance and face templates are loaded
+    once for the whole bundle; probes are verified with one engine per
+    embedding version. When a student has several captures for a session
+    the earliest one that verifies is kept and the rest are duplicates.
+    Accepted marks are bulk-inserted, absentees auto-marked while the
+    device was offline are corrected to present, and statistics and
+    session summaries are refreshed once per subject and session.
+
+    Args:
+        marks: [{'mark_id', 'session_id', 'student_id', 'captured_at', 'probe' (base64, optional)}]
+
+    Returns:
+        One {'mark_id', 'result', ...} per mark, where result is 'accepted',
+        'updated', 'duplicate' or 'rejected' (with 'error')
+    """
+    now = timezone.now()
+    max_age = timedelta(hours=getattr(settings, 'ATTENDANCE_KIOSK_MAX_AGE_HOURS', 72))
+    require_probe = getattr(settings, 'ATTENDANCE_KIOSK_REQUIRE_PROBE', True)
+
+    sessions = {
+        str(session.id): session
+        for session in ClassSession.objects.filter(
+            id__in=list(set(mark['session_id'] for mark in marks))
+        ).select_related('subject')
+    }
+    rosters = {
+        subject_id: load_roster(subject_id)
+        for subject_id in set(session.subject_id for session in sessions.values())
+    }
+    existing = {
+        (str(session_id), str(student_id)): (attendance_id, att_status, method)
+        for attendance_id, session_id, student_id, att_status, method in Attendance.objects.filter(
+            session_id__in=list(sessions), student_id__in=list(set(mark['student_id'] for mark in marks))
+        ).values_list('id', 'session_id', 'student_id', 'status', 'marking_method')
+    }
+
+    results = [
+        {'mark_id': mark['mark_id'], 'session_id': str(mark['session_id']), 'student_id': str(mark['student_id'])}
+        for mark in marks
+    ]
+
+    # Validate in capture order, grouping the captures of each student in a session
+    candidates = defaultdict(list)
+    for position in sorted(range(len(marks)), key=lambda position: marks[position]['captured_at']):
+        mark, row = marks[position], results[position]
+        session_id, student_id = row['session_id'], row['student_id']
+        session = sessions.get(session_id)
+
+        if session is None:
+            _reject(row, 'Session not found')
+        elif session.status == 'cancelled':
+            _reject(row, 'Session was cancelled')
+        elif mark['captured_at'] > now or now - mark['captured_at'] > max_age:
+            _reject(row, 'Capture time is outside the accepted range')
+        elif not session.can_mark_at(mark['captured_at']):
+            _reject(row, 'Captured outside the marking window')
+        elif student_id not in rosters[session.subject_id]:
+            _reject(row, 'Student is not enrolled in this subject')
+        elif not mark.get('probe') and require_probe:
+            _reject(row, 'Face probe is required')
+        else:
+            record = existing.get((session_id, student_id))
+            if record and not (record[1] == 'absent' and record[2] == 'auto'):
+                row.update(result='duplicate', attendance_id=str(record[0]))
+            else:
+                candidates[(session_id, student_id)].append((row, mark, session))
+
+    # Verify in rounds: the earliest capture per student and session first, a later
+    # one only where the earlier failed. The earliest accepted capture wins.
+    accepted = []
+    while candidates:
+        current = [pending.pop(0) for pending in candidates.values()]
+        _verify_probes(current, device_id, ip_address)
+        for row, mark, session in current:
+            key = (row['session_id'], row['student_id'])
+            if row.get('result') != 'rejected':
+                accepted.append((row, mark, session))
+                for duplicate, _, _ in candidates.pop(key):
+                    duplicate['result'] = 'duplicate'
+            elif not candidates[key]:
+                del candidates[key]
+
+    to_create = []
+    to_correct = []
+    logs = []
+    for row, mark, session in accepted:
+        record = existing.get((row['session_id'], row['student_id']))
+        log = row.pop('log', None)
+        if log is not None:
+            logs.append(log)
+        fields = {
+            'status': 'present',
+            'marking_method': 'face' if log is not None else 'manual',
+            'marked_at': mark['captured_at'],
+            'marked_by': synced_by,
+            'recognition_confidence': row.get('confidence'),
+            'recognition_log_id': log.id if log is not None else None,
+            'ip_address': ip_address,
+            'location_verified': log is not None,
+            'remarks': f"Kiosk {device_id}, offline mark {mark['mark_id']}",
+        }
+        if record:
+            to_correct.append((record[0], fields))
+            row.update(result='updated', attendance_id=str(record[0]))
+        else:
+            attendance = Attendance(session_id=session.id, student_id=row['student_id'], **fields)
+            to_create.append(attendance)
+            row.update(result='accepted', attendance_id=str(attendance.id))
+
+    with transaction.atomic():
+        if to_create:
+            Attendance.objects.bulk_create(to_create)
+        for attendance_id, fields in to_correct:
+            Attendance.objects.filter(id=attendance_id).update(updated_at=now, **fields)
+
+    for log in logs:
+        enqueue_log(log, required=True)
+
+    # Statistics once per subject, summaries once per completed session
+    affected = defaultdict(set)
+    touched_sessions = {}
+    for row, _, session in accepted:
+        if row['result'] in ('accepted', 'updated'):
+            affected[session.subject_id].add(row['student_id'])
+            touched_sessions[session.id] = session
+    for subject_id, student_ids in affected.items():
+        rebuild_statistics(subject_id, student_ids)
+    for session in touched_sessions.values():
+        if session.status == 'completed':
+            store_session_summary(session)
+
+    logger.info(
+        f"Kiosk {device_id} synced {len(marks)} marks: "
+        f"{len(to_create)} accepted, {len(to_correct)} corrected, "
+        f"{sum(1 for row in results if row['result'] == 'rejected')} rejected"
+    )
+    return results
+
+
+def _verify_probes(candidates: List, device_id: str, ip_address=None) -> None:
+    """
+    Recognize each candidate's probe against the student's enrolled face.
+
+    Face data for every student is read in one query and each embedding
+    version's engine is fetched once. Verified rows get 'confidence' and
+    an unsaved success 'log'; failures are rejected and logged.
+    """
+    with_probe = [(row, mark, session) for row, mark, session in candidates if mark.get('probe')]
+    if not with_probe:
+        return
+
+    face_data = {
+        str(data.user_id): data
+        for data in FaceData.objects.filter(
+            user_id__in=list(set(row['student_id'] for row, _, _ in with_probe)), is_complete=True
+        ).select_related('user')
+    }
+
+    by_version = defaultdict(list)
+    for row, mark, session in with_probe:
+        data = face_data.get(row['student_id'])
+        if data is None:
+            _reject(row, 'Face not enrolled')
+            continue
+        try:
+            image_data = base64.b64decode(mark['probe'], validate=True)
+        except (binascii.Error, ValueError):
+            _reject(row, 'Probe is not valid base64')
+            continue
+        by_version[data.embedding_version or None].append((row, session, data, image_data))
+
+    for version, items in by_version.items():
+        face_engine = get_face_engine(version)
+        for row, session, data, image_data in items:
+            result = face_engine.recognize_face(image_data, {
+                'insightface': data.insightface_embedding,
+                'deepface': data.deepface_embedding,
+                'dlib': data.dlib_embedding
+            })
+            log = RecognitionLog(
+                recognized_user=data.user if result.get('recognized') else None,
+                status='success' if result.get('recognized') else 'low_confidence',
+                confidence_score=result.get('confidence', 0),
+                insightface_result=result.get('similarities'),
+                ip_address=ip_address,
+                user_agent=f'kiosk:{device_id}',
+                department_id=data.user.department_id,
+                session=session,
+                subject_id=session.subject_id
+            )
+            if result.get('recognized'):
+                row.update(confidence=result['confidence'], log=log)
+            else:
+                enqueue_log(log)
+                _reject(row, result.get('error') or 'Face did not match the enrolled student')
@@ -0,0 +1,65 @@
+"""
+Create scheduled ClassSessions from active Timetable entries.
+
+Each entry gets a session on its weekday for every date of the window
+inside its valid_from/valid_until range, except dates covered by a
+global holiday or one of the subject's department. Sessions that already
+exist (from an earlier run or created by hand) are left alone, so the
+job can run daily over a rolling window.
+
+Usage (e.g. nightly from cron):
+    python manage.py generate_class_sessions
+    python manage.py generate_class_sessions --days 28
+    python manage.py generate_class_sessions --from 2026-08-01 --to 2026-12-15 --department CSE --dry-run
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.academic.models import Subject
+from apps.attendance.scheduling import generate_sessions
+
+
+class Command(BaseCommand):
+    help = 'Generate class sessions from the timetable for a date window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--to', dest='end', help='Last date (YYYY-MM-DD), defaults to --days after the first')
+        parser.add_argument('--days', type=int, default=14, help='Window length when --to is not given')
+        parser.add_argument('--department', help='Only subjects of this department code')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Sessions per bulk insert')
+        parser.add_argument('--dry-run', action='store_true', help='Count sessions without creating them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        start = self._date(options['start']) if options['start'] else timezone.localdate()
+        end = self._date(options['end']) if options['end'] else start + timedelta(days=options['days'] - 1)
+        if end < start:
+            raise CommandError('--to must not be before --from')
+
+        subject_ids = None
+        if options['department']:
+            subject_ids = list(
+                Subject.objects.filter(department__code=options['department']).values_list('id', flat=True)
+            )
+
+        result = generate_sessions(start, end, subject_ids, options['batch_size'], options['dry_run'])
+
+        verb = 'would be' if options['dry_run'] else 'were'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} sessions {verb} created for {start}..{end} from {result['entries']} "
+            f"timetable entries ({result['existing']} already existed, {result['holidays']} on holidays) "
+            f"[{elapsed:.1f}s]"
+        ))
+
+    def _date(self, value):
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date: {value}')
+        return parsed
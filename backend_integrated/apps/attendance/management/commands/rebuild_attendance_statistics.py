@@ -0,0 +1,88 @@
+"""
+Rebuild AttendanceStatistics for many subjects from one aggregation.
+
+Counts, percentages and streaks for every (subject, student) pair in
+scope come from a single grouped pipeline over class_sessions joined to
+attendance, and are upserted in bulk batches. Without a scope every
+subject is rebuilt.
+
+Usage (e.g. nightly from cron):
+    python manage.py rebuild_attendance_statistics
+    python manage.py rebuild_attendance_statistics --department CSE --semester 5
+    python manage.py rebuild_attendance_statistics --subject CS501
+    python manage.py rebuild_attendance_statistics --since 2026-10-01 --until 2026-10-31 --dry-run
+"""
+
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from apps.academic.models import Subject
+from apps.attendance.models import ClassSession
+from apps.attendance.statistics import bulk_rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = 'Bulk-rebuild attendance statistics for a department, subject or date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', help='Department code or id')
+        parser.add_argument('--subject', help='Subject code or id')
+        parser.add_argument('--semester', type=int, help='Only subjects of this semester')
+        parser.add_argument('--since', help='Only subjects with sessions on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only subjects with sessions on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk upsert')
+        parser.add_argument('--dry-run', action='store_true', help='Aggregate without writing')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        subjects = Subject.objects.all()
+
+        if options['department']:
+            subjects = subjects.filter(self._code_or_id('department', options['department']))
+        if options['subject']:
+            subjects = subjects.filter(self._code_or_id('', options['subject']))
+        if options['semester']:
+            subjects = subjects.filter(semester=options['semester'])
+
+        if options['since'] or options['until']:
+            # Statistics cover a subject's whole history, so the range only selects subjects
+            sessions = ClassSession.objects.all()
+            if options['since']:
+                sessions = sessions.filter(scheduled_date__gte=self._date(options['since']))
+            if options['until']:
+                sessions = sessions.filter(scheduled_date__lte=self._date(options['until']))
+            subject_ids = set(sessions.values_list('subject_id', flat=True))
+            subjects = subjects.filter(id__in=list(subject_ids))
+
+        subject_ids = list(subjects.values_list('id', flat=True))
+        if not subject_ids:
+            self.stdout.write('No subjects in scope')
+            return
+
+        result = bulk_rebuild_statistics(subject_ids, options['batch_size'], options['dry_run'])
+
+        verb = 'would be' if options['dry_run'] else 'were'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['written']} statistics rows {verb} rebuilt across {len(subject_ids)} subjects, "
+            f"{result['below_threshold']} below threshold [{elapsed:.1f}s]"
+        ))
+
+    def _code_or_id(self, relation, value):
+        prefix = f'{relation}__' if relation else ''
+        lookup = Q(**{f'{prefix}code': value})
+        try:
+            lookup |= Q(**{f'{prefix}id': Subject._meta.pk.to_python(value)})
+        except ValidationError:
+            pass
+        return lookup
+
+    def _date(self, value):
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date: {value}')
+        return parsed
@@ -0,0 +1,54 @@
+"""
+Finish finalization of ended sessions whose run failed or stalled.
+
+A session's absentees are marked when it ends, inline or on a background
+thread. A run that failed, or that was left 'running' by a restarted
+worker (no progress for ATTENDANCE_FINALIZE_STALE_SECONDS), is finalized
+again here; students marked in the meantime are skipped.
+
+Usage (e.g. every few minutes from cron):
+    python manage.py resume_session_finalization
+    python manage.py resume_session_finalization --dry-run
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.attendance.finalization import absent_student_ids, finalize_session, needs_finalization
+from apps.attendance.models import ClassSession
+
+
+class Command(BaseCommand):
+    help = 'Resume absentee finalization of completed sessions that failed or stalled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List sessions without finalizing them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sessions = ClassSession.objects.filter(
+            status='completed', finalization_status__in=['failed', 'running']
+        ).select_related('subject')
+
+        resumed = 0
+        failed = 0
+        for session in sessions:
+            if not needs_finalization(session):
+                continue
+            absent_ids = absent_student_ids(session)
+            self.stdout.write(
+                f"{session.subject.code} {session.scheduled_date}: {session.finalization_status}, "
+                f"{len(absent_ids)} absentees left"
+            )
+            if options['dry_run']:
+                continue
+            progress = finalize_session(session, absent_ids, session.faculty_id)
+            if 'error' in progress:
+                failed += 1
+            else:
+                resumed += 1
+
+        elapsed = time.perf_counter() - started
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"{resumed} sessions finalized, {failed} failed again [{elapsed:.1f}s]"))
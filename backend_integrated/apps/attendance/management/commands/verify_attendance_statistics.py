@@ -0,0 +1,56 @@
+"""
+Compare incrementally maintained AttendanceStatistics with a full recompute.
+
+Marks update statistics with counter increments; corrections to past
+sessions leave the streaks flagged stale. This command recomputes each
+subject from its attendance records, reports the rows that drifted (and
+which fields), and with --fix rewrites them.
+
+Usage (e.g. nightly from cron):
+    python manage.py verify_attendance_statistics
+    python manage.py verify_attendance_statistics --stale-only --fix
+    python manage.py verify_attendance_statistics --subject <uuid>
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.academic.models import Subject
+from apps.attendance.statistics import rebuild_statistics, verify_statistics
+
+
+class Command(BaseCommand):
+    help = 'Verify (and optionally repair) attendance statistics against a full recompute'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Only check this subject id')
+        parser.add_argument('--stale-only', action='store_true', help='Only check rows with stale streaks')
+        parser.add_argument('--fix', action='store_true', help='Rewrite rows that drifted')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        subjects = Subject.objects.all()
+        if options['subject']:
+            subjects = subjects.filter(id=options['subject'])
+
+        checked = 0
+        drifted = 0
+        fixed = 0
+        for subject_id, code in subjects.values_list('id', 'code'):
+            result = verify_statistics(subject_id, stale_only=options['stale_only'])
+            checked += result['checked']
+            if not result['drifted']:
+                continue
+
+            drifted += len(result['drifted'])
+            fields = ', '.join(f'{field}={count}' for field, count in sorted(result['fields'].items()))
+            self.stdout.write(f"{code}: {len(result['drifted'])} rows drifted ({fields or 'stale streaks only'})")
+            if options['fix']:
+                fixed += rebuild_statistics(subject_id, result['drifted'])
+
+        elapsed = time.perf_counter() - started
+        style = self.style.SUCCESS if not drifted or fixed else self.style.WARNING
+        self.stdout.write(style(
+            f"{checked} statistics rows checked, {drifted} drifted, {fixed} rewritten [{elapsed:.1f}s]"
+        ))
@@ -0,0 +1,248 @@
+"""
+Attendance Mark Queue
+Persists face-recognized attendance marks off the request path, keyed for idempotent retries
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from apps.face_recognition.log_writer import enqueue_log
+
+from .models import Attendance
+from .statistics import apply_attendance_change
+from .summaries import refresh_session_summary
+
+logger = logging.getLogger(__name__)
+
+
+def mark_key(session_id, student_id, nonce: str = '') -> str:
+    """Idempotency key of a mark: the same (session, student, client nonce) is only written once."""
+    return f'{session_id}:{student_id}:{nonce}'
+
+
+def _status_cache_key(key: str) -> str:
+    # Nonces come from clients, so hash them into a cache-safe key
+    return 'attendance_mark_' + hashlib.sha1(key.encode()).hexdigest()
+
+
+def _set_status(key: str, mark_status: Dict) -> None:
+    cache.set(_status_cache_key(key), mark_status, getattr(settings, 'ATTENDANCE_MARK_STATUS_TTL', 3600))
+
+
+def _queued_status() -> Dict:
+    return {'status': 'queued', 'queued_at': time.time()}
+
+
+def _status_from_record(key: str) -> Optional[Dict]:
+    session_id, student_id, _ = key.split(':', 2)
+    attendance_id = Attendance.objects.filter(
+        session_id=session_id, student_id=student_id
+    ).values_list('id', flat=True).first()
+    if attendance_id is None:
+        return None
+    return {'status': 'persisted', 'attendance_id': str(attendance_id)}
+
+
+def get_mark_status(key: str, check_database: bool = True) -> Optional[Dict]:
+    """
+    Status of a mark: 'queued', 'persisted', 'duplicate' or 'failed'.
+
+    Statuses live in the cache; once they expire (or were set by another
+    worker with a per-process cache) the attendance record itself answers.
+    The queue is in memory, so a mark still 'queued' after
+    ATTENDANCE_MARK_QUEUED_DEADLINE seconds is checked against its record
+    and reported as failed (and can be submitted again) if it was lost.
+
+    Returns:
+        {'status', 'attendance_id' (once written), 'error' (on failure)} or None
+    """
+    mark_status = cache.get(_status_cache_key(key))
+    if mark_status is not None:
+        deadline = getattr(settings, 'ATTENDANCE_MARK_QUEUED_DEADLINE', 60)
+        if mark_status['status'] == 'queued' and time.time() - mark_status.get('queued_at', 0) > deadline:
+            # The worker holding the mark may have been restarted or killed
+            mark_status = _status_from_record(key) or {
+                'status': 'failed', 'error': 'The mark was not persisted in time, please retry'
+            }
+            _set_status(key, mark_status)
+        return mark_status
+
+    return _status_from_record(key) if check_database else None
+
+
+def persist_mark(mark: Dict) -> Dict:
+    """
+    Write one queued mark: the attendance record, statistics and recognition log.
+
+    A record that already exists for the session and student (an earlier
+    mark, or a retry that reached another worker) is reported as a
+    duplicate instead of being inserted again.
+    """
+    with transaction.atomic():
+        existing = Attendance.objects.filter(
+            session_id=mark['session_id'], student_id=mark['student_id']
+        ).values_list('id', flat=True).first()
+        if existing is not None:
+            return {'status': 'duplicate', 'attendance_id': str(existing)}
+
+        attendance = Attendance.objects.create(
+            session_id=mark['session_id'],
+            student_id=mark['student_id'],
+            status='present',
+            marking_method='face',
+            marked_at=mark['marked_at'],
+            recognition_confidence=mark['confidence'],
+            recognition_log_id=mark['log'].id,
+            ip_address=mark['ip_address'],
+            location_verified=True
+        )
+        apply_attendance_change(mark['student_id'], mark['subject_id'], None, 'present')
+
+    enqueue_log(mark['log'], required=True)
+    # A mark queued just before the session ended lands after its summary was stored
+    refresh_session_summary(mark['session_id'])
+    return {'status': 'persisted', 'attendance_id': str(attendance.id)}
+
+
+class AttendanceMarkQueue:
+    """
+    Per-process write-behind queue for attendance marks.
+
+    A daemon thread writes marks one at a time with persist_mark and
+    records each outcome under the mark's idempotency key. When the queue
+    is full the mark is written synchronously instead.
+
+    The queue is not durable: marks still queued when the worker dies are
+    lost. Their status turns 'failed' after ATTENDANCE_MARK_QUEUED_DEADLINE
+    (see get_mark_status) so clients retry instead of trusting the 202.
+    """
+
+    def __init__(self, max_queued: int = 5000):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.stats = {
+            'queued': 0,
+            'persisted': 0,
+            'duplicates': 0,
+            'retries': 0,
+            'sync_writes': 0,
+            'failed': 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='attendance-mark-queue', daemon=True)
+        self._thread.start()
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def submit(self, mark: Dict) -> Dict:
+        """
+        Queue a mark unless its idempotency key was seen already.
+
+        Args:
+            mark: {'key', 'session_id', 'subject_id', 'student_id', 'confidence',
+                   'marked_at', 'ip_address', 'log' (unsaved RecognitionLog)}
+
+        Returns:
+            The mark's status ('queued' for a new mark)
+        """
+        queued = _queued_status()
+        if not cache.add(_status_cache_key(mark['key']), queued, getattr(settings, 'ATTENDANCE_MARK_STATUS_TTL', 3600)):
+            mark_status = get_mark_status(mark['key'], check_database=False)
+            if mark_status and mark_status['status'] != 'failed':
+                self._count('retries')
+                return mark_status
+            # A failed mark is attempted again
+            _set_status(mark['key'], queued)
+
+        try:
+            self.queue.put_nowait(mark)
+        except queue.Full:
+            self._count('sync_writes')
+            return self._process(mark)
+        self._count('queued')
+        return queued
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued mark is written. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize()
+        stats['max_queued'] = self.queue.maxsize
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            mark = self.queue.get()
+            try:
+                close_old_connections()
+                self._process(mark)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, mark: Dict) -> Dict:
+        try:
+            mark_status = persist_mark(mark)
+            self._count('duplicates' if mark_status['status'] == 'duplicate' else 'persisted')
+        except Exception as e:
+            self._count('failed')
+            logger.error(f"Failed to persist attendance mark {mark['key']}: {e}", exc_info=True)
+            mark_status = {'status': 'failed', 'error': str(e)}
+        _set_status(mark['key'], mark_status)
+        return mark_status
+
+
+_mark_queue = None
+_mark_queue_pid = None
+_mark_queue_lock = threading.Lock()
+
+
+def get_mark_queue() -> AttendanceMarkQueue:
+    """Return this process's queue, recreated after a fork like the log writer."""
+    global _mark_queue, _mark_queue_pid
+
+    pid = os.getpid()
+    if _mark_queue is None or _mark_queue_pid != pid:
+        with _mark_queue_lock:
+            if _mark_queue is None or _mark_queue_pid != pid:
+                _mark_queue = AttendanceMarkQueue(
+                    max_queued=getattr(settings, 'ATTENDANCE_MARK_MAX_QUEUED', 5000)
+                )
+                _mark_queue_pid = pid
+    return _mark_queue
+
+
+def submit_mark(mark: Dict) -> Dict:
+    """Queue an attendance mark for write-behind persistence (see AttendanceMarkQueue.submit)."""
+    return get_mark_queue().submit(mark)
+
+
+def get_mark_queue_stats() -> Optional[Dict]:
+    """Queue counters for this process (None before the first mark)."""
+    if _mark_queue is None or _mark_queue_pid != os.getpid():
+        return None
+    return _mark_queue.get_stats()
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _mark_queue is not None and _mark_queue_pid == os.getpid():
+        _mark_queue.flush()
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsession',
+            name='finalization_status',
+            field=models.CharField(blank=True, choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='classsession',
+            name='finalization_progress',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
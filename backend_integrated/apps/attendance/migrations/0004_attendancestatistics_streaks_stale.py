@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_classsession_finalization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancestatistics',
+            name='streaks_stale',
+            field=models.BooleanField(default=False, help_text='Streaks need a full recompute (set by changes to past records)'),
+        ),
+    ]
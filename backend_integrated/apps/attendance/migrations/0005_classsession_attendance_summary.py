@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendancestatistics_streaks_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsession',
+            name='attendance_summary',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('attendance', '0005_classsession_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsession',
+            name='timetable_entry',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sessions', to='academic.timetable'),
+        ),
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['timetable_entry', 'scheduled_date'], name='class_sessi_timetab_bbd9ca_idx'),
+        ),
+    ]
@@ -30,12 +30,27 @@ class ClassSession(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
+    FINALIZATION_STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # Class details
     subject = models.ForeignKey('academic.Subject', on_delete=models.CASCADE, related_name='sessions', db_constraint=False)
     faculty = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='taught_sessions', db_constraint=False)
     session_type = models.CharField(max_length=20, choices=SESSION_TYPE_CHOICES, default='lecture')
+    # Timetable entry the session was generated from (see scheduling.py)
+    timetable_entry = models.ForeignKey(
+        'academic.Timetable',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sessions',
+        db_constraint=False
+    )
     
     # Timing
     scheduled_date = models.DateField()
@@ -47,6 +62,13 @@ class ClassSession(models.Model):
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     
+    # Absentee finalization when the session ends (see finalization.py)
+    finalization_status = models.CharField(max_length=20, choices=FINALIZATION_STATUS_CHOICES, blank=True, default='')
+    finalization_progress = models.JSONField(null=True, blank=True)
+    
+    # Counts frozen when the session ends (see summaries.py), refreshed on manual corrections
+    attendance_summary = models.JSONField(null=True, blank=True)
+    
     # Attendance settings
     attendance_window_minutes = models.IntegerField(default=15, help_text="Minutes after start time to mark attendance")
     allow_late_marking = models.BooleanField(default=True)
@@ -65,6 +87,7 @@ class ClassSession(models.Model):
         indexes = [
             models.Index(fields=['scheduled_date', 'start_time']),
             models.Index(fields=['status']),
+            models.Index(fields=['timetable_entry', 'scheduled_date']),
             # faculty and subject indexes automatically created by ForeignKeys
         ]
     
@@ -86,8 +109,10 @@ class ClassSession(models.Model):
         """Check if attendance can be marked now."""
         if self.status not in ['ongoing', 'scheduled']:
             return False
-        
-        now = timezone.now()
+        return self.can_mark_at(timezone.now())
+    
+    def can_mark_at(self, now):
+        """Check if a mark captured at ``now`` falls in the marking window (status aside)."""
         scheduled_datetime = timezone.make_aware(
             timezone.datetime.combine(self.scheduled_date, self.start_time)
         )
@@ -104,19 +129,34 @@ class ClassSession(models.Model):
         else:
             return scheduled_datetime <= now <= window_end
     
+    def _summary_count(self, key):
+        """Count from the stored summary (completed sessions only) or summaries.prefetch_session_counts, else None."""
+        summary = self.attendance_summary if self.status == 'completed' else None
+        counts = summary or getattr(self, '_session_counts', None)
+        return counts.get(key) if counts else None
+    
     @property
     def total_students(self):
         """Total students enrolled in the subject."""
+        count = self._summary_count('total_students')
+        if count is not None:
+            return count
         return self.subject.enrolled_students.count()
     
     @property
     def present_count(self):
         """Count of students marked present."""
+        count = self._summary_count('present')
+        if count is not None:
+            return count
         return self.attendance_records.filter(status='present').count()
     
     @property
     def absent_count(self):
         """Count of students marked absent."""
+        count = self._summary_count('absent')
+        if count is not None:
+            return count
         return self.attendance_records.filter(status='absent').count()
     
     @property
@@ -242,6 +282,10 @@ class AttendanceStatistics(models.Model):
     # Streak tracking
     current_streak = models.IntegerField(default=0, help_text="Current consecutive attendance streak")
     longest_streak = models.IntegerField(default=0, help_text="Longest consecutive attendance streak")
+    streaks_stale = models.BooleanField(
+        default=False,
+        help_text="Streaks need a full recompute (set by changes to past records)"
+    )
     
     # Status
     is_below_threshold = models.BooleanField(default=False, help_text="Below minimum attendance requirement")
@@ -288,35 +332,20 @@ class AttendanceStatistics(models.Model):
         
         # Calculate streaks
         self._calculate_streaks()
+        self.streaks_stale = False
         
         self.save()
     
     def _calculate_streaks(self):
-        """Calculate attendance streaks."""
-        records = Attendance.objects.filter(
+        """Calculate attendance streaks (rules in statistics.streaks)."""
+        from .statistics import streaks
+        
+        statuses = Attendance.objects.filter(
             student=self.student,
             session__subject=self.subject
-        ).order_by('-session__scheduled_date', '-session__start_time')
-        
-        current = 0
-        longest = 0
-        temp_streak = 0
-        
-        for record in records:
-            if record.status == 'present':
-                temp_streak += 1
-                if temp_streak > longest:
-                    longest = temp_streak
-            else:
-                if current == 0:
-                    current = temp_streak
-                temp_streak = 0
-        
-        if current == 0:
-            current = temp_streak
+        ).order_by('-session__scheduled_date', '-session__start_time').values_list('status', flat=True)
         
-        self.current_streak = current
-        self.longest_streak = longest
+        self.current_streak, self.longest_streak = streaks(list(statuses))
 
 
 class AttendanceReport(models.Model):
@@ -0,0 +1,105 @@
+"""
+Roll Call
+Manual marking of many students of one session with a fixed number of queries
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.academic.rosters import load_roster
+
+from .models import Attendance, ClassSession
+from .statistics import rebuild_statistics
+from .summaries import store_session_summary
+
+logger = logging.getLogger(__name__)
+
+
+def apply_roll_call(session: ClassSession, marks: List[Dict], marked_by, ip_address=None) -> List[Dict]:
+    """
+    Create or update attendance of several students of a session.
+
+    Students are checked against the enrolled roster, existing records are
+    read in one query, new ones are bulk-inserted and changed ones are
+    updated with one query per target status (djongo can't translate
+    bulk_update). Statistics of the affected students are then rebuilt
+    together, and a completed session's summary is refreshed.
+
+    Args:
+        marks: [{'student_id', 'status'}] in request order
+
+    Returns:
+        One {'student_id', 'status', 'result'} per mark, where result is
+        'created', 'updated', 'unchanged' or 'error' (with 'error' text)
+    """
+    roster = load_roster(session.subject_id)
+    results = []
+    wanted = {}
+    for mark in marks:
+        student_id = str(mark['student_id'])
+        row = {'student_id': student_id, 'status': mark['status']}
+        if student_id in wanted:
+            row.update(result='error', error='Student listed more than once')
+        elif student_id not in roster:
+            row.update(result='error', error='Student is not enrolled in this subject')
+        else:
+            wanted[student_id] = row
+        results.append(row)
+
+    existing = {
+        str(student_id): (attendance_id, att_status)
+        for attendance_id, student_id, att_status in Attendance.objects.filter(
+            session_id=session.id, student_id__in=list(wanted)
+        ).values_list('id', 'student_id', 'status')
+    }
+
+    now = timezone.now()
+    to_create = []
+    to_update = defaultdict(list)
+    for student_id, row in wanted.items():
+        if student_id not in existing:
+            to_create.append(Attendance(
+                session_id=session.id,
+                student_id=student_id,
+                status=row['status'],
+                marking_method='manual',
+                marked_at=now,
+                marked_by=marked_by,
+                ip_address=ip_address
+            ))
+            row['result'] = 'created'
+        elif existing[student_id][1] != row['status']:
+            to_update[row['status']].append(existing[student_id][0])
+            row['result'] = 'updated'
+        else:
+            row['result'] = 'unchanged'
+
+    with transaction.atomic():
+        if to_create:
+            Attendance.objects.bulk_create(to_create)
+        for att_status, attendance_ids in to_update.items():
+            Attendance.objects.filter(id__in=attendance_ids).update(
+                status=att_status,
+                marking_method='manual',
+                marked_at=now,
+                marked_by=marked_by,
+                ip_address=ip_address,
+                updated_at=now
+            )
+
+    changed = [student_id for student_id, row in wanted.items() if row['result'] != 'unchanged']
+    if changed:
+        rebuild_statistics(session.subject_id, changed)
+        if session.status == 'completed':
+            store_session_summary(session)
+
+    logger.info(
+        f"Roll call for session {session.id}: {len(to_create)} created, "
+        f"{sum(len(ids) for ids in to_update.values())} updated, "
+        f"{sum(1 for row in results if row['result'] == 'error')} rejected"
+    )
+    return results
@@ -0,0 +1,119 @@
+"""
+Session Scheduling
+Materializes ClassSession rows from the weekly Timetable, skipping holidays
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+
+from apps.academic.models import Holiday, Timetable
+
+from .models import ClassSession
+
+logger = logging.getLogger(__name__)
+
+
+# Timetable.day_of_week -> date.weekday()
+WEEKDAYS = {day: position for position, (day, _) in enumerate(Timetable.DAY_CHOICES)}
+
+
+def holiday_dates(start: date, end: date) -> Dict[Optional[str], set]:
+    """
+    Holiday dates in [start, end] from one query.
+
+    Returns:
+        {department_id or None (all departments): {date}}
+    """
+    dates = defaultdict(set)
+    for department_id, first, last in Holiday.objects.filter(
+        start_date__lte=end, end_date__gte=start
+    ).values_list('department_id', 'start_date', 'end_date'):
+        day = max(first, start)
+        while day <= min(last, end):
+            dates[str(department_id) if department_id else None].add(day)
+            day += timedelta(days=1)
+    return dates
+
+
+def generate_sessions(start: date, end: date, subject_ids: Optional[Iterable] = None,
+                      batch_size: int = 1000, dry_run: bool = False) -> Dict:
+    """
+    Create the scheduled sessions of active timetable entries for [start, end].
+
+    Timetable entries, holidays and the sessions already in the window are
+    each read once; new sessions are bulk-inserted. A date is skipped when
+    a session already exists for the same entry, or for the same subject
+    and start time (e.g. created by hand), so re-running over an
+    overlapping window creates nothing twice.
+
+    Returns:
+        {'created', 'existing', 'holidays', 'entries'}
+    """
+    entries = Timetable.objects.filter(
+        is_active=True, valid_from__lte=end, valid_until__gte=start
+    ).select_related('subject')
+    if subject_ids is not None:
+        entries = entries.filter(subject_id__in=list(subject_ids))
+    entries = list(entries)
+
+    result = {'created': 0, 'existing': 0, 'holidays': 0, 'entries': len(entries)}
+    if not entries:
+        return result
+
+    holidays = holiday_dates(start, end)
+    existing_entries = set()
+    existing_slots = set()
+    for entry_id, subject_id, scheduled_date, start_time in ClassSession.objects.filter(
+        scheduled_date__gte=start, scheduled_date__lte=end,
+        subject_id__in=list(set(entry.subject_id for entry in entries))
+    ).values_list('timetable_entry_id', 'subject_id', 'scheduled_date', 'start_time'):
+        if entry_id:
+            existing_entries.add((str(entry_id), scheduled_date))
+        existing_slots.add((str(subject_id), scheduled_date, start_time))
+
+    batch = []
+    for entry in entries:
+        department_holidays = holidays.get(str(entry.subject.department_id), set())
+        first = max(start, entry.valid_from)
+        day = first + timedelta(days=(WEEKDAYS[entry.day_of_week] - first.weekday()) % 7)
+        last = min(end, entry.valid_until)
+
+        while day <= last:
+            if day in holidays.get(None, ()) or day in department_holidays:
+                result['holidays'] += 1
+            elif (str(entry.id), day) in existing_entries or \
+                    (str(entry.subject_id), day, entry.start_time) in existing_slots:
+                result['existing'] += 1
+            else:
+                batch.append(ClassSession(
+                    subject_id=entry.subject_id,
+                    faculty_id=entry.faculty_id,
+                    session_type=entry.session_type,
+                    timetable_entry=entry,
+                    scheduled_date=day,
+                    start_time=entry.start_time,
+                    end_time=entry.end_time,
+                    location=' '.join(part for part in (entry.room_number, entry.building) if part)[:100]
+                ))
+                existing_slots.add((str(entry.subject_id), day, entry.start_time))
+            day += timedelta(days=7)
+
+        if len(batch) >= batch_size:
+            result['created'] += _write(batch, batch_size, dry_run)
+
+    result['created'] += _write(batch, batch_size, dry_run)
+    logger.info(
+        f"Generated {result['created']} sessions for {start}..{end} from {len(entries)} timetable entries "
+        f"({result['existing']} existed, {result['holidays']} on holidays)"
+    )
+    return result
+
+
+def _write(batch, batch_size: int, dry_run: bool) -> int:
+    count = len(batch)
+    if count and not dry_run:
+        ClassSession.objects.bulk_create(batch, batch_size=batch_size)
+    batch.clear()
+    return count
@@ -25,13 +25,17 @@ class ClassSessionSerializer(serializers.ModelSerializer):
         model = ClassSession
         fields = [
             'id', 'subject', 'subject_name', 'subject_code', 'faculty', 'faculty_name',
-            'session_type', 'scheduled_date', 'start_time', 'end_time',
+            'session_type', 'timetable_entry', 'scheduled_date', 'start_time', 'end_time',
             'actual_start_time', 'actual_end_time', 'status', 'status_display',
             'attendance_window_minutes', 'allow_late_marking', 'description',
             'location', 'is_ongoing', 'can_mark_attendance', 'present_count',
-            'absent_count', 'attendance_percentage', 'created_at', 'updated_at'
+            'absent_count', 'attendance_percentage', 'finalization_status',
+            'finalization_progress', 'attendance_summary', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'timetable_entry', 'actual_start_time', 'actual_end_time', 'finalization_status',
+            'finalization_progress', 'attendance_summary', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'actual_start_time', 'actual_end_time', 'created_at', 'updated_at']
     
     def get_faculty_name(self, obj):
         return f"{obj.faculty.first_name} {obj.faculty.last_name}".strip() or obj.faculty.email
@@ -73,16 +77,60 @@ class MarkAttendanceSerializer(serializers.Serializer):
     
     session_id = serializers.UUIDField()
     image = serializers.ImageField()
+    # Client-generated per attempt; retries with the same nonce are written once (write-behind mode)
+    client_nonce = serializers.RegexField(r'^[A-Za-z0-9_-]{1,64}$', required=False)
     
-    def validate_session_id(self, value):
-        """Validate session exists and can mark attendance."""
+    def validate(self, attrs):
+        """Validate session exists and can mark attendance (the session is passed on as 'session')."""
         try:
-            session = ClassSession.objects.get(id=value)
-            if not session.can_mark_attendance:
-                raise serializers.ValidationError("Attendance marking window has closed for this session")
-            return value
+            session = ClassSession.objects.select_related('subject').get(id=attrs['session_id'])
         except ClassSession.DoesNotExist:
-            raise serializers.ValidationError("Session not found")
+            raise serializers.ValidationError({'session_id': "Session not found"})
+        if not session.can_mark_attendance:
+            raise serializers.ValidationError({'session_id': "Attendance marking window has closed for this session"})
+        attrs['session'] = session
+        return attrs
+
+
+class RollCallMarkSerializer(serializers.Serializer):
+    """One (student, status) pair of a roll call."""
+    
+    student_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+
+
+class RollCallSerializer(serializers.Serializer):
+    """Serializer for marking many students of a session manually."""
+    
+    session_id = serializers.UUIDField()
+    marks = RollCallMarkSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class KioskSyncSerializer(serializers.Serializer):
+    """Signed bundle of offline marks from a classroom device."""
+    
+    device_id = serializers.RegexField(r'^[A-Za-z0-9_-]{1,64}$')
+    # JSON string {"marks": [...]}, signed as sent
+    bundle = serializers.CharField(trim_whitespace=False)
+    signature = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+
+class KioskMarkSerializer(serializers.Serializer):
+    """One mark of a kiosk bundle."""
+    
+    mark_id = serializers.RegexField(r'^[A-Za-z0-9_-]{1,64}$')
+    session_id = serializers.UUIDField()
+    student_id = serializers.UUIDField()
+    captured_at = serializers.DateTimeField()
+    probe = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+
+
+class StreamFramesSerializer(serializers.Serializer):
+    """Serializer for a chunk of classroom camera frames."""
+    
+    frames = serializers.ListField(child=serializers.ImageField(), allow_empty=False)
+    stream_id = serializers.RegexField(r'^[A-Za-z0-9_-]{1,64}$', required=False)
+    reset = serializers.BooleanField(default=False)
 
 
 class AttendanceStatisticsSerializer(serializers.ModelSerializer):
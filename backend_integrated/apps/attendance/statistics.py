@@ -0,0 +1,340 @@
+"""
+Attendance Statistics
+Incremental AttendanceStatistics updates and bulk recomputes
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Attendance, AttendanceStatistics, ClassSession
+
+logger = logging.getLogger(__name__)
+
+
+def streaks(statuses: List[str]):
+    """
+    (current, longest) present streaks from statuses ordered newest first.
+
+    ``current`` is the run of present marks ending at the newest session,
+    so it is 0 when the newest mark is not present. This is the rule the
+    incremental update in apply_attendance_change follows; the original
+    AttendanceStatistics._calculate_streaks kept the newest earlier run
+    instead and now delegates here.
+    """
+    current = None
+    longest = 0
+    run = 0
+    for status in statuses:
+        if status == 'present':
+            run += 1
+            longest = max(longest, run)
+        else:
+            if current is None:
+                current = run
+            run = 0
+    if current is None:
+        current = run
+    return current, longest
+
+
+def _statistics_fields(statuses: List[str], threshold) -> Dict:
+    """Statistics fields from one student's statuses ordered newest first."""
+    total = len(statuses)
+    present = statuses.count('present')
+    percentage = (present / total) * 100 if total else 0
+    current, longest = streaks(statuses)
+    return {
+        'total_sessions': total,
+        'present_count': present,
+        'absent_count': statuses.count('absent'),
+        'late_count': statuses.count('late'),
+        'excused_count': statuses.count('excused'),
+        'attendance_percentage': percentage,
+        'is_below_threshold': percentage < threshold,
+        'current_streak': current,
+        'longest_streak': longest,
+    }
+
+
+def compute_statistics(subject_id, student_ids: Iterable) -> Dict[str, Dict]:
+    """
+    Statistics fields per student for one subject, from two queries.
+
+    Returns:
+        {student_id: {field: value}} for every requested student
+    """
+    student_ids = [str(student_id) for student_id in student_ids]
+    sessions = list(
+        ClassSession.objects.filter(subject_id=subject_id)
+        .order_by('-scheduled_date', '-start_time')
+        .values_list('id', flat=True)
+    )
+    session_order = {str(session_id): position for position, session_id in enumerate(sessions)}
+
+    records = defaultdict(list)
+    for student_id, session_id, status in Attendance.objects.filter(
+        session_id__in=sessions, student_id__in=student_ids
+    ).values_list('student_id', 'session_id', 'status'):
+        records[str(student_id)].append((session_order[str(session_id)], status))
+
+    threshold = getattr(settings, 'ATTENDANCE_THRESHOLD', 75)
+    return {
+        student_id: _statistics_fields([status for _, status in sorted(records[student_id])], threshold)
+        for student_id in student_ids
+    }
+
+
+def store_statistics(computed: Dict[Tuple[str, str], Dict], batch_size: int = 500) -> int:
+    """
+    Upsert computed statistics keyed by (subject_id, student_id).
+
+    Existing rows are updated in place, one UPDATE per row that changed
+    (djongo can't translate bulk_update's CASE expressions), so readers
+    never see a row missing; new rows are bulk-inserted.
+
+    Returns:
+        Number of statistics rows written
+    """
+    if not computed:
+        return 0
+
+    subject_ids = set(subject_id for subject_id, _ in computed)
+    student_ids = set(student_id for _, student_id in computed)
+    compared = list(next(iter(computed.values()))) + ['streaks_stale']
+    existing = {}
+    for row in AttendanceStatistics.objects.filter(
+        subject_id__in=list(subject_ids), student_id__in=list(student_ids)
+    ).values('id', 'subject_id', 'student_id', *compared):
+        key = (str(row['subject_id']), str(row['student_id']))
+        if key in computed:
+            existing[key] = row
+
+    now = timezone.now()
+    rows = []
+    updated = 0
+    for (subject_id, student_id), fields in computed.items():
+        current = existing.get((subject_id, student_id))
+        if current is None:
+            rows.append(AttendanceStatistics(student_id=student_id, subject_id=subject_id, **fields))
+            continue
+        fields = dict(fields, streaks_stale=False)
+        if any(current[field] != value for field, value in fields.items()):
+            AttendanceStatistics.objects.filter(id=current['id']).update(last_updated=now, **fields)
+            updated += 1
+
+    if rows:
+        AttendanceStatistics.objects.bulk_create(rows, batch_size=batch_size)
+
+    return updated + len(rows)
+
+
+def rebuild_statistics(subject_id, student_ids: Iterable, batch_size: int = 500) -> int:
+    """
+    Recompute and store statistics for students of one subject.
+
+    Returns:
+        Number of statistics rows written
+    """
+    computed = compute_statistics(subject_id, student_ids)
+    return store_statistics(
+        {(str(subject_id), student_id): fields for student_id, fields in computed.items()},
+        batch_size
+    )
+
+
+def aggregate_statuses(subject_ids: Iterable) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    (subject_id, student_id, statuses newest first) for every student with
+    attendance in the given subjects.
+
+    On MongoDB this is a single aggregation: class_sessions of the subjects
+    joined to their attendance records, sorted by session date and grouped
+    per (subject, student). Other backends fall back to compute-style
+    queries per subject.
+    """
+    subject_ids = list(subject_ids)
+    if not subject_ids:
+        return
+
+    if connection.vendor != 'djongo':
+        for subject_id in subject_ids:
+            sessions = list(
+                ClassSession.objects.filter(subject_id=subject_id)
+                .order_by('-scheduled_date', '-start_time')
+                .values_list('id', flat=True)
+            )
+            session_order = {session_id: position for position, session_id in enumerate(sessions)}
+            records = defaultdict(list)
+            for student_id, session_id, status in Attendance.objects.filter(
+                session_id__in=sessions
+            ).values_list('student_id', 'session_id', 'status'):
+                records[student_id].append((session_order[session_id], status))
+            for student_id, rows in records.items():
+                yield str(subject_id), str(student_id), [status for _, status in sorted(rows)]
+        return
+
+    # djongo's connection is the pymongo Database; ids are matched in their stored form
+    connection.ensure_connection()
+    subject_field = ClassSession._meta.get_field('subject')
+    pipeline = [
+        {'$match': {'subject_id': {'$in': [subject_field.get_db_prep_value(s, connection) for s in subject_ids]}}},
+        {'$lookup': {
+            'from': Attendance._meta.db_table,
+            'localField': 'id',
+            'foreignField': 'session_id',
+            'as': 'records',
+        }},
+        {'$unwind': '$records'},
+        {'$sort': {'subject_id': 1, 'records.student_id': 1, 'scheduled_date': -1, 'start_time': -1}},
+        {'$group': {
+            '_id': {'subject': '$subject_id', 'student': '$records.student_id'},
+            'statuses': {'$push': '$records.status'},
+        }},
+    ]
+    cursor = connection.connection[ClassSession._meta.db_table].aggregate(pipeline, allowDiskUse=True)
+    for row in cursor:
+        yield str(row['_id']['subject']), str(row['_id']['student']), row['statuses']
+
+
+def bulk_rebuild_statistics(subject_ids: Iterable, batch_size: int = 1000, dry_run: bool = False) -> Dict:
+    """
+    Rebuild every statistics row of the given subjects from one aggregation.
+
+    Results are upserted in batches of ``batch_size``. Existing rows for
+    students with no attendance left are reset to zero.
+
+    Returns:
+        {'written': rows upserted, 'below_threshold': rows under the threshold}
+    """
+    subject_ids = [str(subject_id) for subject_id in subject_ids]
+    threshold = getattr(settings, 'ATTENDANCE_THRESHOLD', 75)
+    pending = set(
+        (str(subject_id), str(student_id))
+        for subject_id, student_id in AttendanceStatistics.objects.filter(
+            subject_id__in=subject_ids
+        ).values_list('subject_id', 'student_id')
+    )
+    result = {'written': 0, 'below_threshold': 0}
+    batch = {}
+
+    def flush():
+        result['below_threshold'] += sum(1 for fields in batch.values() if fields['is_below_threshold'])
+        result['written'] += len(batch) if dry_run else store_statistics(batch, batch_size)
+        batch.clear()
+
+    for subject_id, student_id, statuses in aggregate_statuses(subject_ids):
+        pending.discard((subject_id, student_id))
+        batch[(subject_id, student_id)] = _statistics_fields(statuses, threshold)
+        if len(batch) >= batch_size:
+            flush()
+
+    for key in pending:
+        batch[key] = _statistics_fields([], threshold)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return result
+
+
+# Attendance status -> counter field
+COUNT_FIELDS = {
+    'present': 'present_count',
+    'absent': 'absent_count',
+    'late': 'late_count',
+    'excused': 'excused_count',
+}
+
+
+def apply_attendance_change(student_id, subject_id, old_status: Optional[str], new_status: str,
+                            latest: bool = True) -> None:
+    """
+    Apply one new mark or status change to a student's statistics.
+
+    Counters (and the current streak, for a new mark on the latest
+    session) move with atomic increments; the percentage, threshold flag
+    and longest streak are then derived from the incremented row. A change
+    to an earlier record can't be folded into the streaks, so they are
+    flagged ``streaks_stale`` for verify_attendance_statistics to repair.
+
+    Args:
+        old_status: Previous status, or None for a new record
+        new_status: Status now stored
+        latest: The record belongs to the student's most recent session
+    """
+    if old_status == new_status:
+        return
+
+    stats = AttendanceStatistics.objects.filter(student_id=student_id, subject_id=subject_id).first()
+    if stats is None:
+        # First statistics row for this student: build it from their history once
+        rebuild_statistics(subject_id, [student_id])
+        return
+
+    increments = {}
+    if old_status is None:
+        increments['total_sessions'] = F('total_sessions') + 1
+    elif old_status in COUNT_FIELDS:
+        increments[COUNT_FIELDS[old_status]] = F(COUNT_FIELDS[old_status]) - 1
+    if new_status in COUNT_FIELDS:
+        increments[COUNT_FIELDS[new_status]] = F(COUNT_FIELDS[new_status]) + 1
+
+    streak_exact = old_status is None and latest
+    if streak_exact:
+        increments['current_streak'] = F('current_streak') + 1 if new_status == 'present' else 0
+
+    AttendanceStatistics.objects.filter(id=stats.id).update(**increments)
+    stats.refresh_from_db(fields=['total_sessions', 'present_count', 'current_streak', 'longest_streak', 'streaks_stale'])
+
+    percentage = (stats.present_count / stats.total_sessions) * 100 if stats.total_sessions else 0
+    AttendanceStatistics.objects.filter(id=stats.id).update(
+        attendance_percentage=percentage,
+        is_below_threshold=percentage < getattr(settings, 'ATTENDANCE_THRESHOLD', 75),
+        longest_streak=max(stats.longest_streak, stats.current_streak),
+        streaks_stale=stats.streaks_stale or not streak_exact,
+        last_updated=timezone.now()
+    )
+
+
+# Fields compared by verify_statistics
+VERIFIED_FIELDS = [
+    'total_sessions', 'present_count', 'absent_count', 'late_count', 'excused_count',
+    'attendance_percentage', 'is_below_threshold', 'current_streak', 'longest_streak',
+]
+
+
+def verify_statistics(subject_id, stale_only: bool = False) -> Dict:
+    """
+    Compare stored statistics of one subject with a full recompute.
+
+    Returns:
+        {'checked', 'drifted': [student_id], 'fields': {field: rows drifted}}
+    """
+    stored = AttendanceStatistics.objects.filter(subject_id=subject_id)
+    if stale_only:
+        stored = stored.filter(streaks_stale=True)
+    stored = {str(row['student_id']): row for row in stored.values('student_id', 'streaks_stale', *VERIFIED_FIELDS)}
+
+    computed = compute_statistics(subject_id, stored)
+    drifted = []
+    fields = defaultdict(int)
+    for student_id, expected in computed.items():
+        row = stored[student_id]
+        changed = [
+            field for field in VERIFIED_FIELDS
+            if (abs(row[field] - expected[field]) > 1e-6 if field == 'attendance_percentage'
+                else row[field] != expected[field])
+        ]
+        for field in changed:
+            fields[field] += 1
+        if changed or row['streaks_stale']:
+            drifted.append(student_id)
+
+    return {'checked': len(computed), 'drifted': drifted, 'fields': dict(fields)}
+
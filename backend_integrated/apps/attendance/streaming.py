@@ -0,0 +1,150 @@
+"""
+Classroom Camera Streams
+Marks session attendance from streamed camera frames
+"""
+
+import logging
+import uuid
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.academic.rosters import get_roster, load_roster
+
+from .models import Attendance, ClassSession
+from .statistics import apply_attendance_change
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+class SessionFrameStream:
+    """
+    A camera stream attached to a ClassSession.
+
+    Tracker state lives in the cache between chunks (keyed by session and
+    stream id), so a camera can post frames in short multipart chunks.
+    With several web workers the cache must be shared (e.g. Redis) for
+    chunks to continue the same stream.
+    """
+
+    def __init__(self, session: ClassSession, stream_id: str = None, marked_by=None):
+        self.session = session
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.marked_by = marked_by
+        self.cache_key = f'face_stream:{session.id}:{self.stream_id}'
+
+    def process(self, frames: Iterable, ip_address: str = None) -> Dict:
+        """
+        Run frames through the recognizer and mark confirmed students present.
+
+        Args:
+            frames: BGR frames (numpy arrays) in capture order, see decode_frames
+            ip_address: Client address recorded on attendance and logs
+
+        Returns:
+            Dict with the stream id, newly marked students and stream stats
+        """
+        from apps.face_recognition.streaming import FrameStreamRecognizer
+
+        # The cached roster only narrows matching; mark_present checks enrollment in the database
+        roster = list(get_roster(self.session.subject_id))
+        recognizer = FrameStreamRecognizer(allowed_user_ids=roster, state=cache.get(self.cache_key))
+
+        # Mark each student as soon as their track is identified
+        marked = []
+        for frame in frames:
+            identities = recognizer.process_frame(frame)
+            if identities:
+                marked.extend(self.mark_present(identities, ip_address))
+
+        cache.set(self.cache_key, recognizer.to_dict(), getattr(settings, 'FACE_STREAM_STATE_TTL', 600))
+
+        return {
+            'stream_id': self.stream_id,
+            'marked': marked,
+            'identified': len(recognizer.confirmed),
+            'active_tracks': len(recognizer.tracker.tracks),
+            'stats': recognizer.stats,
+        }
+
+    def reset(self) -> None:
+        cache.delete(self.cache_key)
+
+    def mark_present(self, identities: List[Dict], ip_address: str = None) -> List[Dict]:
+        """Create attendance for identities not yet marked in this session."""
+        from apps.face_recognition.log_writer import enqueue_log
+        from apps.face_recognition.models import RecognitionLog
+
+        if not identities:
+            return []
+
+        already_marked = set(
+            str(student_id) for student_id in
+            Attendance.objects.filter(
+                session=self.session,
+                student_id__in=[identity['user_id'] for identity in identities]
+            ).values_list('student_id', flat=True)
+        )
+
+        enrolled = load_roster(self.session.subject_id)
+
+        departments = dict(
+            (str(user_id), department_id) for user_id, department_id in
+            User.objects.filter(
+                id__in=[identity['user_id'] for identity in identities]
+            ).values_list('id', 'department_id')
+        )
+
+        marked = []
+        for identity in identities:
+            if identity['user_id'] in already_marked or identity['user_id'] not in enrolled:
+                continue
+
+            log = RecognitionLog(
+                recognized_user_id=identity['user_id'],
+                status='success',
+                confidence_score=identity['confidence'],
+                insightface_result=identity['similarities'],
+                ip_address=ip_address,
+                user_agent=f'camera-stream:{self.stream_id}',
+                department_id=departments.get(identity['user_id']),
+                session=self.session,
+                subject_id=self.session.subject_id
+            )
+            try:
+                with transaction.atomic():
+                    attendance = Attendance.objects.create(
+                        session=self.session,
+                        student_id=identity['user_id'],
+                        status='present',
+                        marking_method='face',
+                        marked_at=timezone.now(),
+                        marked_by=self.marked_by,
+                        recognition_confidence=identity['confidence'],
+                        recognition_log_id=log.id,
+                        ip_address=ip_address,
+                        remarks=f"Camera stream {self.stream_id}, track {identity['track_id']}"
+                    )
+
+                    apply_attendance_change(identity['user_id'], self.session.subject_id, None, 'present')
+            except IntegrityError:
+                # Marked by another request since the check above; keep going with the chunk
+                already_marked.add(identity['user_id'])
+                continue
+            enqueue_log(log, required=True)
+
+            already_marked.add(identity['user_id'])
+            marked.append({
+                'student_id': identity['user_id'],
+                'attendance_id': str(attendance.id),
+                'confidence': identity['confidence'],
+                'track_id': identity['track_id'],
+            })
+            logger.info(f"Stream {self.stream_id} marked {identity['user_id']} present in session {self.session.id}")
+
+        return marked
@@ -0,0 +1,100 @@
+"""
+Session Summaries
+Attendance counts for many sessions at once, and the summary frozen on completed sessions
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from django.utils import timezone
+
+from apps.academic.models import Subject
+
+from .models import Attendance, ClassSession
+
+
+def prefetch_session_counts(sessions: List[ClassSession]) -> List[ClassSession]:
+    """
+    Load enrolled/present/absent counts for a page of sessions.
+
+    Two queries regardless of page size: attendance statuses of the
+    sessions, and enrollments of their subjects. The counts are stored on
+    each instance and used by ClassSession.total_students, present_count,
+    absent_count and attendance_percentage.
+    """
+    sessions = list(sessions)
+    # Completed sessions answer from their stored summary
+    pending = [
+        session for session in sessions
+        if not (session.status == 'completed' and session.attendance_summary)
+    ]
+    if not pending:
+        return sessions
+
+    statuses = defaultdict(Counter)
+    for session_id, att_status in Attendance.objects.filter(
+        session_id__in=[session.id for session in pending]
+    ).values_list('session_id', 'status'):
+        statuses[str(session_id)][att_status] += 1
+
+    enrolled = Counter(
+        str(subject_id) for subject_id in Subject.enrolled_students.through.objects.filter(
+            subject_id__in=set(session.subject_id for session in pending)
+        ).values_list('subject_id', flat=True)
+    )
+
+    for session in pending:
+        counts = statuses[str(session.id)]
+        session._session_counts = {
+            'total_students': enrolled[str(session.subject_id)],
+            'present': counts['present'],
+            'absent': counts['absent'],
+        }
+    return sessions
+
+
+def build_session_summary(session: ClassSession) -> Dict:
+    """
+    Summary of a session's attendance from one query over its records.
+
+    Returns:
+        {'total_students', 'marked', '<status>' counts, 'methods': {method: count},
+         'first_marked_at', 'last_marked_at', 'generated_at'}
+    """
+    statuses = Counter()
+    methods = Counter()
+    marked_times = []
+    for att_status, method, marked_at in Attendance.objects.filter(session_id=session.id).values_list(
+        'status', 'marking_method', 'marked_at'
+    ):
+        statuses[att_status] += 1
+        methods[method] += 1
+        if marked_at:
+            marked_times.append(marked_at)
+
+    summary = {
+        'total_students': session.subject.enrolled_students.count(),
+        'marked': sum(statuses.values()),
+        'methods': dict(methods),
+        'first_marked_at': min(marked_times).isoformat() if marked_times else None,
+        'last_marked_at': max(marked_times).isoformat() if marked_times else None,
+        'generated_at': timezone.now().isoformat(),
+    }
+    for att_status, _ in Attendance.STATUS_CHOICES:
+        summary[att_status] = statuses[att_status]
+    return summary
+
+
+def store_session_summary(session: ClassSession) -> Dict:
+    """Write the summary of a completed session (on end and after manual corrections)."""
+    summary = build_session_summary(session)
+    session.attendance_summary = summary
+    ClassSession.objects.filter(id=session.id).update(attendance_summary=summary)
+    return summary
+
+
+def refresh_session_summary(session_id) -> None:
+    """Rewrite the summary after a record of a completed session changed (no-op for other sessions)."""
+    session = ClassSession.objects.filter(id=session_id, status='completed').select_related('subject').first()
+    if session is not None:
+        store_session_summary(session)
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.finalization import absent_student_ids, finalize_session, needs_finalization
+from apps.attendance.models import Attendance
+
+from .utils import AttendanceFixtures
+
+
+@override_settings(ATTENDANCE_FINALIZE_CHUNK_SIZE=2, ATTENDANCE_FINALIZE_STALE_SECONDS=600)
+class FinalizeSessionTests(AttendanceFixtures, TestCase):
+    student_count = 5
+
+    def test_needs_finalization(self):
+        session = self.make_session(status='completed')
+        self.assertFalse(needs_finalization(session))
+
+        session.finalization_status = 'failed'
+        self.assertTrue(needs_finalization(session))
+
+        session.finalization_status = 'running'
+        session.finalization_progress = {'updated_at': timezone.now().isoformat()}
+        self.assertFalse(needs_finalization(session))
+
+        session.finalization_progress = {'updated_at': (timezone.now() - timedelta(minutes=30)).isoformat()}
+        self.assertTrue(needs_finalization(session))
+
+        session.status = 'ongoing'
+        self.assertFalse(needs_finalization(session))
+
+    def test_resume_after_a_partial_run(self):
+        session = self.make_session(status='completed')
+        student_ids = absent_student_ids(session)
+        self.assertEqual(len(student_ids), 5)
+
+        # The first run wrote one chunk and died; a student was marked since
+        stale = (timezone.now() - timedelta(hours=1)).isoformat()
+        session.finalization_status = 'running'
+        session.finalization_progress = {'absent_total': 5, 'absent_marked': 2, 'updated_at': stale}
+        session.save()
+        for student_id in student_ids[:2]:
+            Attendance.objects.create(session=session, student_id=student_id, status='absent', marking_method='auto')
+        late = student_ids[2]
+        Attendance.objects.create(session=session, student_id=late, status='present', marking_method='manual')
+        self.assertTrue(needs_finalization(session))
+
+        # Resuming with the stale list skips everyone who has a record
+        progress = finalize_session(session, student_ids, self.faculty.id)
+
+        self.assertNotIn('error', progress)
+        session.refresh_from_db()
+        self.assertEqual(session.finalization_status, 'completed')
+        self.assertFalse(needs_finalization(session))
+        records = {
+            str(student_id): status
+            for student_id, status in Attendance.objects.filter(session=session).values_list('student_id', 'status')
+        }
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[late], 'present')
+        self.assertEqual(sum(1 for status in records.values() if status == 'absent'), 4)
+        self.assertEqual(session.attendance_summary['marked'], 5)
+        self.assertEqual(absent_student_ids(session), [])
+
+    def test_finalizing_twice_creates_nothing_new(self):
+        session = self.make_session(status='completed')
+        finalize_session(session, absent_student_ids(session))
+        finalize_session(session, [str(student.id) for student in self.students])
+
+        self.assertEqual(Attendance.objects.filter(session=session).count(), 5)
@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.kiosk import sync_marks, verify_bundle
+from apps.attendance.models import Attendance
+from apps.face_recognition.models import FaceData
+
+from .utils import AttendanceFixtures
+
+SECRETS = {'room-101': 'kiosk-secret'}
+
+
+def sign(bundle: str, secret: str = 'kiosk-secret') -> str:
+    return hmac.new(secret.encode(), bundle.encode(), hashlib.sha256).hexdigest()
+
+
+@override_settings(ATTENDANCE_KIOSK_SECRETS=SECRETS)
+class VerifyBundleTests(TestCase):
+
+    def test_valid_signature(self):
+        self.assertTrue(verify_bundle('room-101', '{"marks": []}', sign('{"marks": []}')))
+        self.assertTrue(verify_bundle('room-101', '{"marks": []}', sign('{"marks": []}').upper()))
+
+    def test_tampered_bundle_or_wrong_secret(self):
+        signature = sign('{"marks": []}')
+        self.assertFalse(verify_bundle('room-101', '{"marks": [1]}', signature))
+        self.assertFalse(verify_bundle('room-101', '{"marks": []}', sign('{"marks": []}', 'other-secret')))
+        self.assertFalse(verify_bundle('room-101', '{"marks": []}', ''))
+
+    def test_unknown_device(self):
+        self.assertFalse(verify_bundle('room-102', '{"marks": []}', sign('{"marks": []}')))
+
+
+class FakeEngine:
+    """Recognizes probes whose bytes are b'match'."""
+
+    def recognize_face(self, image_data, templates):
+        if image_data == b'match':
+            return {'recognized': True, 'confidence': 0.91, 'similarities': {'insightface': 0.91}}
+        return {'recognized': False, 'confidence': 0.2, 'error': 'Face did not match the enrolled student'}
+
+
+@mock.patch('apps.attendance.kiosk.get_face_engine', return_value=FakeEngine())
+@mock.patch('apps.attendance.kiosk.enqueue_log')
+@override_settings(ATTENDANCE_KIOSK_REQUIRE_PROBE=True, ATTENDANCE_KIOSK_MAX_AGE_HOURS=72)
+class SyncMarksTests(AttendanceFixtures, TestCase):
+
+    def setUp(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.session = self.make_session(
+            scheduled_date=yesterday, start_time=time(9, 0), end_time=time(11, 0), status='completed'
+        )
+        self.student = self.students[0]
+        FaceData.objects.create(user=self.student, is_complete=True, insightface_embedding=[0.1] * 512)
+        self.start = timezone.make_aware(datetime.combine(yesterday, time(10, 0)))
+
+    def capture(self, mark_id, minutes, probe):
+        return {
+            'mark_id': mark_id,
+            'session_id': self.session.id,
+            'student_id': self.student.id,
+            'captured_at': self.start + timedelta(minutes=minutes),
+            'probe': base64.b64encode(probe).decode(),
+        }
+
+    def test_bad_first_capture_does_not_block_later_ones(self, enqueue_log, get_face_engine):
+        marks = [
+            self.capture('m3', 10, b'match'),
+            self.capture('m1', 0, b'blurry'),
+            self.capture('m2', 5, b'match'),
+        ]
+
+        results = {row['mark_id']: row for row in sync_marks(marks, 'room-101', self.faculty)}
+
+        self.assertEqual(results['m1']['result'], 'rejected')
+        self.assertEqual(results['m2']['result'], 'accepted')
+        self.assertEqual(results['m3']['result'], 'duplicate')
+        attendance = Attendance.objects.get(session=self.session, student=self.student)
+        self.assertEqual(str(attendance.id), results['m2']['attendance_id'])
+        self.assertEqual(attendance.marked_at, self.start + timedelta(minutes=5))
+        self.assertEqual(attendance.marking_method, 'face')
+
+    def test_resent_bundle_is_a_duplicate(self, enqueue_log, get_face_engine):
+        marks = [self.capture('m1', 0, b'match')]
+        self.assertEqual(sync_marks(marks, 'room-101', self.faculty)[0]['result'], 'accepted')
+        self.assertEqual(sync_marks(marks, 'room-101', self.faculty)[0]['result'], 'duplicate')
+        self.assertEqual(Attendance.objects.filter(session=self.session).count(), 1)
+
+    def test_auto_absent_is_corrected(self, enqueue_log, get_face_engine):
+        Attendance.objects.create(
+            session=self.session, student=self.student, status='absent', marking_method='auto'
+        )
+        results = sync_marks([self.capture('m1', 0, b'match')], 'room-101', self.faculty)
+
+        self.assertEqual(results[0]['result'], 'updated')
+        self.assertEqual(Attendance.objects.get(session=self.session, student=self.student).status, 'present')
+
+    def test_captures_outside_the_window_are_rejected(self, enqueue_log, get_face_engine):
+        results = sync_marks([self.capture('m1', 120, b'match')], 'room-101', self.faculty)
+
+        self.assertEqual(results[0]['result'], 'rejected')
+        self.assertFalse(Attendance.objects.filter(session=self.session).exists())
@@ -0,0 +1,91 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.attendance.mark_queue import AttendanceMarkQueue, get_mark_status, mark_key
+from apps.attendance.models import Attendance
+from apps.face_recognition.models import RecognitionLog
+
+from .utils import AttendanceFixtures
+
+
+# No consumer thread: tests drain the queue themselves with _process
+@mock.patch.object(AttendanceMarkQueue, '_run', lambda self: None)
+@mock.patch('apps.attendance.mark_queue.enqueue_log')
+@override_settings(ATTENDANCE_MARK_QUEUED_DEADLINE=60)
+class MarkQueueSubmitTests(AttendanceFixtures, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.session = self.make_session(status='ongoing')
+        self.student = self.students[0]
+
+    def make_mark(self, nonce='a'):
+        return {
+            'key': mark_key(self.session.id, self.student.id, nonce),
+            'session_id': self.session.id,
+            'subject_id': self.subject.id,
+            'student_id': self.student.id,
+            'confidence': 0.92,
+            'marked_at': timezone.now(),
+            'ip_address': '127.0.0.1',
+            'log': RecognitionLog(recognized_user=self.student, status='success', confidence_score=0.92),
+        }
+
+    def drain(self, mark_queue):
+        while not mark_queue.queue.empty():
+            mark_queue._process(mark_queue.queue.get_nowait())
+
+    def test_repeated_key_is_queued_once(self, enqueue_log):
+        mark_queue = AttendanceMarkQueue()
+        mark = self.make_mark()
+
+        self.assertEqual(mark_queue.submit(mark)['status'], 'queued')
+        self.assertEqual(mark_queue.submit(self.make_mark())['status'], 'queued')
+        self.assertEqual(mark_queue.queue.qsize(), 1)
+        self.assertEqual(mark_queue.get_stats()['retries'], 1)
+
+        self.drain(mark_queue)
+        mark_status = mark_queue.submit(self.make_mark())
+        self.assertEqual(mark_status['status'], 'persisted')
+        self.assertEqual(mark_queue.queue.qsize(), 0)
+        self.assertEqual(Attendance.objects.filter(session=self.session, student=self.student).count(), 1)
+        enqueue_log.assert_called_once()
+
+    def test_other_nonce_for_a_marked_student_is_a_duplicate(self, enqueue_log):
+        mark_queue = AttendanceMarkQueue()
+        mark_queue.submit(self.make_mark('a'))
+        mark_queue.submit(self.make_mark('b'))
+        self.assertEqual(mark_queue.queue.qsize(), 2)
+
+        self.drain(mark_queue)
+        self.assertEqual(get_mark_status(self.make_mark('a')['key'])['status'], 'persisted')
+        self.assertEqual(get_mark_status(self.make_mark('b')['key'])['status'], 'duplicate')
+        self.assertEqual(Attendance.objects.filter(session=self.session, student=self.student).count(), 1)
+
+    def test_failed_mark_can_be_submitted_again(self, enqueue_log):
+        mark_queue = AttendanceMarkQueue()
+        with mock.patch('apps.attendance.mark_queue.persist_mark', side_effect=RuntimeError('database down')):
+            mark_queue.submit(self.make_mark())
+            self.drain(mark_queue)
+        self.assertEqual(get_mark_status(self.make_mark()['key'])['status'], 'failed')
+
+        self.assertEqual(mark_queue.submit(self.make_mark())['status'], 'queued')
+        self.assertEqual(mark_queue.queue.qsize(), 1)
+
+    def test_mark_lost_from_the_queue_turns_failed_after_the_deadline(self, enqueue_log):
+        mark_queue = AttendanceMarkQueue()
+        key = self.make_mark()['key']
+        mark_queue.submit(self.make_mark())
+        # The worker holding it died: drop the queued mark
+        mark_queue.queue.get_nowait()
+
+        self.assertEqual(get_mark_status(key)['status'], 'queued')
+        with mock.patch('apps.attendance.mark_queue.time.time', return_value=time.time() + 120):
+            self.assertEqual(get_mark_status(key)['status'], 'failed')
+
+        self.assertEqual(mark_queue.submit(self.make_mark())['status'], 'queued')
+        self.assertEqual(mark_queue.queue.qsize(), 1)
@@ -0,0 +1,40 @@
+import uuid
+
+from django.test import TestCase
+
+from apps.attendance.models import Attendance, AttendanceStatistics
+from apps.attendance.roll_call import apply_roll_call
+
+from .utils import AttendanceFixtures
+
+
+class ApplyRollCallTests(AttendanceFixtures, TestCase):
+    student_count = 4
+
+    def test_creates_updates_and_rejects(self):
+        session = self.make_session(status='completed')
+        first, second, third, fourth = [str(student.id) for student in self.students]
+        Attendance.objects.create(session=session, student_id=second, status='absent', marking_method='auto')
+        Attendance.objects.create(session=session, student_id=third, status='present')
+        stranger = str(uuid.uuid4())
+
+        results = apply_roll_call(session, [
+            {'student_id': first, 'status': 'present'},
+            {'student_id': second, 'status': 'late'},
+            {'student_id': third, 'status': 'present'},
+            {'student_id': stranger, 'status': 'present'},
+            {'student_id': first, 'status': 'absent'},
+        ], self.faculty)
+
+        self.assertEqual([row['result'] for row in results], ['created', 'updated', 'unchanged', 'error', 'error'])
+        statuses = {
+            str(student_id): status
+            for student_id, status in Attendance.objects.filter(session=session).values_list('student_id', 'status')
+        }
+        self.assertEqual(statuses, {first: 'present', second: 'late', third: 'present'})
+        self.assertNotIn(fourth, statuses)
+
+        self.assertEqual(AttendanceStatistics.objects.get(student_id=second, subject=self.subject).late_count, 1)
+        session.refresh_from_db()
+        self.assertEqual(session.attendance_summary['late'], 1)
+        self.assertEqual(session.attendance_summary['present'], 2)
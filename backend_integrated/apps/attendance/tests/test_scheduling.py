@@ -0,0 +1,82 @@
+from datetime import date, time
+
+from django.test import TestCase
+
+from apps.academic.models import Department, Holiday, Timetable
+from apps.attendance.models import ClassSession
+from apps.attendance.scheduling import generate_sessions
+
+from .utils import AttendanceFixtures
+
+# Mondays 2026-09-07, 09-14, 09-21 and 09-28
+START = date(2026, 9, 7)
+END = date(2026, 10, 4)
+
+
+class GenerateSessionsTests(AttendanceFixtures, TestCase):
+    student_count = 0
+
+    def setUp(self):
+        self.entry = Timetable.objects.create(
+            subject=self.subject, faculty=self.faculty, day_of_week='monday',
+            start_time=time(9, 0), end_time=time(10, 0), room_number='101', building='Main',
+            valid_from=START, valid_until=END
+        )
+
+    def scheduled_dates(self):
+        return sorted(ClassSession.objects.filter(subject=self.subject).values_list('scheduled_date', flat=True))
+
+    def test_one_session_per_week(self):
+        result = generate_sessions(START, END)
+
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(self.scheduled_dates(), [
+            date(2026, 9, 7), date(2026, 9, 14), date(2026, 9, 21), date(2026, 9, 28),
+        ])
+        session = ClassSession.objects.filter(subject=self.subject).first()
+        self.assertEqual(session.timetable_entry_id, self.entry.id)
+        self.assertEqual(session.location, '101 Main')
+
+    def test_rerun_creates_nothing_twice(self):
+        generate_sessions(START, date(2026, 9, 20))
+        result = generate_sessions(START, END)
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['existing'], 2)
+        self.assertEqual(generate_sessions(START, END)['created'], 0)
+        self.assertEqual(len(self.scheduled_dates()), 4)
+
+    def test_hand_made_session_in_the_slot_is_kept(self):
+        self.make_session(scheduled_date=date(2026, 9, 14), start_time=time(9, 0), end_time=time(10, 0))
+        result = generate_sessions(START, END)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['existing'], 1)
+        self.assertEqual(len(self.scheduled_dates()), 4)
+
+    def test_holidays_are_skipped(self):
+        other = Department.objects.create(name='Mechanical', code='ME')
+        Holiday.objects.create(name='Founders Day', start_date=date(2026, 9, 14), end_date=date(2026, 9, 14))
+        Holiday.objects.create(
+            name='CSE Fest', start_date=date(2026, 9, 20), end_date=date(2026, 9, 22), department=self.department
+        )
+        Holiday.objects.create(
+            name='ME Fest', start_date=date(2026, 9, 28), end_date=date(2026, 9, 28), department=other
+        )
+
+        result = generate_sessions(START, END)
+
+        self.assertEqual(result['holidays'], 2)
+        self.assertEqual(self.scheduled_dates(), [date(2026, 9, 7), date(2026, 9, 28)])
+
+    def test_dry_run_writes_nothing(self):
+        result = generate_sessions(START, END, dry_run=True)
+
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(self.scheduled_dates(), [])
+
+    def test_validity_range_limits_the_window(self):
+        self.entry.valid_until = date(2026, 9, 15)
+        self.entry.save()
+
+        self.assertEqual(generate_sessions(START, END)['created'], 2)
@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from apps.attendance.models import Attendance, AttendanceStatistics
+from apps.attendance.statistics import (
+    apply_attendance_change, compute_statistics, rebuild_statistics, streaks, verify_statistics,
+)
+
+from .utils import AttendanceFixtures
+
+
+class StreaksTests(TestCase):
+
+    def test_current_streak_is_the_newest_run(self):
+        self.assertEqual(streaks(['present', 'present', 'absent', 'present']), (2, 2))
+        self.assertEqual(streaks(['present', 'present', 'present']), (3, 3))
+
+    def test_current_streak_is_zero_after_a_miss(self):
+        self.assertEqual(streaks(['absent', 'present', 'present']), (0, 2))
+        self.assertEqual(streaks(['late', 'present']), (0, 1))
+        self.assertEqual(streaks([]), (0, 0))
+
+
+class ApplyAttendanceChangeTests(AttendanceFixtures, TestCase):
+
+    def mark(self, student, day, status):
+        session = self.make_session(day)
+        Attendance.objects.create(session=session, student=student, status=status)
+        apply_attendance_change(student.id, self.subject.id, None, status)
+        return session
+
+    def test_new_marks_match_a_full_recompute(self):
+        series = ['present', 'present', 'absent', 'present', 'late', 'present', 'present', 'absent']
+        student = self.students[0]
+        for day, status in enumerate(series):
+            self.mark(student, day, status)
+
+            result = verify_statistics(self.subject.id)
+            self.assertEqual(result['drifted'], [], f'drift after mark {day} ({status}): {result["fields"]}')
+
+        stats = AttendanceStatistics.objects.get(student=student, subject=self.subject)
+        expected = compute_statistics(self.subject.id, [student.id])[str(student.id)]
+        self.assertEqual(stats.current_streak, expected['current_streak'])
+        self.assertEqual(stats.longest_streak, 3)
+        self.assertEqual(stats.total_sessions, len(series))
+        self.assertFalse(stats.streaks_stale)
+
+    def test_correcting_an_earlier_mark_flags_stale_streaks(self):
+        student = self.students[0]
+        first = self.mark(student, 0, 'absent')
+        self.mark(student, 1, 'present')
+
+        Attendance.objects.filter(session=first, student=student).update(status='present')
+        apply_attendance_change(student.id, self.subject.id, 'absent', 'present', latest=False)
+
+        stats = AttendanceStatistics.objects.get(student=student, subject=self.subject)
+        self.assertTrue(stats.streaks_stale)
+        self.assertEqual(stats.present_count, 2)
+        self.assertEqual(verify_statistics(self.subject.id, stale_only=True)['drifted'], [str(student.id)])
+
+        rebuild_statistics(self.subject.id, [student.id])
+        self.assertEqual(verify_statistics(self.subject.id)['drifted'], [])
@@ -0,0 +1,50 @@
+"""
+Shared fixtures for the attendance tests
+"""
+
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+
+from apps.academic.models import Department, Subject
+from apps.attendance.models import ClassSession
+
+User = get_user_model()
+
+
+class AttendanceFixtures:
+    """A department, a faculty member and a subject with ``student_count`` enrolled students."""
+
+    student_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Computer Science', code='CSE')
+        cls.faculty = User.objects.create_user(
+            'faculty@example.com', 'password', first_name='Fac', last_name='Ulty',
+            role='faculty', department=cls.department
+        )
+        cls.subject = Subject.objects.create(
+            name='Databases', code='CS501', department=cls.department, semester=5, year=3,
+            academic_year='2026-2027', primary_faculty=cls.faculty
+        )
+        cls.students = [
+            User.objects.create_user(
+                f'student{number}@example.com', 'password', first_name='Student', last_name=str(number),
+                role='student', department=cls.department
+            )
+            for number in range(cls.student_count)
+        ]
+        cls.subject.enrolled_students.add(*cls.students)
+
+    def make_session(self, day: int = 0, **fields) -> ClassSession:
+        """A session of the subject ``day`` days after 2026-09-01, 09:00-10:00."""
+        defaults = {
+            'subject': self.subject,
+            'faculty': self.faculty,
+            'scheduled_date': date(2026, 9, 1) + timedelta(days=day),
+            'start_time': time(9, 0),
+            'end_time': time(10, 0),
+        }
+        defaults.update(fields)
+        return ClassSession.objects.create(**defaults)
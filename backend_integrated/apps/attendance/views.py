@@ -7,17 +7,31 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q
 from django.db import transaction
+from django.core.exceptions import ValidationError
+import json
 import logging
 
 from .models import ClassSession, Attendance, AttendanceStatistics, AttendanceReport
+from .finalization import absent_student_ids, finalize_session, needs_finalization, start_finalization
+from .statistics import apply_attendance_change
+from .summaries import prefetch_session_counts, refresh_session_summary, store_session_summary
+from .mark_queue import get_mark_status, mark_key, submit_mark
+from .roll_call import apply_roll_call
+from .kiosk import sync_marks, verify_bundle
 from .serializers import (
     ClassSessionSerializer, AttendanceSerializer, MarkAttendanceSerializer,
+    StreamFramesSerializer, RollCallSerializer, KioskSyncSerializer, KioskMarkSerializer,
     AttendanceStatisticsSerializer, AttendanceReportSerializer
 )
-from apps.face_recognition.services import FaceRecognitionEngine
+from apps.academic.rosters import is_enrolled
+from apps.authentication.models import User
+from apps.face_recognition.runtime import get_face_engine
+from apps.face_recognition.instrumentation import StageTimer, observe_timings
+from apps.face_recognition.log_writer import enqueue_log
 from apps.face_recognition.models import FaceData, RecognitionLog
 
 logger = logging.getLogger(__name__)
@@ -52,6 +66,13 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
                 subject__enrolled_students=user
             ).select_related('subject', 'faculty')
     
+    def paginate_queryset(self, queryset):
+        """Load attendance counts for the whole page instead of per row."""
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            page = prefetch_session_counts(page)
+        return page
+    
     @action(detail=True, methods=['post'])
     def start_session(self, request, pk=None):
         """
@@ -84,8 +105,14 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def end_session(self, request, pk=None):
         """
-        End a class session.
+        End a class session and mark everyone unmarked as absent.
         POST /api/attendance/sessions/{id}/end_session/
+        Body: {background: bool (optional)}
+        
+        Large classes (over ATTENDANCE_FINALIZE_INLINE_LIMIT absentees) or
+        background=true are finalized on a background thread; poll
+        GET .../finalization/ for progress. Calling it again on a completed
+        session whose finalization failed or stalled resumes finalization.
         """
         session = self.get_object()
         
@@ -94,38 +121,101 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
                 'error': 'Only the assigned faculty can end this session'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        if session.status != 'ongoing':
+        resumed = needs_finalization(session)
+        if session.status != 'ongoing' and not resumed:
             return Response({
                 'error': f'Session is not ongoing (status: {session.status})'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        session.status = 'completed'
-        session.actual_end_time = timezone.now()
-        session.save()
+        if not resumed:
+            session.status = 'completed'
+            session.actual_end_time = timezone.now()
+            session.save()
         
         # Mark absent students
-        enrolled_students = session.subject.enrolled_students.all()
-        marked_students = session.attendance_records.values_list('student_id', flat=True)
+        absent_ids = absent_student_ids(session)
+        background = str(request.data.get('background', '')).lower() in ('1', 'true') or \
+            len(absent_ids) > getattr(settings, 'ATTENDANCE_FINALIZE_INLINE_LIMIT', 300)
         
-        absent_students = enrolled_students.exclude(id__in=marked_students)
-        
-        for student in absent_students:
-            Attendance.objects.create(
-                session=session,
-                student=student,
-                status='absent',
-                marking_method='auto',
-                marked_by=request.user
-            )
+        if background:
+            start_finalization(session, absent_ids, request.user.id)
+        else:
+            finalize_session(session, absent_ids, request.user.id)
         
         serializer = self.get_serializer(session)
         return Response({
             'success': True,
-            'message': 'Session ended successfully',
-            'absent_marked': absent_students.count(),
+            'message': 'Session ended, absentees are being marked' if background else 'Session ended successfully',
+            'resumed': resumed,
+            'absent_marked': session.finalization_progress['absent_marked'],
+            'absent_total': len(absent_ids),
+            'finalization_status': session.finalization_status,
             'session': serializer.data
+        }, status=status.HTTP_202_ACCEPTED if background else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def finalization(self, request, pk=None):
+        """
+        Progress of absentee finalization for an ended session.
+        GET /api/attendance/sessions/{id}/finalization/
+        """
+        session = self.get_object()
+        return Response({
+            'session_id': str(session.id),
+            'status': session.finalization_status or None,
+            'progress': session.finalization_progress
         })
     
+    @action(detail=True, methods=['post'])
+    def stream_frames(self, request, pk=None):
+        """
+        Mark attendance from a chunk of classroom camera frames.
+        POST /api/attendance/sessions/{id}/stream_frames/
+        Body: {frames: [<file>, ...], stream_id: str (optional), reset: bool}
+        
+        Frames are processed in order; pass the returned stream_id with the
+        next chunk so faces keep their tracks across chunks.
+        """
+        session = self.get_object()
+        
+        if session.faculty != request.user and request.user.role != 'admin':
+            return Response({
+                'error': 'Only the assigned faculty can stream frames for this session'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        if not session.can_mark_attendance:
+            return Response({
+                'success': False,
+                'error': 'Attendance marking window has closed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = StreamFramesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        from .streaming import SessionFrameStream
+        from apps.face_recognition.streaming import decode_frames
+        
+        stream = SessionFrameStream(
+            session, serializer.validated_data.get('stream_id'), marked_by=request.user
+        )
+        if serializer.validated_data['reset']:
+            stream.reset()
+        
+        try:
+            result = stream.process(
+                decode_frames(frame.read() for frame in serializer.validated_data['frames']),
+                ip_address=request.META.get('REMOTE_ADDR')
+            )
+        except Exception as e:
+            logger.error(f"Frame stream error: {e}", exc_info=True)
+            return Response({
+                'success': False,
+                'error': 'Failed to process frames',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({'success': True, **result})
+    
     @action(detail=False, methods=['get'])
     def today(self, request):
         """
@@ -134,7 +224,7 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
         """
         today = timezone.now().date()
         queryset = self.get_queryset().filter(scheduled_date=today)
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(prefetch_session_counts(queryset), many=True)
         return Response(serializer.data)
 
 
@@ -165,40 +255,57 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 student=user
             ).select_related('session', 'student', 'marked_by')
     
+    def perform_update(self, serializer):
+        """Keep the stored summary of completed sessions in step with edited records."""
+        old_session_id = serializer.instance.session_id
+        attendance = serializer.save()
+        refresh_session_summary(attendance.session_id)
+        if attendance.session_id != old_session_id:
+            refresh_session_summary(old_session_id)
+    
+    def perform_destroy(self, instance):
+        session_id = instance.session_id
+        instance.delete()
+        refresh_session_summary(session_id)
+    
     @action(detail=False, methods=['post'])
     def mark_via_face(self, request):
         """
         Mark attendance using face recognition.
         POST /api/attendance/attendance/mark_via_face/
-        Body: {session_id: uuid, image: file}
+        Body: {session_id: uuid, image: file, client_nonce: str (optional)}
+        
+        With ATTENDANCE_WRITE_BEHIND the record is written by a background
+        queue after recognition succeeds and the response is 202 with an
+        idempotency_key; poll GET .../mark_status/?key=... to confirm it.
         """
         serializer = MarkAttendanceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        session_id = serializer.validated_data['session_id']
+        # Session existence and marking window are checked by the serializer
+        session = serializer.validated_data['session']
         image_file = serializer.validated_data['image']
         
-        try:
-            session = ClassSession.objects.get(id=session_id)
-        except ClassSession.DoesNotExist:
-            return Response({
-                'success': False,
-                'error': 'Session not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        if not session.can_mark_attendance:
-            return Response({
-                'success': False,
-                'error': 'Attendance marking window has closed'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
         # Check if student is enrolled
-        if request.user not in session.subject.enrolled_students.all():
+        if not is_enrolled(session.subject_id, request.user.id):
             return Response({
                 'success': False,
                 'error': 'You are not enrolled in this subject'
             }, status=status.HTTP_403_FORBIDDEN)
         
+        write_behind = getattr(settings, 'ATTENDANCE_WRITE_BEHIND', False)
+        if write_behind:
+            # A retry of an accepted mark gets its status back without recognizing again
+            idempotency_key = mark_key(session.id, request.user.id, serializer.validated_data.get('client_nonce', ''))
+            mark_status = get_mark_status(idempotency_key, check_database=False)
+            if mark_status and mark_status['status'] != 'failed':
+                return Response({
+                    'success': True,
+                    'message': 'Attendance already accepted',
+                    'idempotency_key': idempotency_key,
+                    'mark_status': mark_status
+                }, status=status.HTTP_202_ACCEPTED)
+        
         # Check if already marked
         existing = Attendance.objects.filter(session=session, student=request.user).first()
         if existing:
@@ -210,11 +317,15 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         
         # Perform face recognition
         image_data = image_file.read()
-        face_engine = FaceRecognitionEngine()
+        timer = StageTimer()
         
         try:
             # Get student's enrolled face data
-            face_data = FaceData.objects.get(user=request.user, is_complete=True)
+            with timer.stage('db'):
+                face_data = FaceData.objects.get(user=request.user, is_complete=True)
+            
+            # Embed the probe with the models that produced the enrolled templates
+            face_engine = get_face_engine(face_data.embedding_version or None)
             
             enrolled_embeddings = {
                 'insightface': face_data.insightface_embedding,
@@ -222,17 +333,22 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'dlib': face_data.dlib_embedding
             }
             
-            recognition_result = face_engine.recognize_face(image_data, enrolled_embeddings)
+            recognition_result = face_engine.recognize_face(image_data, enrolled_embeddings, timer)
             
             if not recognition_result.get('recognized'):
                 # Log failed recognition
-                log = RecognitionLog.objects.create(
+                enqueue_log(RecognitionLog(
                     recognized_user=None,
                     status='low_confidence',
                     confidence_score=recognition_result.get('confidence', 0),
+                    timings=timer.as_dict(),
                     ip_address=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    department_id=request.user.department_id,
+                    session=session,
+                    subject_id=session.subject_id
+                ))
+                observe_timings('mark_via_face', timer)
                 
                 return Response({
                     'success': False,
@@ -241,36 +357,63 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                     'message': 'Please try again or contact faculty for manual marking'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Log successful recognition
-            log = RecognitionLog.objects.create(
+            # Log successful recognition (queued after the attendance write so
+            # the log carries the write's duration; the id exists already)
+            log = RecognitionLog(
                 recognized_user=request.user,
                 status='success',
                 confidence_score=recognition_result['confidence'],
                 insightface_result=recognition_result.get('similarities'),
                 ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                department_id=request.user.department_id,
+                session=session,
+                subject_id=session.subject_id
             )
             
+            if write_behind:
+                log.timings = timer.as_dict()
+                mark_status = submit_mark({
+                    'key': idempotency_key,
+                    'session_id': session.id,
+                    'subject_id': session.subject_id,
+                    'student_id': request.user.id,
+                    'confidence': recognition_result['confidence'],
+                    'marked_at': timezone.now(),
+                    'ip_address': request.META.get('REMOTE_ADDR'),
+                    'log': log
+                })
+                observe_timings('mark_via_face', timer)
+                
+                return Response({
+                    'success': True,
+                    'message': 'Attendance accepted',
+                    'confidence': recognition_result['confidence'],
+                    'idempotency_key': idempotency_key,
+                    'mark_status': mark_status
+                }, status=status.HTTP_202_ACCEPTED)
+            
             # Mark attendance
             with transaction.atomic():
-                attendance = Attendance.objects.create(
-                    session=session,
-                    student=request.user,
-                    status='present',
-                    marking_method='face',
-                    marked_at=timezone.now(),
-                    recognition_confidence=recognition_result['confidence'],
-                    recognition_log=log,
-                    ip_address=request.META.get('REMOTE_ADDR'),
-                    location_verified=True
-                )
-                
-                # Update statistics
-                stats, created = AttendanceStatistics.objects.get_or_create(
-                    student=request.user,
-                    subject=session.subject
-                )
-                stats.update_statistics()
+                with timer.stage('db_write'):
+                    attendance = Attendance.objects.create(
+                        session=session,
+                        student=request.user,
+                        status='present',
+                        marking_method='face',
+                        marked_at=timezone.now(),
+                        recognition_confidence=recognition_result['confidence'],
+                        recognition_log_id=log.id,
+                        ip_address=request.META.get('REMOTE_ADDR'),
+                        location_verified=True
+                    )
+                    
+                    # Update statistics
+                    apply_attendance_change(request.user.id, session.subject_id, None, 'present')
+            
+            log.timings = timer.as_dict()
+            enqueue_log(log, required=True)
+            observe_timings('mark_via_face', timer)
             
             return Response({
                 'success': True,
@@ -292,6 +435,30 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def mark_status(self, request):
+        """
+        Persistence status of a write-behind face mark.
+        GET /api/attendance/attendance/mark_status/?key=<idempotency_key>
+        """
+        key = request.query_params.get('key', '')
+        if key.count(':') < 2:
+            return Response({'error': 'key is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.user.role == 'student' and key.split(':')[1] != str(request.user.id):
+            return Response({
+                'error': 'You can only check your own attendance marks'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            mark_status = get_mark_status(key)
+        except ValidationError:
+            return Response({'error': 'Invalid key'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if mark_status is None:
+            return Response({'error': 'Unknown or expired key'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'idempotency_key': key, **mark_status})
+    
     @action(detail=False, methods=['post'])
     def mark_manual(self, request):
         """
@@ -318,6 +485,10 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                     'error': 'You can only mark attendance for your own sessions'
                 }, status=status.HTTP_403_FORBIDDEN)
             
+            old_status = Attendance.objects.filter(
+                session=session, student=student
+            ).values_list('status', flat=True).first()
+            
             attendance, created = Attendance.objects.update_or_create(
                 session=session,
                 student=student,
@@ -330,12 +501,13 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 }
             )
             
-            # Update statistics
-            stats, _ = AttendanceStatistics.objects.get_or_create(
-                student=student,
-                subject=session.subject
+            # Update statistics (a correction to a past session leaves streaks for the verify job)
+            apply_attendance_change(
+                student.id, session.subject_id, old_status, att_status,
+                latest=session.status in ('scheduled', 'ongoing')
             )
-            stats.update_statistics()
+            if session.status == 'completed':
+                store_session_summary(session)
             
             return Response({
                 'success': True,
@@ -353,6 +525,118 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'error': 'Failed to mark attendance',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'])
+    def mark_bulk(self, request):
+        """
+        Manually mark many students of one session (faculty only).
+        POST /api/attendance/attendance/mark_bulk/
+        Body: {session_id: uuid, marks: [{student_id: uuid, status: 'present/absent/late/excused'}]}
+        
+        Rows are validated independently; the response has one result per row.
+        """
+        if request.user.role not in ['faculty', 'admin', 'hod']:
+            return Response({
+                'error': 'Only faculty can manually mark attendance'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = RollCallSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            session = ClassSession.objects.get(id=serializer.validated_data['session_id'])
+        except ClassSession.DoesNotExist:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Check if faculty is authorized
+        if request.user.role == 'faculty' and session.faculty_id != request.user.id:
+            return Response({
+                'error': 'You can only mark attendance for your own sessions'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            results = apply_roll_call(
+                session, serializer.validated_data['marks'], request.user, request.META.get('REMOTE_ADDR')
+            )
+        except Exception as e:
+            logger.error(f"Bulk manual attendance error: {e}", exc_info=True)
+            return Response({
+                'error': 'Failed to mark attendance',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        counts = {}
+        for row in results:
+            counts[row['result']] = counts.get(row['result'], 0) + 1
+        
+        return Response({
+            'success': 'error' not in counts,
+            'counts': counts,
+            'results': results
+        })
+    
+    @action(detail=False, methods=['post'])
+    def kiosk_sync(self, request):
+        """
+        Commit marks a classroom device captured while offline.
+        POST /api/attendance/attendance/kiosk_sync/
+        Body: {device_id: str, bundle: '{"marks": [{mark_id, session_id, student_id,
+               captured_at, probe (base64 image, optional)}]}', signature: hex HMAC-SHA256 of bundle}
+        
+        Devices sign with their secret from ATTENDANCE_KIOSK_SECRETS. The
+        response has one result per mark; resending a bundle is harmless.
+        """
+        if request.user.role not in ['faculty', 'admin', 'hod']:
+            return Response({
+                'error': 'Only staff accounts can sync kiosk marks'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = KioskSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        device_id = serializer.validated_data['device_id']
+        bundle = serializer.validated_data['bundle']
+        
+        if not verify_bundle(device_id, bundle, serializer.validated_data['signature']):
+            logger.warning(f"Rejected kiosk bundle with a bad signature from device {device_id}")
+            return Response({'error': 'Invalid bundle signature'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            marks = json.loads(bundle).get('marks')
+        except (ValueError, AttributeError):
+            marks = None
+        if not isinstance(marks, list):
+            return Response({'error': 'Bundle must be a JSON object with a marks list'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_marks = getattr(settings, 'ATTENDANCE_KIOSK_MAX_MARKS', 200)
+        if len(marks) > max_marks:
+            return Response({
+                'error': f'A bundle can hold at most {max_marks} marks'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        mark_serializer = KioskMarkSerializer(data=marks, many=True)
+        mark_serializer.is_valid(raise_exception=True)
+        
+        try:
+            results = sync_marks(
+                mark_serializer.validated_data, device_id, request.user, request.META.get('REMOTE_ADDR')
+            )
+        except Exception as e:
+            logger.error(f"Kiosk sync error: {e}", exc_info=True)
+            return Response({
+                'error': 'Failed to sync marks',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        counts = {}
+        for row in results:
+            counts[row['result']] = counts.get(row['result'], 0) + 1
+        
+        return Response({
+            'success': True,
+            'device_id': device_id,
+            'counts': counts,
+            'results': results
+        })
 
 
 class AttendanceStatisticsViewSet(viewsets.ReadOnlyModelViewSet):
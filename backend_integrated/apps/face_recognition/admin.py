@@ -4,7 +4,10 @@ Face Recognition Admin Configuration
 
 from django.contrib import admin
 from django import forms
-from .models import FaceData, FaceImage, RecognitionLog, FaceRecognitionSettings
+from django.utils.html import format_html
+from .models import (
+    FaceData, FaceImage, RecognitionLog, RecognitionLogRollup, FaceRecognitionSettings, DuplicateFaceFlag
+)
 
 
 class FaceDataAdminForm(forms.ModelForm):
@@ -21,12 +24,23 @@ class FaceDataAdminForm(forms.ModelForm):
             setattr(self.instance, field_name, value)
 
 
+def image_thumbnail(obj):
+    """Small WebP preview from the content-addressed storage."""
+    if not obj.image:
+        return '-'
+    url = obj.image.storage.thumbnail_url(obj.image.name) if hasattr(obj.image.storage, 'thumbnail_url') else None
+    return format_html('<img src="{}" width="64" loading="lazy">', url) if url else '-'
+
+
+image_thumbnail.short_description = 'Preview'
+
+
 class FaceImageInline(admin.TabularInline):
     """Inline display for face images."""
     model = FaceImage
     extra = 0
-    readonly_fields = ['angle', 'brightness', 'sharpness', 'face_detected', 'detection_confidence', 'captured_at']
-    fields = ['angle', 'image', 'face_detected', 'detection_confidence', 'brightness', 'sharpness', 'captured_at']
+    readonly_fields = [image_thumbnail, 'angle', 'brightness', 'sharpness', 'face_detected', 'detection_confidence', 'captured_at']
+    fields = [image_thumbnail, 'angle', 'image', 'face_detected', 'detection_confidence', 'brightness', 'sharpness', 'captured_at']
 
 
 @admin.register(FaceData)
@@ -78,7 +92,7 @@ class FaceImageAdmin(admin.ModelAdmin):
     """Admin for FaceImage."""
     
     form = FaceImageAdminForm
-    list_display = ['face_data', 'angle', 'face_detected', 'detection_confidence', 'brightness', 'sharpness', 'captured_at']
+    list_display = [image_thumbnail, 'face_data', 'angle', 'face_detected', 'detection_confidence', 'brightness', 'sharpness', 'captured_at']
     list_filter = ['angle', 'face_detected', 'captured_at']
     search_fields = ['face_data__user__email']
     readonly_fields = ['id', 'brightness', 'sharpness', 'face_detected', 'detection_confidence', 'captured_at']
@@ -119,7 +133,7 @@ class RecognitionLogAdmin(admin.ModelAdmin):
     search_fields = ['recognized_user__email', 'ip_address']
     readonly_fields = [
         'id', 'recognized_user', 'status', 'confidence_score',
-        'insightface_result', 'deepface_result', 'dlib_result',
+        'insightface_result', 'deepface_result', 'dlib_result', 'timings',
         'ip_address', 'user_agent', 'timestamp'
     ]
     
@@ -131,6 +145,10 @@ class RecognitionLogAdmin(admin.ModelAdmin):
             'fields': ('insightface_result', 'deepface_result', 'dlib_result'),
             'classes': ('collapse',)
         }),
+        ('Latency', {
+            'fields': ('timings',),
+            'classes': ('collapse',)
+        }),
         ('Request Information', {
             'fields': ('ip_address', 'user_agent')
         }),
@@ -148,6 +166,74 @@ class RecognitionLogAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(RecognitionLogRollup)
+class RecognitionLogRollupAdmin(admin.ModelAdmin):
+    """Admin for RecognitionLogRollup."""
+    
+    list_display = ['date', 'status', 'count', 'recognized_count', 'average_confidence', 'average_latency_ms']
+    list_filter = ['status', 'date']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        """Rollups are written by the retention sweep."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Rollups are read-only."""
+        return False
+
+
+class DuplicateFaceFlagAdminForm(forms.ModelForm):
+    """Custom form for DuplicateFaceFlag to handle djongo ForeignKey validation issues."""
+    
+    class Meta:
+        model = DuplicateFaceFlag
+        fields = '__all__'
+    
+    def _post_clean(self):
+        """Override to skip model validation that triggers djongo issues."""
+        for field_name, value in self.cleaned_data.items():
+            setattr(self.instance, field_name, value)
+
+
+@admin.register(DuplicateFaceFlag)
+class DuplicateFaceFlagAdmin(admin.ModelAdmin):
+    """Admin for DuplicateFaceFlag."""
+    
+    form = DuplicateFaceFlagAdminForm
+    list_display = ['user', 'matched_user', 'confidence', 'source', 'status', 'created_at']
+    list_filter = ['status', 'source', 'created_at']
+    search_fields = ['user__email', 'matched_user__email']
+    readonly_fields = [
+        'id', 'user', 'matched_user', 'confidence', 'similarities',
+        'embedding_version', 'source', 'reviewed_by', 'reviewed_at', 'created_at'
+    ]
+    
+    fieldsets = (
+        ('Match', {
+            'fields': ('id', 'user', 'matched_user', 'confidence', 'similarities', 'embedding_version', 'source')
+        }),
+        ('Review', {
+            'fields': ('status', 'notes', 'reviewed_by', 'reviewed_at')
+        }),
+        ('Timestamp', {
+            'fields': ('created_at',)
+        }),
+    )
+    
+    def has_add_permission(self, request):
+        """Flags are raised by enrollment and the duplicate scan."""
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        """Record who resolved the flag."""
+        if 'status' in form.changed_data and obj.status != 'open':
+            from django.utils import timezone
+            obj.reviewed_by = request.user
+            obj.reviewed_at = timezone.now()
+        super().save_model(request, obj, form, change)
+
+
 @admin.register(FaceRecognitionSettings)
 class FaceRecognitionSettingsAdmin(admin.ModelAdmin):
     """Admin for FaceRecognitionSettings."""
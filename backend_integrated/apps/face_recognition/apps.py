@@ -12,5 +12,4 @@ class FaceRecognitionConfig(AppConfig):
     
     def ready(self):
         """Import signals when app is ready."""
-        # Import signals here if needed
-        pass
+        from . import signals  # noqa: F401
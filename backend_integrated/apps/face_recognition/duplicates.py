@@ -0,0 +1,127 @@
+"""
+Duplicate Identity Detection
+Flags accounts whose enrolled face matches another enrolled user
+"""
+
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .gallery import get_gallery
+from .models import DuplicateFaceFlag, FaceRecognitionSettings
+
+logger = logging.getLogger(__name__)
+
+
+def get_duplicate_threshold() -> float:
+    return getattr(settings, 'FACE_DUPLICATE_THRESHOLD', 0.85)
+
+
+def get_match_weights() -> Dict[str, float]:
+    recognition_settings = FaceRecognitionSettings.get_settings()
+    return {
+        'insightface': recognition_settings.insightface_weight,
+        'deepface': recognition_settings.deepface_weight
+    }
+
+
+def flagged_pairs(user_ids: Iterable[str] = None) -> Set[frozenset]:
+    """Pairs that already have a flag (any status), optionally limited to some users."""
+    flags = DuplicateFaceFlag.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        flags = flags.filter(Q(user_id__in=user_ids) | Q(matched_user_id__in=user_ids))
+    return {
+        frozenset((str(user_id), str(matched_user_id)))
+        for user_id, matched_user_id in flags.values_list('user_id', 'matched_user_id')
+    }
+
+
+def check_enrollment_duplicates(face_data) -> List[DuplicateFaceFlag]:
+    """
+    Flag enrolled users whose template matches a newly completed enrollment.
+
+    One top-k query against the in-memory gallery, so the check costs a
+    matrix-vector product rather than a scan of FaceData.
+
+    Returns:
+        Flags created for this enrollment
+    """
+    gallery = get_gallery(face_data.embedding_version or None)
+    user_id = str(face_data.user_id)
+
+    matches = gallery.nearest(
+        {
+            'insightface': face_data.insightface_embedding,
+            'deepface': face_data.deepface_embedding
+        },
+        get_match_weights(),
+        k=getattr(settings, 'FACE_DUPLICATE_MAX_MATCHES', 5),
+        exclude={user_id}
+    )
+    threshold = get_duplicate_threshold()
+    matches = [match for match in matches if match['confidence'] >= threshold]
+    if not matches:
+        return []
+
+    existing = flagged_pairs([user_id])
+    flags = []
+    for match in matches:
+        if frozenset((user_id, match['user_id'])) in existing:
+            continue
+        flags.append(DuplicateFaceFlag.objects.create(
+            user_id=user_id,
+            matched_user_id=match['user_id'],
+            confidence=match['confidence'],
+            similarities=match['similarities'],
+            embedding_version=gallery.embedding_version,
+            source='enrollment'
+        ))
+        logger.warning(
+            f"Possible duplicate identity: {user_id} matches {match['user_id']} "
+            f"(confidence {match['confidence']:.3f})"
+        )
+    return flags
+
+
+def record_duplicate_pairs(pairs: Iterable[Tuple[str, str, float, Dict]], embedding_version: str,
+                           batch_size: int = 500) -> int:
+    """
+    Store batch-scan pairs that are not flagged yet.
+
+    Args:
+        pairs: (user_id_a, user_id_b, confidence, similarities) as from find_similar_pairs
+        embedding_version: Gallery the pairs come from
+
+    Returns:
+        Number of flags created
+    """
+    existing = flagged_pairs()
+    pending = []
+    created = 0
+
+    for user_a, user_b, confidence, similarities in pairs:
+        key = frozenset((user_a, user_b))
+        if key in existing:
+            continue
+        existing.add(key)
+        pending.append(DuplicateFaceFlag(
+            user_id=user_a,
+            matched_user_id=user_b,
+            confidence=confidence,
+            similarities=similarities,
+            embedding_version=embedding_version,
+            source='batch'
+        ))
+        if len(pending) >= batch_size:
+            DuplicateFaceFlag.objects.bulk_create(pending)
+            created += len(pending)
+            pending = []
+
+    if pending:
+        DuplicateFaceFlag.objects.bulk_create(pending)
+        created += len(pending)
+    return created
+
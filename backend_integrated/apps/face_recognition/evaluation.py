@@ -0,0 +1,142 @@
+"""
+Face Matching Evaluation
+Bounded-memory genuine/impostor score histograms and ROC analysis
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class PairScoreHistogram:
+    """
+    Joint histogram of per-model similarities for one class of pairs.
+
+    Pairs where both models have embeddings land in a 2-D (insightface,
+    deepface) grid; pairs with one model only land in that model's 1-D
+    histogram. Memory is fixed by ``bins`` however many pairs are added,
+    and any weighting of the two models can be evaluated afterwards.
+    Similarities are on the matcher's 0-1 scale ((cos + 1) / 2).
+    """
+
+    def __init__(self, bins: int = 200):
+        self.bins = bins
+        self.both = np.zeros((bins, bins), dtype=np.int64)
+        self.insightface = np.zeros(bins, dtype=np.int64)
+        self.deepface = np.zeros(bins, dtype=np.int64)
+
+    def _index(self, similarity: np.ndarray) -> np.ndarray:
+        return np.clip((similarity * self.bins).astype(np.int64), 0, self.bins - 1)
+
+    def add(self, insightface: Optional[np.ndarray], deepface: Optional[np.ndarray],
+            insightface_mask: Optional[np.ndarray], deepface_mask: Optional[np.ndarray],
+            pair_mask: np.ndarray) -> None:
+        """
+        Add a block of pairs.
+
+        Args:
+            insightface, deepface: Similarity blocks (None if the model is absent)
+            insightface_mask, deepface_mask: Both sides of the pair have the model
+            pair_mask: Pairs of this class within the block
+        """
+        has_i = pair_mask & insightface_mask if insightface is not None else np.zeros_like(pair_mask)
+        has_d = pair_mask & deepface_mask if deepface is not None else np.zeros_like(pair_mask)
+
+        both = has_i & has_d
+        if both.any():
+            flat = self._index(insightface[both]) * self.bins + self._index(deepface[both])
+            self.both += np.bincount(flat, minlength=self.bins * self.bins).reshape(self.bins, self.bins)
+
+        only_i = has_i & ~has_d
+        if only_i.any():
+            self.insightface += np.bincount(self._index(insightface[only_i]), minlength=self.bins)
+
+        only_d = has_d & ~has_i
+        if only_d.any():
+            self.deepface += np.bincount(self._index(deepface[only_d]), minlength=self.bins)
+
+    @property
+    def total(self) -> int:
+        return int(self.both.sum() + self.insightface.sum() + self.deepface.sum())
+
+    def combined(self, insightface_share: float) -> np.ndarray:
+        """
+        Histogram of the weighted confidence for a model weighting.
+
+        Args:
+            insightface_share: insightface_weight / (insightface_weight + deepface_weight)
+
+        Returns:
+            Counts per confidence bin
+        """
+        centers = (np.arange(self.bins) + 0.5) / self.bins
+        scores = insightface_share * centers[:, None] + (1 - insightface_share) * centers[None, :]
+        counts = np.bincount(
+            self._index(scores).ravel(), weights=self.both.ravel(), minlength=self.bins
+        )
+        return counts + self.insightface + self.deepface
+
+    def merge(self, other: 'PairScoreHistogram') -> None:
+        self.both += other.both
+        self.insightface += other.insightface
+        self.deepface += other.deepface
+
+
+def roc_table(genuine: np.ndarray, impostor: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    FAR/FRR at every bin edge threshold from per-bin counts.
+
+    A pair is accepted when its confidence is at or above the threshold.
+    """
+    bins = len(genuine)
+    thresholds = np.arange(bins) / bins
+    genuine_total = max(genuine.sum(), 1)
+    impostor_total = max(impostor.sum(), 1)
+    # Counts at or above each threshold
+    genuine_accepted = np.cumsum(genuine[::-1])[::-1]
+    impostor_accepted = np.cumsum(impostor[::-1])[::-1]
+    return {
+        'threshold': thresholds,
+        'far': impostor_accepted / impostor_total,
+        'frr': 1.0 - genuine_accepted / genuine_total,
+    }
+
+
+def threshold_for_far(roc: Dict[str, np.ndarray], target_far: float) -> Dict[str, float]:
+    """Lowest threshold whose FAR is at or below the target, with its FRR."""
+    ok = np.flatnonzero(roc['far'] <= target_far)
+    row = int(ok[0]) if len(ok) else len(roc['threshold']) - 1
+    return {
+        'threshold': float(roc['threshold'][row]),
+        'far': float(roc['far'][row]),
+        'frr': float(roc['frr'][row]),
+    }
+
+
+def equal_error_rate(roc: Dict[str, np.ndarray]) -> Dict[str, float]:
+    row = int(np.argmin(np.abs(roc['far'] - roc['frr'])))
+    return {
+        'threshold': float(roc['threshold'][row]),
+        'eer': float((roc['far'][row] + roc['frr'][row]) / 2),
+    }
+
+
+def evaluate_weights(genuine: PairScoreHistogram, impostor: PairScoreHistogram, target_far: float,
+                     shares: List[float]) -> List[Dict]:
+    """
+    Operating point at ``target_far`` for each insightface share of the weights.
+
+    Returns:
+        [{'insightface_share', 'threshold', 'far', 'frr', 'eer'}] sorted best (lowest FRR) first
+    """
+    results = []
+    for share in shares:
+        roc = roc_table(genuine.combined(share), impostor.combined(share))
+        point = threshold_for_far(roc, target_far)
+        results.append({
+            'insightface_share': float(share),
+            **point,
+            'eer': equal_error_rate(roc)['eer'],
+        })
+    results.sort(key=lambda result: (result['frr'], result['far']))
+    return results
@@ -0,0 +1,646 @@
+"""
+Face Embedding Gallery
+In-memory matrix of enrolled embeddings for vectorized 1:N matching,
+backed by a versioned snapshot file that every worker memory-maps.
+
+Each embedding version (see runtime.get_embedding_version) has its own
+gallery, so templates are only compared with probes from the same models.
+
+Snapshot layout (FACE_GALLERY_DIR/<embedding version>/):
+    CURRENT                             version of the active snapshot
+    gallery-<version>.json              id index and metadata
+    gallery-<version>-<model>.npy       L2-normalized float32 rows, one per user
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .runtime import get_embedding_version, get_active_embedding_versions
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_FORMAT = 1
+
+MODEL_NAMES = ('insightface', 'deepface')
+
+# Embedding sizes used when the gallery has no rows for a model
+DEFAULT_DIMENSIONS = {
+    'insightface': 512,
+    'deepface': 128,
+}
+
+
+def normalize(vector) -> Optional[np.ndarray]:
+    """Return the L2-normalized float32 copy of an embedding (None if empty)."""
+    if vector is None or len(vector) == 0:
+        return None
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else None
+
+
+def stack_embeddings(name: str, embeddings: List) -> np.ndarray:
+    """Stack embeddings into a normalized matrix; missing rows stay zero."""
+    dimension = next((len(e) for e in embeddings if e), DEFAULT_DIMENSIONS[name])
+    matrix = np.zeros((len(embeddings), dimension), dtype=np.float32)
+    for row, embedding in enumerate(embeddings):
+        vector = normalize(embedding)
+        if vector is not None and len(vector) == dimension:
+            matrix[row] = vector
+    return matrix
+
+
+def score_block(matrices: Dict[str, np.ndarray], present: Dict[str, np.ndarray],
+                probe: Dict[str, np.ndarray], weights: Dict[str, float], size: int):
+    """
+    Weighted confidence of a probe against a block of gallery rows.
+
+    Mirrors FaceRecognitionEngine.recognize_face: per-model cosine
+    similarity mapped to 0-1, averaged with the model weights of the
+    models both sides have.
+
+    Returns:
+        (confidence array, {model: similarity array})
+    """
+    total = np.zeros(size, dtype=np.float32)
+    total_weight = np.zeros(size, dtype=np.float32)
+    similarities = {}
+
+    for name, vector in probe.items():
+        matrix = matrices.get(name)
+        if vector is None or matrix is None or matrix.shape[1] != len(vector):
+            continue
+        weight = weights.get(name, 0.0)
+        similarity = (matrix @ vector + 1.0) / 2.0
+        mask = present[name]
+        total += np.where(mask, similarity * weight, 0.0)
+        total_weight += mask * weight
+        similarities[name] = similarity
+
+    confidence = np.divide(total, total_weight, out=np.zeros(size, dtype=np.float32), where=total_weight > 0)
+    return confidence, similarities
+
+
+class GalleryBase:
+    """Immutable base rows of a gallery (usually memory-mapped from a snapshot)."""
+
+    def __init__(self, user_ids: List[str], matrices: Dict[str, np.ndarray], version: Optional[int] = None):
+        self.user_ids = list(user_ids)
+        self.index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.matrices = matrices
+        self.version = version
+        # Row has an embedding for the model (rows are unit length or zero)
+        self.present = {
+            name: np.einsum('ij,ij->i', matrix, matrix) > 0
+            for name, matrix in matrices.items()
+        }
+
+
+class EmbeddingGallery:
+    """
+    Enrolled embeddings of every complete FaceData.
+
+    The base rows come from a snapshot; changes made since the snapshot
+    watermark are kept in a small overlay that masks superseded base rows.
+    The watermark is the (last_updated, id) of the newest FaceData seen,
+    so rows sharing a timestamp are replayed exactly once.
+    Instances are never mutated, so matching needs no locks: applying
+    changes returns a new gallery sharing the same base matrices.
+    """
+
+    def __init__(self, base: GalleryBase, embedding_version: str, watermark=None,
+                 overlay: Dict[str, Dict] = None, removed: Iterable[str] = (), watermark_id: str = None):
+        self.base = base
+        self.embedding_version = embedding_version
+        self.watermark = watermark
+        self.watermark_id = watermark_id
+        self.overlay = overlay or {}
+        self.removed = frozenset(removed)
+
+        self.active = np.ones(len(base.user_ids), dtype=bool)
+        for user_id in self.removed | set(self.overlay):
+            row = base.index.get(user_id)
+            if row is not None:
+                self.active[row] = False
+
+        self.overlay_ids = list(self.overlay)
+        self.overlay_index = {user_id: row for row, user_id in enumerate(self.overlay_ids)}
+        self.overlay_matrices = {
+            name: stack_embeddings(name, [self.overlay[user_id].get(name) for user_id in self.overlay_ids])
+            for name in MODEL_NAMES
+        }
+        self.overlay_present = {
+            name: np.einsum('ij,ij->i', matrix, matrix) > 0
+            for name, matrix in self.overlay_matrices.items()
+        }
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.base.version
+
+    def __len__(self):
+        return int(self.active.sum()) + len(self.overlay_ids)
+
+    def __contains__(self, user_id):
+        if user_id in self.overlay:
+            return True
+        row = self.base.index.get(user_id)
+        return row is not None and bool(self.active[row])
+
+    def user_ids(self) -> List[str]:
+        """Ids of every user currently in the gallery."""
+        ids = [user_id for user_id, active in zip(self.base.user_ids, self.active) if active]
+        return ids + self.overlay_ids
+
+    def with_changes(self, changes: Dict[str, Optional[Dict]], watermark=None,
+                     watermark_id: str = None) -> 'EmbeddingGallery':
+        """
+        Return a new gallery with changes applied.
+
+        Args:
+            changes: user_id -> {model: embedding} for upserts, or None for removals
+            watermark: Latest FaceData.last_updated covered by the changes
+            watermark_id: Id of the FaceData at ``watermark`` (the highest, on a tie)
+        """
+        overlay = dict(self.overlay)
+        removed = set(self.removed)
+
+        for user_id, embeddings in changes.items():
+            if embeddings and any(embeddings.get(name) for name in MODEL_NAMES):
+                overlay[user_id] = embeddings
+                removed.discard(user_id)
+            else:
+                overlay.pop(user_id, None)
+                if user_id in self.base.index:
+                    removed.add(user_id)
+
+        if watermark is None:
+            watermark, watermark_id = self.watermark, self.watermark_id
+        return EmbeddingGallery(
+            self.base, self.embedding_version, watermark, overlay, removed, watermark_id=watermark_id
+        )
+
+    def match(self, probe: Dict[str, List[float]], weights: Dict[str, float]) -> Optional[Dict]:
+        """
+        Find the best-scoring user for a probe.
+
+        Args:
+            probe: {model: embedding} of the input face
+            weights: {model: weight} from FaceRecognitionSettings
+
+        Returns:
+            {'user_id', 'confidence', 'similarities'} or None if the gallery is empty
+        """
+        matches = self.nearest(probe, weights, k=1)
+        return matches[0] if matches else None
+
+    def nearest(self, probe: Dict[str, List[float]], weights: Dict[str, float], k: int = 5,
+                exclude: Iterable[str] = ()) -> List[Dict]:
+        """
+        Find the ``k`` best-scoring users for a probe, best first.
+
+        Args:
+            probe: {model: embedding} of the input face
+            weights: {model: weight} from FaceRecognitionSettings
+            k: Number of users to return
+            exclude: User ids to leave out (e.g. the probe's own user)
+
+        Returns:
+            [{'user_id', 'confidence', 'similarities'}]
+        """
+        probe = {name: normalize(embedding) for name, embedding in probe.items()}
+        exclude = set(exclude)
+
+        blocks = []
+        if len(self.base.user_ids):
+            confidence, similarities = score_block(
+                self.base.matrices, self.base.present, probe, weights, len(self.base.user_ids)
+            )
+            blocks.append((self.base.user_ids, self.base.index, np.where(self.active, confidence, -1.0), similarities))
+        if self.overlay_ids:
+            confidence, similarities = score_block(
+                self.overlay_matrices, self.overlay_present, probe, weights, len(self.overlay_ids)
+            )
+            blocks.append((self.overlay_ids, self.overlay_index, confidence, similarities))
+
+        candidates = []
+        for user_ids, index, confidence, similarities in blocks:
+            for user_id in exclude:
+                row = index.get(user_id)
+                if row is not None:
+                    confidence[row] = -1.0
+
+            top = min(k, len(user_ids))
+            rows = np.argpartition(-confidence, top - 1)[:top]
+            for row in rows:
+                if confidence[row] < 0:
+                    continue
+                candidates.append({
+                    'user_id': user_ids[row],
+                    'confidence': float(confidence[row]),
+                    'similarities': {name: float(sim[row]) for name, sim in similarities.items()},
+                })
+
+        candidates.sort(key=lambda candidate: candidate['confidence'], reverse=True)
+        return candidates[:k]
+
+    def dense(self):
+        """
+        Active rows as contiguous matrices (a copy, for batch jobs).
+
+        Returns:
+            (user_ids, {model: matrix}, {model: present mask})
+        """
+        rows = np.flatnonzero(self.active)
+        user_ids = [self.base.user_ids[row] for row in rows] + self.overlay_ids
+        matrices = {}
+        for name in MODEL_NAMES:
+            base = self.base.matrices[name][rows]
+            overlay = self.overlay_matrices[name]
+            if overlay.shape[1] != base.shape[1]:
+                overlay = np.zeros((len(self.overlay_ids), base.shape[1]), dtype=np.float32)
+            matrices[name] = np.concatenate([base, overlay])
+        present = {
+            name: np.einsum('ij,ij->i', matrix, matrix) > 0
+            for name, matrix in matrices.items()
+        }
+        return user_ids, matrices, present
+
+
+def find_similar_pairs(user_ids: List[str], matrices: Dict[str, np.ndarray], present: Dict[str, np.ndarray],
+                       weights: Dict[str, float], threshold: float, block_size: int = 2048):
+    """
+    Yield every pair of gallery rows whose weighted confidence reaches ``threshold``.
+
+    Scores are computed block against block (upper triangle only), so
+    memory stays at a few ``block_size`` x ``block_size`` float32 tiles
+    however large the gallery is.
+
+    Yields:
+        (user_id_a, user_id_b, confidence, {model: similarity})
+    """
+    size = len(user_ids)
+    names = [name for name in MODEL_NAMES if name in matrices and weights.get(name, 0.0) > 0]
+
+    for i in range(0, size, block_size):
+        i_end = min(i + block_size, size)
+        for j in range(i, size, block_size):
+            j_end = min(j + block_size, size)
+
+            total = np.zeros((i_end - i, j_end - j), dtype=np.float32)
+            total_weight = np.zeros_like(total)
+            similarities = {}
+            for name in names:
+                similarity = (matrices[name][i:i_end] @ matrices[name][j:j_end].T + 1.0) / 2.0
+                mask = np.outer(present[name][i:i_end], present[name][j:j_end])
+                total += np.where(mask, similarity * weights[name], 0.0)
+                total_weight += mask * weights[name]
+                similarities[name] = similarity
+
+            confidence = np.divide(total, total_weight, out=np.zeros_like(total), where=total_weight > 0)
+            if i == j:
+                # Each pair once, never a row with itself
+                confidence = np.triu(confidence, k=1)
+
+            for a, b in zip(*np.nonzero(confidence >= threshold)):
+                yield (
+                    user_ids[i + a], user_ids[j + b], float(confidence[a, b]),
+                    {name: float(similarity[a, b]) for name, similarity in similarities.items()},
+                )
+
+
+def _later(position, last_updated, row_id) -> tuple:
+    """The later of a (last_updated, id) watermark position and a row's."""
+    if position[0] is None or (last_updated, str(row_id)) > (position[0], position[1] or ''):
+        return last_updated, str(row_id)
+    return position
+
+
+def build_gallery(embedding_version: str = None) -> EmbeddingGallery:
+    """Build an in-memory gallery from every complete FaceData of an embedding version."""
+    from .models import FaceData
+
+    embedding_version = embedding_version or get_embedding_version()
+    user_ids = []
+    embeddings = {name: [] for name in MODEL_NAMES}
+    position = (None, None)
+
+    rows = FaceData.objects.filter(is_complete=True, embedding_version=embedding_version).values_list(
+        'id', 'user_id', 'insightface_embedding', 'deepface_embedding', 'last_updated'
+    )
+    for row_id, user_id, insightface, deepface, last_updated in rows.iterator():
+        if not insightface and not deepface:
+            continue
+        user_ids.append(str(user_id))
+        embeddings['insightface'].append(insightface)
+        embeddings['deepface'].append(deepface)
+        position = _later(position, last_updated, row_id)
+
+    matrices = {name: stack_embeddings(name, embeddings[name]) for name in MODEL_NAMES}
+    return EmbeddingGallery(
+        GalleryBase(user_ids, matrices), embedding_version, position[0], watermark_id=position[1]
+    )
+
+
+def replay_changes(gallery: EmbeddingGallery) -> EmbeddingGallery:
+    """Apply FaceData changes and deletions made after the gallery watermark."""
+    from .models import FaceData, FaceDataDeletion
+
+    changes = {}
+    position = (gallery.watermark, gallery.watermark_id)
+
+    queryset = FaceData.objects.all()
+    if gallery.watermark is not None and gallery.watermark_id is not None:
+        # Strictly after the watermark row; ties on the timestamp are ordered by id
+        queryset = queryset.filter(
+            Q(last_updated__gt=gallery.watermark)
+            | Q(last_updated=gallery.watermark, id__gt=gallery.watermark_id)
+        )
+    elif gallery.watermark is not None:
+        # Snapshot from before ids were recorded: include the timestamp once
+        queryset = queryset.filter(last_updated__gte=gallery.watermark)
+
+    rows = queryset.values_list(
+        'id', 'user_id', 'is_complete', 'embedding_version',
+        'insightface_embedding', 'deepface_embedding', 'last_updated'
+    )
+    for row_id, user_id, is_complete, embedding_version, insightface, deepface, last_updated in rows:
+        # Users re-embedded with other models leave this gallery
+        if is_complete and embedding_version == gallery.embedding_version:
+            changes[str(user_id)] = {
+                'insightface': insightface,
+                'deepface': deepface,
+            }
+        else:
+            changes[str(user_id)] = None
+        position = _later(position, last_updated, row_id)
+
+    # Deleted rows are gone from the delta; their tombstones say which users to drop.
+    # Dropping is idempotent, so the tombstones at the watermark are simply read again.
+    deletions = FaceDataDeletion.objects.filter(embedding_version=gallery.embedding_version)
+    if gallery.watermark is not None:
+        deletions = deletions.filter(deleted_at__gte=gallery.watermark)
+    deleted = set(
+        str(user_id) for user_id in deletions.values_list('user_id', flat=True)
+        if str(user_id) in gallery and str(user_id) not in changes
+    )
+    if deleted:
+        # A user enrolled again keeps their place
+        deleted -= set(
+            str(user_id) for user_id in FaceData.objects.filter(
+                user_id__in=list(deleted), is_complete=True, embedding_version=gallery.embedding_version
+            ).values_list('user_id', flat=True)
+        )
+        changes.update((user_id, None) for user_id in deleted)
+
+    if not changes:
+        return gallery
+    return gallery.with_changes(changes, position[0], position[1])
+
+
+def get_gallery_dir(embedding_version: str = None) -> Path:
+    """Snapshot directory of an embedding version."""
+    embedding_version = embedding_version or get_embedding_version()
+    root = Path(getattr(settings, 'FACE_GALLERY_DIR', Path(settings.BASE_DIR) / 'gallery'))
+    return root / re.sub(r'[^A-Za-z0-9_.-]', '_', embedding_version)
+
+
+def read_current_version(directory: Path) -> Optional[int]:
+    """Version of the active snapshot, or None if no snapshot was written."""
+    try:
+        return int((directory / 'CURRENT').read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path: Path, writer) -> None:
+    """Write a file through a temporary name and rename it into place."""
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as fh:
+        writer(fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def write_snapshot(gallery: EmbeddingGallery = None, directory: Path = None,
+                   embedding_version: str = None) -> int:
+    """
+    Write a gallery snapshot and make it current.
+
+    Args:
+        gallery: Gallery to write, freshly built from the database by default
+        directory: Snapshot directory, defaults to the embedding version's directory
+        embedding_version: Embedding version, defaults to the gallery's or the current one
+
+    Returns:
+        Version of the written snapshot
+    """
+    embedding_version = embedding_version or (gallery and gallery.embedding_version) or get_embedding_version()
+    directory = directory or get_gallery_dir(embedding_version)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if gallery is None or gallery.overlay or gallery.removed:
+        gallery = build_gallery(embedding_version)
+
+    version = int(time.time() * 1000)
+    models = {}
+
+    for name, matrix in gallery.base.matrices.items():
+        filename = f'gallery-{version}-{name}.npy'
+        _atomic_write(directory / filename, lambda fh, m=matrix: np.save(fh, np.ascontiguousarray(m, dtype=np.float32)))
+        models[name] = {'file': filename, 'dimension': int(matrix.shape[1])}
+
+    index = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'embedding_version': embedding_version,
+        'created_at': time.time(),
+        'watermark': gallery.watermark.isoformat() if gallery.watermark else None,
+        'watermark_id': gallery.watermark_id,
+        'user_ids': gallery.base.user_ids,
+        'models': models,
+    }
+    _atomic_write(directory / f'gallery-{version}.json', lambda fh: fh.write(json.dumps(index).encode()))
+    _atomic_write(directory / 'CURRENT', lambda fh: fh.write(str(version).encode()))
+
+    _prune_snapshots(directory, keep=getattr(settings, 'FACE_GALLERY_SNAPSHOT_KEEP', 2))
+    _prune_tombstones(getattr(settings, 'FACE_GALLERY_TOMBSTONE_DAYS', 7))
+    logger.info(
+        f"Face gallery snapshot {version} written for {embedding_version} ({len(gallery.base.user_ids)} users)"
+    )
+    return version
+
+
+def _prune_snapshots(directory: Path, keep: int) -> None:
+    """Remove old snapshot files (workers still mapping them keep their pages)."""
+    versions = sorted({
+        int(path.name.split('-')[1].split('.')[0])
+        for path in directory.glob('gallery-*.json')
+    }, reverse=True)
+    for version in versions[keep:]:
+        for path in directory.glob(f'gallery-{version}*'):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _prune_tombstones(days: int) -> None:
+    """Delete FaceData tombstones older than any snapshot a worker should still be replaying."""
+    from django.utils import timezone
+
+    from .models import FaceDataDeletion
+
+    FaceDataDeletion.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+
+
+def load_snapshot(embedding_version: str = None, directory: Path = None) -> Optional[EmbeddingGallery]:
+    """Open the current snapshot read-only via mmap (None if unavailable)."""
+    embedding_version = embedding_version or get_embedding_version()
+    directory = directory or get_gallery_dir(embedding_version)
+    version = read_current_version(directory)
+    if version is None:
+        return None
+
+    try:
+        with open(directory / f'gallery-{version}.json') as fh:
+            index = json.load(fh)
+        if index.get('format') != SNAPSHOT_FORMAT:
+            logger.warning(f"Ignoring face gallery snapshot {version} with format {index.get('format')}")
+            return None
+        if index.get('embedding_version') != embedding_version:
+            logger.warning(f"Ignoring face gallery snapshot {version} of {index.get('embedding_version')}")
+            return None
+        matrices = {
+            name: np.load(directory / meta['file'], mmap_mode='r')
+            for name, meta in index['models'].items()
+        }
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not load face gallery snapshot {version}: {e}")
+        return None
+
+    watermark = parse_datetime(index['watermark']) if index.get('watermark') else None
+    return EmbeddingGallery(
+        GalleryBase(index['user_ids'], matrices, version), embedding_version, watermark,
+        watermark_id=index.get('watermark_id')
+    )
+
+
+_state = {'pid': None, 'galleries': {}, 'checked_at': {}}
+_state_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+_snapshot_thread = None
+
+
+def get_gallery(embedding_version: str = None) -> EmbeddingGallery:
+    """
+    Return this process's gallery for an embedding version.
+
+    On first use the current snapshot is memory-mapped (or the gallery is
+    built from the database when no snapshot exists). Every
+    FACE_GALLERY_REFRESH_SECONDS a newer snapshot is picked up and changes
+    since the watermark are replayed from FaceData.last_updated.
+    """
+    embedding_version = embedding_version or get_embedding_version()
+    pid = os.getpid()
+    refresh_seconds = getattr(settings, 'FACE_GALLERY_REFRESH_SECONDS', 60)
+
+    def fresh():
+        return (
+            _state['pid'] == pid
+            and embedding_version in _state['galleries']
+            and time.monotonic() - _state['checked_at'].get(embedding_version, 0.0) < refresh_seconds
+        )
+
+    if fresh():
+        return _state['galleries'][embedding_version]
+
+    with _state_lock:
+        if fresh():
+            return _state['galleries'][embedding_version]
+
+        if _state['pid'] != pid:
+            _state.update(pid=pid, galleries={}, checked_at={})
+
+        gallery = _state['galleries'].get(embedding_version)
+        if gallery is None:
+            gallery = load_snapshot(embedding_version)
+            if gallery is None:
+                gallery = build_gallery(embedding_version)
+                schedule_snapshot_write(embedding_version)
+        else:
+            current = read_current_version(get_gallery_dir(embedding_version))
+            if current is not None and current != gallery.version:
+                gallery = load_snapshot(embedding_version) or gallery
+
+        gallery = replay_changes(gallery)
+
+        _state['galleries'][embedding_version] = gallery
+        _state['checked_at'][embedding_version] = time.monotonic()
+        return gallery
+
+
+def get_galleries() -> List[EmbeddingGallery]:
+    """Galleries of every active embedding version (more than one during a rollover)."""
+    return [get_gallery(version) for version in get_active_embedding_versions()]
+
+
+def gallery_changed() -> None:
+    """
+    Record an enrollment change.
+
+    This process replays the change on its next lookup and the shared
+    snapshot is rewritten in the background (at most once per
+    FACE_GALLERY_SNAPSHOT_MIN_INTERVAL); other workers pick up the change
+    through delta replay until then.
+    """
+    _state['checked_at'] = {}
+    schedule_snapshot_write()
+
+
+def schedule_snapshot_write(embedding_version: str = None) -> None:
+    """Rewrite a snapshot on a background thread unless one is recent or running."""
+    global _snapshot_thread
+
+    embedding_version = embedding_version or get_embedding_version()
+    directory = get_gallery_dir(embedding_version)
+    min_interval = getattr(settings, 'FACE_GALLERY_SNAPSHOT_MIN_INTERVAL', 300)
+    try:
+        age = time.time() - (directory / 'CURRENT').stat().st_mtime
+        if age < min_interval:
+            return
+    except OSError:
+        pass
+
+    with _snapshot_lock:
+        if _snapshot_thread is not None and _snapshot_thread.is_alive():
+            return
+        _snapshot_thread = threading.Thread(
+            target=_write_snapshot_in_background, args=(embedding_version,),
+            name='face-gallery-snapshot', daemon=True
+        )
+        _snapshot_thread.start()
+
+
+def _write_snapshot_in_background(embedding_version: str) -> None:
+    try:
+        write_snapshot(embedding_version=embedding_version)
+    except Exception as e:
+        logger.error(f"Face gallery snapshot failed: {e}", exc_info=True)
+    finally:
+        connection.close()
@@ -0,0 +1,156 @@
+"""
+Face Pipeline Instrumentation
+Per-stage latency timers and per-process latency histograms
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Histogram bucket upper bounds in milliseconds (plus an overflow bucket)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageTimer:
+    """
+    Accumulates stage durations for one recognition request.
+
+    Stages may repeat (e.g. the image is decoded by each step) and are
+    summed. Backends running on the embedding pool record from their own
+    threads, which is safe because each stage has its own key.
+
+    ``as_dict`` is the compact form stored on RecognitionLog.timings:
+    milliseconds per stage plus ``total``, ``image`` ([width, height])
+    and ``gallery`` (templates searched) when known.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.info: Dict = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record(self, name: str, milliseconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + milliseconds
+
+    def set(self, key: str, value) -> None:
+        self.info[key] = value
+
+    def set_image(self, shape) -> None:
+        """Record the size of the first decoded image."""
+        if 'image' not in self.info:
+            self.info['image'] = [int(shape[1]), int(shape[0])]
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict:
+        timings = {name: round(value, 1) for name, value in self.durations.items()}
+        timings['total'] = round(self.total_ms, 1)
+        timings.update(self.info)
+        return timings
+
+
+class NullTimer(StageTimer):
+    """Timer that records nothing, for callers that don't measure."""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def record(self, name: str, milliseconds: float) -> None:
+        pass
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def set_image(self, shape) -> None:
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (cumulative counts are derived on read)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, milliseconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, milliseconds)] += 1
+        self.count += 1
+        self.sum += milliseconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (None past the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return None
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum, 1),
+            'mean_ms': round(self.sum / self.count, 1) if self.count else None,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(self.buckets, self.counts)},
+                'overflow': self.counts[-1],
+            },
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def observe_timings(operation: str, timer: StageTimer) -> None:
+    """
+    Add a request's stage durations to this process's histograms.
+
+    Histograms are keyed ``<operation>.<stage>`` plus ``<operation>.total``.
+    """
+    durations = dict(timer.durations)
+    durations['total'] = timer.total_ms
+
+    with _histograms_lock:
+        for stage, milliseconds in durations.items():
+            key = f'{operation}.{stage}'
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = LatencyHistogram()
+            histogram.observe(milliseconds)
+
+    logger.debug(f"{operation} timings: {timer.as_dict()}")
+
+
+def get_latency_stats() -> Dict[str, Dict]:
+    """Histogram snapshots for this worker process."""
+    with _histograms_lock:
+        return {key: histogram.snapshot() for key, histogram in sorted(_histograms.items())}
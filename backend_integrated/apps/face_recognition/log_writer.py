@@ -0,0 +1,232 @@
+"""
+Recognition Log Writer
+Buffers RecognitionLog rows in memory and bulk-inserts them off the request path
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between reads of FaceRecognitionSettings.log_all_attempts
+SETTINGS_REFRESH_SECONDS = 30
+
+
+class RecognitionLogWriter:
+    """
+    Per-process write-behind queue for RecognitionLog.
+
+    A daemon thread drains the queue, inserting a batch once ``batch_size``
+    rows are waiting or ``flush_interval`` seconds after the first row of
+    the batch arrived. The queue is bounded: when it is full optional logs
+    are dropped and required ones (referenced by an Attendance row) are
+    written synchronously instead.
+
+    A batch that fails to insert is written again row by row, so one bad
+    row only loses itself. Required rows that still fail are kept and
+    retried with the next batch rather than dropped.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_queued: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.stats = {
+            'queued': 0,
+            'written': 0,
+            'batches': 0,
+            'sampled_out': 0,
+            'dropped': 0,
+            'sync_writes': 0,
+            'failed': 0,
+            'retried': 0,
+        }
+        self._retry = []
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='recognition-log-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def submit(self, log, required: bool = False) -> bool:
+        """
+        Queue an unsaved RecognitionLog (its uuid primary key is already set).
+
+        Args:
+            log: RecognitionLog instance
+            required: Another row references the log, so it is never dropped
+
+        Returns:
+            False if the log was dropped
+        """
+        try:
+            self.queue.put_nowait((log, required))
+        except queue.Full:
+            if not required:
+                self._count('dropped')
+                return False
+            log.save(force_insert=True)
+            self._count('sync_writes')
+            return True
+        self._count('queued')
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued log is written. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize()
+        stats['max_queued'] = self.queue.maxsize
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            batch, self._retry = self._retry, []
+            if batch:
+                # Back off before retrying required rows (the database may be down)
+                time.sleep(self.flush_interval)
+            else:
+                batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch) -> None:
+        from .models import RecognitionLog
+
+        try:
+            close_old_connections()
+            RecognitionLog.objects.bulk_create([log for log, _ in batch])
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception as e:
+            logger.warning(f"Batch insert of {len(batch)} recognition logs failed, writing them one by one: {e}")
+            for log, required in batch:
+                if self._write_one(log):
+                    self._count('written')
+                elif required:
+                    # Still in the queue's unfinished count, so flush() waits for it
+                    self._retry.append((log, required))
+                    self._count('retried')
+                    continue
+                else:
+                    self._count('failed')
+                self.queue.task_done()
+            return
+
+        for _ in batch:
+            self.queue.task_done()
+
+    def _write_one(self, log) -> bool:
+        from .models import RecognitionLog
+
+        try:
+            log.save(force_insert=True)
+            return True
+        except Exception as e:
+            try:
+                # The failed batch may have inserted the row before it stopped
+                if RecognitionLog.objects.filter(pk=log.pk).exists():
+                    return True
+            except Exception:
+                pass
+            logger.error(f"Failed to write recognition log {log.pk}: {e}", exc_info=True)
+            return False
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+_log_settings = {'log_all_attempts': True, 'loaded_at': None}
+
+
+def get_log_writer() -> RecognitionLogWriter:
+    """Return this process's writer, recreated after a fork like the embedding executor."""
+    global _writer, _writer_pid
+
+    pid = os.getpid()
+    if _writer is None or _writer_pid != pid:
+        with _writer_lock:
+            if _writer is None or _writer_pid != pid:
+                _writer = RecognitionLogWriter(
+                    batch_size=getattr(settings, 'FACE_LOG_BATCH_SIZE', 100),
+                    flush_interval=getattr(settings, 'FACE_LOG_FLUSH_MS', 1000) / 1000,
+                    max_queued=getattr(settings, 'FACE_LOG_MAX_QUEUED', 10000)
+                )
+                _writer_pid = pid
+    return _writer
+
+
+def _log_all_attempts() -> bool:
+    """FaceRecognitionSettings.log_all_attempts, re-read at most every SETTINGS_REFRESH_SECONDS."""
+    loaded_at = _log_settings['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > SETTINGS_REFRESH_SECONDS:
+        from .models import FaceRecognitionSettings
+        _log_settings['log_all_attempts'] = FaceRecognitionSettings.get_settings().log_all_attempts
+        _log_settings['loaded_at'] = time.monotonic()
+    return _log_settings['log_all_attempts']
+
+
+def enqueue_log(log, required: bool = False) -> bool:
+    """
+    Record a recognition attempt without a database round trip.
+
+    Optional logs honor ``log_all_attempts`` (only successful recognitions
+    are kept when it is off) and FACE_LOG_SAMPLE_RATE. Required logs are
+    always written.
+
+    Returns:
+        True if the log was queued (or written)
+    """
+    writer = get_log_writer()
+
+    if not required:
+        if log.status != 'success' and not _log_all_attempts():
+            writer._count('sampled_out')
+            return False
+        sample_rate = getattr(settings, 'FACE_LOG_SAMPLE_RATE', 1.0)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            writer._count('sampled_out')
+            return False
+
+    return writer.submit(log, required=required)
+
+
+def get_log_writer_stats() -> Optional[Dict]:
+    """Writer counters for this process (None before the first log)."""
+    if _writer is None or _writer_pid != os.getpid():
+        return None
+    return _writer.get_stats()
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.flush()
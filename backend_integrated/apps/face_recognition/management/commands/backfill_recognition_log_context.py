@@ -0,0 +1,92 @@
+"""
+Fill department, session and subject on recognition logs written before
+those fields existed.
+
+Department comes from the recognized user; session and subject come from
+the attendance record that references the log. Logs are walked in
+primary key order in chunks, so a stopped run can be restarted with
+--after set to the last id it printed.
+
+Usage:
+    python manage.py backfill_recognition_log_context
+    python manage.py backfill_recognition_log_context --chunk-size 1000 --dry-run
+"""
+
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.attendance.models import Attendance, ClassSession
+from apps.face_recognition.models import RecognitionLog
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Backfill denormalized department/session/subject on recognition logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Logs per chunk')
+        parser.add_argument('--after', help='Resume after this log id')
+        parser.add_argument('--dry-run', action='store_true', help='Count logs that would change')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = options['after']
+        scanned = 0
+        updated = 0
+        started = time.perf_counter()
+
+        pending = RecognitionLog.objects.filter(department__isnull=True, session__isnull=True).order_by('pk')
+
+        while True:
+            chunk = pending.filter(pk__gt=last_id) if last_id else pending
+            rows = list(chunk.values('id', 'recognized_user_id')[:chunk_size])
+            if not rows:
+                break
+
+            context = self._context(rows)
+            groups = defaultdict(list)
+            for row in rows:
+                values = context.get(row['id'])
+                if values:
+                    groups[values].append(row['id'])
+
+            for (department_id, session_id, subject_id), log_ids in groups.items():
+                if not options['dry_run']:
+                    RecognitionLog.objects.filter(id__in=log_ids).update(
+                        department_id=department_id, session_id=session_id, subject_id=subject_id
+                    )
+                updated += len(log_ids)
+
+            scanned += len(rows)
+            last_id = rows[-1]['id']
+            self.stdout.write(f"  {scanned} scanned, {updated} updated (last id {last_id})")
+
+        verb = 'would be updated' if options['dry_run'] else 'updated'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{scanned} logs scanned, {updated} {verb} [{elapsed:.1f}s]"))
+
+    def _context(self, rows):
+        """(department_id, session_id, subject_id) per log id, with three queries per chunk."""
+        log_ids = [row['id'] for row in rows]
+        user_ids = {row['recognized_user_id'] for row in rows if row['recognized_user_id']}
+
+        departments = dict(User.objects.filter(id__in=user_ids).values_list('id', 'department_id'))
+        log_sessions = dict(
+            Attendance.objects.filter(recognition_log_id__in=log_ids).values_list('recognition_log_id', 'session_id')
+        )
+        session_subjects = dict(
+            ClassSession.objects.filter(id__in=set(log_sessions.values())).values_list('id', 'subject_id')
+        )
+
+        context = {}
+        for row in rows:
+            department_id = departments.get(row['recognized_user_id'])
+            session_id = log_sessions.get(row['id'])
+            subject_id = session_subjects.get(session_id)
+            if department_id or session_id:
+                context[row['id']] = (department_id, session_id, subject_id)
+        return context
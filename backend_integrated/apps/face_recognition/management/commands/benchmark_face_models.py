@@ -0,0 +1,197 @@
+"""
+Compare fp32 and int8 InsightFace models for accuracy and latency.
+
+Usage:
+    python manage.py benchmark_face_models --quantize
+    python manage.py benchmark_face_models --images /path/to/faces --limit 100 --output report.json
+"""
+
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.face_recognition.models import FaceImage
+from apps.face_recognition.runtime import (
+    create_face_analysis, quantize_face_models, quantized_model_path,
+    QUANTIZED_TASKS,
+)
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark fp32 vs int8 InsightFace models (latency and embedding agreement)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', help='Directory of face images (defaults to enrolled FaceImage files)')
+        parser.add_argument('--limit', type=int, default=50, help='Maximum number of images to evaluate')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per image and variant')
+        parser.add_argument('--quantize', action='store_true', help='Generate missing int8 model files first')
+        parser.add_argument('--force', action='store_true', help='Regenerate int8 model files')
+        parser.add_argument('--output', help='Write the report as JSON to this path')
+
+    def handle(self, *args, **options):
+        images = self._load_images(options['images'], options['limit'])
+        if not images:
+            raise CommandError('No images to benchmark')
+
+        fp32_app = create_face_analysis(variant='fp32')
+
+        if options['quantize'] or options['force']:
+            outputs = quantize_face_models(fp32_app, force=options['force'])
+            for taskname, path in outputs.items():
+                self.stdout.write(f'int8 {taskname} model: {path}')
+
+        missing = [
+            taskname for taskname in QUANTIZED_TASKS
+            if taskname in fp32_app.models
+            and not os.path.exists(quantized_model_path(fp32_app.models[taskname].model_file))
+        ]
+        if missing:
+            raise CommandError(f"int8 models missing for {', '.join(missing)}; run with --quantize")
+
+        int8_app = create_face_analysis(variant='int8')
+
+        fp32 = self._run(fp32_app, images, options['repeat'])
+        int8 = self._run(int8_app, images, options['repeat'])
+
+        report = {
+            'images': len(images),
+            'repeat': options['repeat'],
+            'model_sizes_mb': self._model_sizes(fp32_app),
+            'fp32': self._latency_summary(fp32['latencies']),
+            'int8': self._latency_summary(int8['latencies']),
+            'agreement': self._agreement(fp32['results'], int8['results']),
+        }
+
+        self._print_report(report)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _load_images(self, directory, limit):
+        """Load up to ``limit`` RGB images from a directory or FaceImage storage."""
+        images = []
+
+        if directory:
+            for name in sorted(os.listdir(directory)):
+                if len(images) >= limit:
+                    break
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                img = cv2.imread(os.path.join(directory, name), cv2.IMREAD_COLOR)
+                if img is not None:
+                    images.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            return images
+
+        for face_image in FaceImage.objects.all()[:limit]:
+            try:
+                with face_image.image.open('rb') as fh:
+                    data = fh.read()
+            except (OSError, ValueError):
+                continue
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        return images
+
+    def _run(self, face_app, images, repeat):
+        """Time ``face_app.get`` per image and keep the first face of the last run."""
+        # Warm up (arena allocation, graph optimization)
+        face_app.get(images[0])
+
+        latencies = []
+        results = []
+        for img in images:
+            faces = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                faces = face_app.get(img)
+                latencies.append((time.perf_counter() - started) * 1000)
+            results.append(faces[0] if faces else None)
+        return {'latencies': latencies, 'results': results}
+
+    def _latency_summary(self, latencies):
+        values = np.array(latencies)
+        return {
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+        }
+
+    def _agreement(self, fp32_faces, int8_faces):
+        """Detection agreement, bbox IoU and embedding cosine similarity between variants."""
+        both = 0
+        detection_mismatches = 0
+        ious = []
+        similarities = []
+
+        for a, b in zip(fp32_faces, int8_faces):
+            if (a is None) != (b is None):
+                detection_mismatches += 1
+                continue
+            if a is None:
+                continue
+            both += 1
+            ious.append(self._iou(a.bbox, b.bbox))
+            emb_a = a.normed_embedding
+            emb_b = b.normed_embedding
+            similarities.append(float(np.dot(emb_a, emb_b)))
+
+        return {
+            'faces_compared': both,
+            'detection_mismatches': detection_mismatches,
+            'mean_bbox_iou': float(np.mean(ious)) if ious else None,
+            'mean_cosine': float(np.mean(similarities)) if similarities else None,
+            'min_cosine': float(np.min(similarities)) if similarities else None,
+        }
+
+    @staticmethod
+    def _iou(a, b):
+        x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+        x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+        inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return float(inter / union) if union > 0 else 0.0
+
+    def _model_sizes(self, face_app):
+        sizes = {}
+        for taskname in QUANTIZED_TASKS:
+            model = face_app.models.get(taskname)
+            if model is None:
+                continue
+            sizes[taskname] = {
+                'fp32': round(os.path.getsize(model.model_file) / 1e6, 2),
+                'int8': round(os.path.getsize(quantized_model_path(model.model_file)) / 1e6, 2),
+            }
+        return sizes
+
+    def _print_report(self, report):
+        self.stdout.write(f"\nImages: {report['images']} x {report['repeat']} runs")
+
+        self.stdout.write('\nModel size (MB)')
+        for taskname, sizes in report['model_sizes_mb'].items():
+            self.stdout.write(f"  {taskname:<12} fp32 {sizes['fp32']:>8}  int8 {sizes['int8']:>8}")
+
+        self.stdout.write('\nLatency per image (ms)')
+        self.stdout.write(f"  {'variant':<8} {'mean':>8} {'p50':>8} {'p95':>8}")
+        for variant in ('fp32', 'int8'):
+            summary = report[variant]
+            self.stdout.write(
+                f"  {variant:<8} {summary['mean_ms']:>8.1f} {summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f}"
+            )
+
+        agreement = report['agreement']
+        self.stdout.write('\nAccuracy (int8 vs fp32)')
+        self.stdout.write(f"  faces compared:        {agreement['faces_compared']}")
+        self.stdout.write(f"  detection mismatches:  {agreement['detection_mismatches']}")
+        self.stdout.write(f"  mean bbox IoU:         {agreement['mean_bbox_iou']}")
+        self.stdout.write(f"  mean embedding cosine: {agreement['mean_cosine']}")
+        self.stdout.write(f"  min embedding cosine:  {agreement['min_cosine']}")
@@ -0,0 +1,50 @@
+"""
+Write a memory-mappable snapshot of the enrolled face gallery.
+
+Every worker maps the current snapshot read-only and replays FaceData
+changes made after it, so run this after bulk enrollment changes or on
+a schedule to keep the replayed delta small.
+
+Usage:
+    python manage.py build_face_gallery
+    python manage.py build_face_gallery --embedding-version buffalo_l+Facenet
+    python manage.py build_face_gallery --dir /var/lib/presenceiq/gallery
+"""
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from apps.face_recognition.gallery import build_gallery, write_snapshot, get_gallery_dir
+from apps.face_recognition.runtime import get_active_embedding_versions
+
+
+class Command(BaseCommand):
+    help = 'Build the face embedding gallery snapshot from FaceData'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Snapshot root directory (defaults to FACE_GALLERY_DIR)')
+        parser.add_argument(
+            '--embedding-version', action='append', dest='versions',
+            help='Embedding version to build (repeatable, defaults to every active version)'
+        )
+
+    def handle(self, *args, **options):
+        for embedding_version in options['versions'] or get_active_embedding_versions():
+            directory = get_gallery_dir(embedding_version)
+            if options['dir']:
+                directory = Path(options['dir']) / directory.name
+
+            started = time.perf_counter()
+            gallery = build_gallery(embedding_version)
+            version = write_snapshot(gallery, directory)
+            elapsed = time.perf_counter() - started
+
+            sizes = ', '.join(
+                f"{name} {matrix.shape[1]}d" for name, matrix in gallery.base.matrices.items()
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{embedding_version} snapshot {version}: {len(gallery)} users ({sizes}) "
+                f"in {directory} [{elapsed:.1f}s]"
+            ))
@@ -0,0 +1,361 @@
+"""
+Calibrate the recognition threshold and model weights offline.
+
+Every enrolled FaceImage (except the template angle) is embedded once and
+scored against the gallery templates: against its own user's template
+for genuine pairs, and against other users' templates for impostor pairs.
+Scores are computed in matrix blocks and only accumulated into fixed-size
+histograms, so memory stays within --memory-mb for tens of millions of
+pairs. Probe embeddings are cached on disk (--cache) for reruns.
+
+Historic RecognitionLog outcomes are used to estimate how many past
+attempts the recommended threshold would have turned into retries.
+
+Usage:
+    python manage.py calibrate_thresholds
+    python manage.py calibrate_thresholds --target-far 0.0001 --output calibration.json
+    python manage.py calibrate_thresholds --cache /var/tmp/probes --apply
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.face_recognition.evaluation import (
+    PairScoreHistogram, roc_table, threshold_for_far, equal_error_rate, evaluate_weights,
+)
+from apps.face_recognition.gallery import build_gallery, normalize
+from apps.face_recognition.models import FaceImage, FaceRecognitionSettings, RecognitionLog
+from apps.face_recognition.runtime import get_embedding_version, limit_worker_threads
+
+
+FAR_TARGETS = (1e-2, 1e-3, 1e-4, 1e-5)
+MODELS = ('insightface', 'deepface')
+
+_worker = {}
+
+
+def _init_worker(version, threads):
+    """Load the embedding models once per worker process."""
+    import django
+    django.setup()
+    limit_worker_threads(threads)
+
+    from apps.face_recognition.services import FaceEmbeddingService
+    _worker['embedder'] = FaceEmbeddingService(version)
+
+
+def _embed_image(row, image_data):
+    result = _worker['embedder'].generate_embeddings(image_data)
+    if not result.get('success'):
+        return row, None
+    return row, {name: result.get(name) for name in MODELS}
+
+
+class Command(BaseCommand):
+    help = 'Compute genuine/impostor ROC tables and recommend a threshold and model weights'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--embedding-version', help='Gallery to evaluate (defaults to the configured models)')
+        parser.add_argument('--target-far', type=float, default=1e-4, help='False accept rate to recommend for')
+        parser.add_argument('--memory-mb', type=int, default=512, help='Memory budget for score blocks')
+        parser.add_argument('--max-impostor-pairs', type=int, default=50_000_000,
+                            help='Sample impostor templates above this many pairs')
+        parser.add_argument('--bins', type=int, default=200, help='Histogram bins per model')
+        parser.add_argument('--cache', help='Directory for cached probe embeddings')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Embedding worker processes')
+        parser.add_argument('--threads', type=int, default=1, help='Inference threads per worker')
+        parser.add_argument('--template-angle', default='center', help='Angle stored as the template (excluded from probes)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for impostor sampling')
+        parser.add_argument('--output', help='Write the report as JSON to this path')
+        parser.add_argument('--apply', action='store_true', help='Save the recommended threshold and weights')
+
+    def handle(self, *args, **options):
+        version = options['embedding_version'] or get_embedding_version()
+        started = time.perf_counter()
+
+        template_ids, templates, template_present = build_gallery(version).dense()
+        if len(template_ids) < 2:
+            raise CommandError(f'Need at least two enrolled users with {version} embeddings')
+
+        probes = self._load_probes(version, template_ids, templates, options)
+        if not len(probes['user_index']):
+            raise CommandError('No probe images could be embedded')
+
+        self.stdout.write(
+            f"{len(template_ids)} templates, {len(probes['user_index'])} probe images "
+            f"[{time.perf_counter() - started:.1f}s]"
+        )
+
+        genuine, impostor, pairs = self._score(templates, template_present, probes, options)
+        self.stdout.write(
+            f"Scored {genuine.total} genuine and {impostor.total} impostor pairs "
+            f"({pairs} similarities computed) [{time.perf_counter() - started:.1f}s]"
+        )
+
+        report = self._report(genuine, impostor, options['target_far'])
+        report['embedding_version'] = version
+        report['historic'] = self._historic(report['recommended']['min_confidence_threshold'])
+
+        self._print_report(report)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options['apply']:
+            recognition_settings = FaceRecognitionSettings.get_settings()
+            for field, value in report['recommended'].items():
+                setattr(recognition_settings, field, round(value, 4))
+            recognition_settings.save()
+            self.stdout.write(self.style.SUCCESS('Recommended threshold and weights saved'))
+
+    def _load_probes(self, version, template_ids, templates, options):
+        """
+        Embed every probe image once (or reuse the cache).
+
+        Returns:
+            {'user_index': int array into template_ids, model: (n, d) memmap, model_present: bool array}
+        """
+        user_rows = {user_id: row for row, user_id in enumerate(template_ids)}
+        face_images = FaceImage.objects.filter(
+            face_data__user_id__in=list(template_ids),
+        ).exclude(angle=options['template_angle']).values_list('id', 'face_data__user_id', 'image')
+        face_images = [
+            (str(image_id), str(user_id), name) for image_id, user_id, name in face_images
+            if str(user_id) in user_rows
+        ]
+
+        cache = Path(options['cache']) if options['cache'] else None
+        index_path = cache / 'probes.json' if cache else None
+        if index_path and index_path.exists():
+            with open(index_path) as fh:
+                index = json.load(fh)
+            if (index['version'] == version
+                    and index['dimensions'] == {name: templates[name].shape[1] for name in MODELS}
+                    and index['image_ids'] == [image_id for image_id, _, _ in face_images]):
+                self.stdout.write(f'Using cached probe embeddings in {cache}')
+                return self._open_probes(cache, index, user_rows)
+
+        directory = cache or Path(os.environ.get('TMPDIR', '/tmp')) / f'calibration-probes-{os.getpid()}'
+        directory.mkdir(parents=True, exist_ok=True)
+
+        count = len(face_images)
+        matrices = {
+            name: np.lib.format.open_memmap(
+                directory / f'probes-{name}.npy', mode='w+', dtype=np.float32,
+                shape=(count, templates[name].shape[1])
+            )
+            for name in MODELS
+        }
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+
+        from django.core.files.storage import default_storage
+
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=_init_worker,
+            initargs=(version, options['threads']),
+        ) as executor:
+            batch_size = options['workers'] * 8
+            for offset in range(0, count, batch_size):
+                futures = []
+                for row in range(offset, min(offset + batch_size, count)):
+                    try:
+                        with default_storage.open(face_images[row][2], 'rb') as fh:
+                            futures.append(executor.submit(_embed_image, row, fh.read()))
+                    except (OSError, ValueError):
+                        continue
+                for future in futures:
+                    row, embeddings = future.result()
+                    if embeddings is None:
+                        continue
+                    for name in MODELS:
+                        vector = normalize(embeddings[name])
+                        if vector is not None and len(vector) == matrices[name].shape[1]:
+                            matrices[name][row] = vector
+                done = min(offset + batch_size, count)
+                self.stdout.write(f'  embedded {done}/{count} probe images')
+
+        for matrix in matrices.values():
+            matrix.flush()
+
+        index = {
+            'version': version,
+            'dimensions': {name: templates[name].shape[1] for name in MODELS},
+            'image_ids': [image_id for image_id, _, _ in face_images],
+            'user_ids': [user_id for _, user_id, _ in face_images],
+        }
+        with open(directory / 'probes.json', 'w') as fh:
+            json.dump(index, fh)
+
+        return self._open_probes(directory, index, user_rows)
+
+    def _open_probes(self, directory, index, user_rows):
+        probes = {'user_index': np.array([user_rows[user_id] for user_id in index['user_ids']], dtype=np.int64)}
+        for name in MODELS:
+            matrix = np.load(directory / f'probes-{name}.npy', mmap_mode='r')
+            probes[name] = matrix
+            # Row norms in chunks so the whole matrix is never resident
+            probes[f'{name}_present'] = np.concatenate([
+                np.einsum('ij,ij->i', matrix[i:i + 65536], matrix[i:i + 65536]) > 0
+                for i in range(0, max(len(matrix), 1), 65536)
+            ]) if len(matrix) else np.zeros(0, dtype=bool)
+        return probes
+
+    def _score(self, templates, template_present, probes, options):
+        """Accumulate genuine and impostor histograms block by block."""
+        genuine = PairScoreHistogram(options['bins'])
+        impostor = PairScoreHistogram(options['bins'])
+        rng = np.random.default_rng(options['seed'])
+
+        n_probes = len(probes['user_index'])
+        n_templates = len(next(iter(templates.values())))
+
+        # Impostor sampling keeps the work bounded on very large galleries
+        fraction = min(1.0, options['max_impostor_pairs'] / max(n_probes * (n_templates - 1), 1))
+
+        # ~8 float32 block-sized arrays live at once (similarities, masks, temporaries)
+        cells = max(options['memory_mb'] * 1024 * 1024 // (8 * 4), 1024)
+        template_block = min(n_templates, max(256, int(math.sqrt(cells))))
+        probe_block = max(1, cells // template_block)
+
+        pairs = 0
+        for p0 in range(0, n_probes, probe_block):
+            p1 = min(p0 + probe_block, n_probes)
+            users = probes['user_index'][p0:p1]
+            probe_rows = {
+                name: np.asarray(probes[name][p0:p1]) for name in MODELS
+            }
+
+            columns = np.arange(n_templates)
+            if fraction < 1.0:
+                sample = rng.choice(n_templates, size=max(1, int(math.ceil(fraction * n_templates))), replace=False)
+                columns = np.union1d(sample, np.unique(users))
+
+            for t0 in range(0, len(columns), template_block):
+                cols = columns[t0:t0 + template_block]
+                similarity = {}
+                masks = {}
+                for name in MODELS:
+                    if name not in templates:
+                        similarity[name] = None
+                        masks[name] = None
+                        continue
+                    similarity[name] = (probe_rows[name] @ templates[name][cols].T + 1.0) / 2.0
+                    masks[name] = np.outer(probes[f'{name}_present'][p0:p1], template_present[name][cols])
+
+                same_user = users[:, None] == cols[None, :]
+                genuine.add(similarity['insightface'], similarity['deepface'],
+                            masks['insightface'], masks['deepface'], same_user)
+                impostor.add(similarity['insightface'], similarity['deepface'],
+                             masks['insightface'], masks['deepface'], ~same_user)
+                pairs += same_user.size
+
+        return genuine, impostor, pairs
+
+    def _report(self, genuine, impostor, target_far):
+        recognition_settings = FaceRecognitionSettings.get_settings()
+        weight_sum = recognition_settings.insightface_weight + recognition_settings.deepface_weight
+        current_share = recognition_settings.insightface_weight / weight_sum if weight_sum else 0.5
+
+        current_roc = roc_table(genuine.combined(current_share), impostor.combined(current_share))
+        current = {
+            'insightface_weight': recognition_settings.insightface_weight,
+            'deepface_weight': recognition_settings.deepface_weight,
+            'min_confidence_threshold': recognition_settings.min_confidence_threshold,
+        }
+        row = min(int(current['min_confidence_threshold'] * genuine.bins), genuine.bins - 1)
+        current['far'] = float(current_roc['far'][row])
+        current['frr'] = float(current_roc['frr'][row])
+
+        shares = sorted(set(np.round(np.linspace(0, 1, 21), 2).tolist()) | {round(current_share, 4)})
+        weights = evaluate_weights(genuine, impostor, target_far, shares)
+        best = weights[0]
+
+        best_roc = roc_table(genuine.combined(best['insightface_share']), impostor.combined(best['insightface_share']))
+        scale = weight_sum or 1.0
+
+        return {
+            'pairs': {'genuine': genuine.total, 'impostor': impostor.total},
+            'target_far': target_far,
+            'current': current,
+            'current_roc': [
+                {'far_target': far, **threshold_for_far(current_roc, far)} for far in FAR_TARGETS
+            ],
+            'current_eer': equal_error_rate(current_roc),
+            'weights': weights,
+            'recommended_roc': [
+                {'far_target': far, **threshold_for_far(best_roc, far)} for far in FAR_TARGETS
+            ],
+            'recommended': {
+                'insightface_weight': best['insightface_share'] * scale,
+                'deepface_weight': (1 - best['insightface_share']) * scale,
+                'min_confidence_threshold': best['threshold'],
+            },
+            'recommended_point': {'far': best['far'], 'frr': best['frr'], 'eer': best['eer']},
+        }
+
+    def _historic(self, threshold):
+        """Past recognition outcomes replayed against a threshold."""
+        counts = {'success': 0, 'success_below': 0, 'rejected': 0, 'rejected_above': 0}
+        logs = RecognitionLog.objects.filter(
+            status__in=['success', 'low_confidence', 'failed'], confidence_score__gt=0
+        ).values_list('status', 'confidence_score')
+        for log_status, confidence in logs.iterator(chunk_size=5000):
+            if log_status == 'success':
+                counts['success'] += 1
+                counts['success_below'] += confidence < threshold
+            else:
+                counts['rejected'] += 1
+                counts['rejected_above'] += confidence >= threshold
+        return counts
+
+    def _print_report(self, report):
+        current = report['current']
+        self.stdout.write(
+            f"\nCurrent: threshold {current['min_confidence_threshold']:.3f}, weights "
+            f"insightface {current['insightface_weight']:.2f} / deepface {current['deepface_weight']:.2f} "
+            f"-> FAR {current['far']:.2e}, FRR {current['frr']:.4f}, EER {report['current_eer']['eer']:.4f}"
+        )
+
+        self.stdout.write('\nOperating points (current weights)')
+        self.stdout.write(f"  {'target FAR':>10} {'threshold':>10} {'FAR':>10} {'FRR':>8}")
+        for point in report['current_roc']:
+            self.stdout.write(
+                f"  {point['far_target']:>10.0e} {point['threshold']:>10.3f} {point['far']:>10.2e} {point['frr']:>8.4f}"
+            )
+
+        self.stdout.write(f"\nWeights at FAR <= {report['target_far']:.0e} (best first)")
+        self.stdout.write(f"  {'insightface':>11} {'threshold':>10} {'FRR':>8} {'EER':>8}")
+        for result in report['weights'][:8]:
+            self.stdout.write(
+                f"  {result['insightface_share']:>11.2f} {result['threshold']:>10.3f} "
+                f"{result['frr']:>8.4f} {result['eer']:>8.4f}"
+            )
+
+        recommended = report['recommended']
+        historic = report['historic']
+        self.stdout.write(self.style.SUCCESS(
+            f"\nRecommended: min_confidence_threshold {recommended['min_confidence_threshold']:.3f}, "
+            f"insightface_weight {recommended['insightface_weight']:.3f}, "
+            f"deepface_weight {recommended['deepface_weight']:.3f} "
+            f"(FAR {report['recommended_point']['far']:.2e}, FRR {report['recommended_point']['frr']:.4f})"
+        ))
+        if historic['success'] or historic['rejected']:
+            self.stdout.write(
+                f"Historic attempts: {historic['success_below']}/{historic['success']} past successes would now "
+                f"be retries, {historic['rejected_above']}/{historic['rejected']} past rejections would pass "
+                f"(scores logged under the old weights)"
+            )
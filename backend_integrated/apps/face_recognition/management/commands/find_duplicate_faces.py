@@ -0,0 +1,55 @@
+"""
+Find near-duplicate identities across the whole enrolled gallery.
+
+Every pair of enrolled users is scored with blocked matrix products
+(see gallery.find_similar_pairs), so memory stays bounded at tens of
+thousands of enrollees. Pairs at or above the threshold are stored as
+DuplicateFaceFlag records for review; pairs flagged before (including
+dismissed ones) are not raised again.
+
+Usage:
+    python manage.py find_duplicate_faces
+    python manage.py find_duplicate_faces --threshold 0.9 --block-size 4096 --dry-run
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.face_recognition.duplicates import get_duplicate_threshold, get_match_weights, record_duplicate_pairs
+from apps.face_recognition.gallery import build_gallery, find_similar_pairs
+from apps.face_recognition.runtime import get_active_embedding_versions
+
+
+class Command(BaseCommand):
+    help = 'Scan the face gallery for near-duplicate identities and flag them for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, help='Confidence threshold (defaults to FACE_DUPLICATE_THRESHOLD)')
+        parser.add_argument('--block-size', type=int, default=2048, help='Rows per matrix block')
+        parser.add_argument('--embedding-version', action='append', dest='versions',
+                            help='Gallery to scan (repeatable, defaults to every active version)')
+        parser.add_argument('--dry-run', action='store_true', help='Print pairs without creating flags')
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] or get_duplicate_threshold()
+        weights = get_match_weights()
+
+        for embedding_version in options['versions'] or get_active_embedding_versions():
+            started = time.perf_counter()
+            user_ids, matrices, present = build_gallery(embedding_version).dense()
+            pairs = find_similar_pairs(user_ids, matrices, present, weights, threshold, options['block_size'])
+
+            if options['dry_run']:
+                found = 0
+                for user_a, user_b, confidence, similarities in pairs:
+                    found += 1
+                    self.stdout.write(f"  {user_a}  {user_b}  {confidence:.4f}")
+                summary = f"{found} pairs"
+            else:
+                summary = f"{record_duplicate_pairs(pairs, embedding_version)} new flags"
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"{embedding_version}: {len(user_ids)} users scanned at >= {threshold}, {summary} [{elapsed:.1f}s]"
+            ))
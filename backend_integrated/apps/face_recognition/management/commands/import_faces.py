@@ -0,0 +1,408 @@
+"""
+Bulk-enroll students from a directory tree or zip of angle images.
+
+Expected layout (any leading folders are ignored):
+    <student>/<angle>.<jpg|jpeg|png>
+
+where <student> is the user's student_id (or --match-field) and <angle>
+is one of the enrollment angles (center, up, down, left, right, up_left,
+up_right, down_left, down_right; '-' and ' ' are accepted for '_').
+
+Images are read one batch at a time and checked (detection, quality,
+embeddings) on a process pool. Accepted angles are written with
+bulk_create; rejected images go to a CSV report. Completed enrollments
+get the same duplicate identity check as API enrollments, so accounts
+sharing a face are flagged for review. Finished students and the running
+totals are recorded in a checkpoint file, so a rerun skips them and
+continues from where an interrupted import stopped.
+
+Usage:
+    python manage.py import_faces /data/onboarding-2026
+    python manage.py import_faces students.zip --workers 8 --rejects rejects.csv
+    python manage.py import_faces students.zip --match-field email --replace
+"""
+
+import csv
+import json
+import os
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from apps.face_recognition.models import FaceData, FaceImage
+from apps.face_recognition.runtime import get_embedding_version, limit_worker_threads
+
+User = get_user_model()
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ANGLES = [angle for angle, _ in FaceImage.ANGLE_CHOICES]
+REJECT_FIELDS = ['student', 'angle', 'file', 'reason']
+
+_worker = {}
+
+
+def _init_worker(threads):
+    """Load the face models once per worker process."""
+    import django
+    django.setup()
+    limit_worker_threads(threads)
+
+    from apps.face_recognition.services import FaceRecognitionEngine
+    _worker['engine'] = FaceRecognitionEngine()
+
+
+def _enroll_student(key, images):
+    """
+    Run the enrollment checks on a student's images.
+
+    Args:
+        key: Student key from the import
+        images: (angle, file name, image bytes) triples
+
+    Returns:
+        (key, accepted, rejects) where accepted maps angle to metrics and
+        embeddings, and rejects is a list of (angle, file name, reason)
+    """
+    engine = _worker['engine']
+    accepted = {}
+    rejects = []
+
+    for angle, name, image_data in images:
+        try:
+            result = engine.enroll_face(image_data, angle)
+        except Exception as e:
+            rejects.append((angle, name, f'Processing error: {e}'))
+            continue
+
+        if not result['success']:
+            rejects.append((angle, name, result.get('error', 'Enrollment failed')))
+            continue
+
+        embeddings = result['embeddings']
+        if embeddings['timed_out']:
+            rejects.append((angle, name, f"Embedding timed out ({', '.join(embeddings['timed_out'])})"))
+            continue
+
+        accepted[angle] = {
+            'file': name,
+            'brightness': result['quality_result']['brightness'],
+            'sharpness': result['quality_result']['sharpness'],
+            'quality_score': result['quality_result']['quality_score'],
+            'detection_confidence': result['detection_result']['detections'][0]['confidence'],
+            'embeddings': {
+                'version': embeddings['version'],
+                'insightface': embeddings['insightface'],
+                'deepface': embeddings['deepface'],
+                'dlib': embeddings['dlib'],
+            },
+        }
+
+    return key, accepted, rejects
+
+
+class ImageSource:
+    """Lists and reads angle images from a directory tree or a zip file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def names(self):
+        if self.zip is not None:
+            for info in self.zip.infolist():
+                if not info.is_dir():
+                    yield info.filename
+            return
+
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            for name in sorted(files):
+                yield PurePosixPath(Path(root, name).relative_to(self.path)).as_posix()
+
+    def read(self, name: str) -> bytes:
+        if self.zip is not None:
+            return self.zip.read(name)
+        with open(self.path / name, 'rb') as fh:
+            return fh.read()
+
+    def students(self):
+        """Group image names by student, skipping files that don't fit the layout."""
+        students = OrderedDict()
+        skipped = []
+        for name in self.names():
+            parts = PurePosixPath(name).parts
+            if len(parts) < 2 or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            angle = PurePosixPath(name).stem.lower().replace('-', '_').replace(' ', '_')
+            if angle not in ANGLES:
+                skipped.append((parts[-2], name))
+                continue
+            students.setdefault(parts[-2], {})[angle] = name
+        return students, skipped
+
+
+class Command(BaseCommand):
+    help = 'Bulk-enroll faces from a directory or zip of per-student angle images (restartable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or zip file of <student>/<angle>.jpg images')
+        parser.add_argument(
+            '--match-field', default='student_id', choices=['student_id', 'enrollment_number', 'email'],
+            help='User field the student folder names refer to'
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--threads', type=int, default=1, help='Inference threads per worker (0 = runtime default)')
+        parser.add_argument('--batch', type=int, default=50, help='Students per bulk write and checkpoint')
+        parser.add_argument('--checkpoint', help='Checkpoint file (defaults to <source>.import.json)')
+        parser.add_argument('--rejects', help='Rejects CSV (defaults to <source>.rejects.csv)')
+        parser.add_argument('--replace', action='store_true', help='Re-enroll students who are already enrolled')
+
+    def handle(self, *args, **options):
+        path = Path(options['source'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist')
+
+        source = ImageSource(path)
+        checkpoint_path = Path(options['checkpoint'] or f'{path}.import.json')
+        rejects_path = Path(options['rejects'] or f'{path}.rejects.csv')
+        self.match_field = options['match_field']
+        self.replace = options['replace']
+        self.version = get_embedding_version()
+
+        checkpoint = self._load_checkpoint(checkpoint_path, path)
+        done = set(checkpoint['done'])
+        self.rejects = self._open_rejects(rejects_path, checkpoint['rejects'])
+
+        students, skipped = source.students()
+        if not checkpoint['done']:
+            for student, name in skipped:
+                self._reject(student, '', name, 'Unknown angle')
+        pending = [(key, angles) for key, angles in students.items() if key not in done]
+
+        self.stdout.write(
+            f"{len(students)} students in {path}, {len(pending)} to import "
+            f"with {options['workers']} workers"
+        )
+        if not pending:
+            self.rejects['file'].close()
+            checkpoint['rejects'] = self.rejects['count']
+            self._save_checkpoint(checkpoint_path, checkpoint)
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        processed = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=_init_worker,
+            initargs=(options['threads'],),
+        ) as executor:
+            for offset in range(0, len(pending), options['batch']):
+                batch = OrderedDict(pending[offset:offset + options['batch']])
+                users = self._resolve_users(batch)
+
+                # Only this batch's images are held in memory
+                images = {
+                    key: {angle: source.read(name) for angle, name in batch[key].items()}
+                    for key in users
+                }
+                futures = [
+                    executor.submit(_enroll_student, key, [
+                        (angle, batch[key][angle], image_data)
+                        for angle, image_data in images[key].items()
+                    ])
+                    for key in users
+                ]
+
+                results = {}
+                for future in as_completed(futures):
+                    key, accepted, rejects = future.result()
+                    results[key] = accepted
+                    for angle, name, reason in rejects:
+                        self._reject(key, angle, name, reason)
+
+                enrolled, completed, flagged = self._write_batch(users, images, results)
+                self.rejects['file'].flush()
+
+                processed += len(batch)
+                checkpoint['done'].extend(batch)
+                checkpoint['enrolled'] += enrolled
+                checkpoint['completed'] += completed
+                checkpoint['duplicates'] += flagged
+                checkpoint['rejects'] = self.rejects['count']
+                self._save_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {processed}/{len(pending)} students ({processed / elapsed:.1f}/s), "
+                    f"{checkpoint['completed']} complete, {checkpoint['enrolled']} images, "
+                    f"{checkpoint['duplicates']} duplicate flags, {self.rejects['count']} rejects"
+                )
+
+        self.rejects['file'].close()
+
+        from apps.face_recognition.gallery import write_snapshot
+        snapshot = write_snapshot(embedding_version=self.version)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint['completed']} complete enrollments ({checkpoint['enrolled']} images); "
+            f"gallery snapshot {snapshot}; {checkpoint['rejects']} rejects in {rejects_path}"
+        ))
+        if checkpoint['duplicates']:
+            self.stdout.write(self.style.WARNING(
+                f"{checkpoint['duplicates']} possible duplicate identities flagged for review"
+            ))
+
+    def _resolve_users(self, batch):
+        """Map student keys to users, rejecting unknown and already enrolled students."""
+        lookup = {f'{self.match_field}__in': list(batch)}
+        users = {
+            str(getattr(user, self.match_field)): user
+            for user in User.objects.filter(**lookup)
+        }
+
+        complete = set()
+        if not self.replace:
+            complete = set(
+                FaceData.objects.filter(user_id__in=[user.id for user in users.values()], is_complete=True)
+                .values_list('user_id', flat=True)
+            )
+
+        resolved = {}
+        for key in batch:
+            user = users.get(key)
+            if user is None:
+                self._reject(key, '', key, f'No user with {self.match_field} {key}')
+            elif user.id in complete:
+                self._reject(key, '', key, 'Already enrolled (use --replace to re-enroll)')
+            else:
+                resolved[key] = user
+        return resolved
+
+    def _write_batch(self, users, images, results):
+        """Replace the batch's face data with the accepted images in bulk."""
+        results = {key: accepted for key, accepted in results.items() if accepted}
+        if not results:
+            return 0, 0, 0
+
+        user_ids = [users[key].id for key in results]
+
+        # Partial data from an interrupted run or an earlier enrollment
+        stale = list(FaceData.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+        if stale:
+            FaceImage.objects.filter(face_data_id__in=stale).delete()
+            FaceData.objects.filter(id__in=stale).delete()
+
+        now = timezone.now()
+        required = getattr(settings, 'FACE_ENROLLMENT_REQUIRED_ANGLES', 9)
+        face_data_rows = []
+        face_images = []
+        completed_users = []
+        completed_rows = []
+
+        for key, accepted in results.items():
+            user = users[key]
+            # Same template choice as enroll_angle: center wins, else the first angle
+            template = accepted.get('center') or accepted[next(angle for angle in ANGLES if angle in accepted)]
+            is_complete = len(accepted) >= required
+
+            face_data = FaceData(
+                user=user,
+                is_complete=is_complete,
+                enrollment_date=now if is_complete else None,
+                insightface_embedding=template['embeddings']['insightface'],
+                deepface_embedding=template['embeddings']['deepface'],
+                dlib_embedding=template['embeddings']['dlib'],
+                embedding_version=template['embeddings']['version'],
+                quality_score=sum(a['quality_score'] for a in accepted.values()) / len(accepted),
+            )
+            face_data_rows.append(face_data)
+
+            for angle, metrics in accepted.items():
+                face_image = FaceImage(
+                    face_data=face_data,
+                    angle=angle,
+                    brightness=metrics['brightness'],
+                    sharpness=metrics['sharpness'],
+                    face_detected=True,
+                    detection_confidence=metrics['detection_confidence'],
+                )
+                face_image.image.save(
+                    PurePosixPath(metrics['file']).name,
+                    ContentFile(images[key][angle]),
+                    save=False
+                )
+                face_images.append(face_image)
+
+            if is_complete:
+                completed_users.append(user.id)
+                completed_rows.append(face_data)
+
+        FaceData.objects.bulk_create(face_data_rows)
+        FaceImage.objects.bulk_create(face_images)
+        if completed_users:
+            # One UPDATE for the batch (djongo can't translate bulk_update's CASE expressions)
+            User.objects.filter(id__in=completed_users).update(is_face_enrolled=True, face_registered_at=now)
+
+        return len(face_images), len(completed_users), self._flag_duplicates(completed_rows)
+
+    def _flag_duplicates(self, face_data_rows):
+        """Run the enrollment duplicate check on each completed FaceData of the batch."""
+        if not face_data_rows:
+            return 0
+
+        from apps.face_recognition.duplicates import check_enrollment_duplicates
+        from apps.face_recognition.gallery import gallery_changed
+
+        # Replay the batch into the gallery so students in the same batch are compared too
+        gallery_changed()
+        flagged = 0
+        for face_data in face_data_rows:
+            try:
+                flagged += len(check_enrollment_duplicates(face_data))
+            except Exception as e:
+                self.stderr.write(f"Duplicate identity check failed for {face_data.user_id}: {e}")
+        return flagged
+
+    def _open_rejects(self, path, count=0):
+        is_new = not path.exists()
+        fh = open(path, 'a', newline='')
+        writer = csv.writer(fh)
+        if is_new:
+            writer.writerow(REJECT_FIELDS)
+        # Resumed imports continue the count of earlier runs
+        return {'file': fh, 'writer': writer, 'count': count}
+
+    def _reject(self, student, angle, name, reason):
+        self.rejects['writer'].writerow([student, angle, name, reason])
+        self.rejects['count'] += 1
+
+    def _load_checkpoint(self, path, source):
+        try:
+            with open(path) as fh:
+                checkpoint = json.load(fh)
+            if checkpoint.get('source') == str(source):
+                # Checkpoints written before these totals were tracked
+                checkpoint.setdefault('rejects', 0)
+                checkpoint.setdefault('duplicates', 0)
+                return checkpoint
+        except (OSError, ValueError):
+            pass
+        return {'source': str(source), 'done': [], 'enrolled': 0, 'completed': 0, 'rejects': 0, 'duplicates': 0}
+
+    def _save_checkpoint(self, path, checkpoint):
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(checkpoint, fh)
+        os.replace(tmp_path, path)
@@ -0,0 +1,218 @@
+"""
+Re-embed enrolled faces from stored FaceImage files with the current models.
+
+Run after changing FACE_INSIGHTFACE_PACK or FACE_DEEPFACE_MODEL. Set
+FACE_EMBEDDING_PREVIOUS_VERSION to the old version for the duration so
+users not yet migrated keep matching; unset it once the job reports no
+remaining users.
+
+Progress is kept in FaceData.embedding_version, so an interrupted run
+resumes where it stopped. Failures are recorded in the checkpoint file
+and skipped on later runs unless --retry-failed is given.
+
+Usage:
+    python manage.py reembed_faces
+    python manage.py reembed_faces --workers 8 --batch 200
+    python manage.py reembed_faces --retry-failed
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from apps.face_recognition.models import FaceData, FaceImage
+from apps.face_recognition.runtime import get_embedding_version, limit_worker_threads
+
+
+# Template angle preference, matching enrollment (center wins)
+ANGLE_ORDER = [angle for angle, _ in FaceImage.ANGLE_CHOICES]
+
+_worker = {}
+
+
+def _init_worker(version, threads):
+    """Load the target models once per worker process."""
+    import django
+    django.setup()
+    limit_worker_threads(threads)
+
+    from apps.face_recognition.services import FaceEmbeddingService
+    _worker['embedder'] = FaceEmbeddingService(version)
+
+
+def _embed_user(face_data_id, images):
+    """
+    Embed a user's templates from their stored images.
+
+    Args:
+        face_data_id: FaceData primary key
+        images: (angle, image bytes) pairs in template preference order
+
+    Returns:
+        (face_data_id, embeddings or None, error)
+    """
+    embedder = _worker['embedder']
+    error = 'No images'
+
+    for angle, image_data in images:
+        result = embedder.generate_embeddings(image_data)
+        if not result.get('success'):
+            error = f"{angle}: {result.get('error', 'embedding failed')}"
+            continue
+        if result['timed_out']:
+            error = f"{angle}: timed out ({', '.join(result['timed_out'])})"
+            continue
+        if not result['insightface'] and not result['deepface']:
+            error = f'{angle}: no face embedded'
+            continue
+        return face_data_id, {
+            'insightface': result['insightface'],
+            'deepface': result['deepface'],
+        }, None
+
+    return face_data_id, None, error
+
+
+class Command(BaseCommand):
+    help = 'Re-embed enrolled faces with the current embedding models (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--embedding-version', help='Target version (defaults to the configured models)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--threads', type=int, default=1, help='Inference threads per worker (0 = runtime default)')
+        parser.add_argument('--batch', type=int, default=100, help='Users per checkpoint')
+        parser.add_argument('--checkpoint', help='Checkpoint file (defaults to FACE_GALLERY_DIR/reembed-<version>.json)')
+        parser.add_argument('--retry-failed', action='store_true', help='Retry users that failed in earlier runs')
+        parser.add_argument('--limit', type=int, help='Stop after this many users')
+
+    def handle(self, *args, **options):
+        version = options['embedding_version'] or get_embedding_version()
+        checkpoint_path = Path(options['checkpoint']) if options['checkpoint'] else (
+            Path(getattr(settings, 'FACE_GALLERY_DIR', Path(settings.BASE_DIR) / 'gallery'))
+            / f"reembed-{re.sub(r'[^A-Za-z0-9_.-]', '_', version)}.json"
+        )
+        checkpoint = self._load_checkpoint(checkpoint_path, version)
+        if options['retry_failed']:
+            checkpoint['failed'] = {}
+
+        pending = FaceData.objects.filter(is_complete=True).exclude(
+            embedding_version=version
+        ).exclude(
+            id__in=list(checkpoint['failed'])
+        ).order_by('id').values_list('id', 'embedding_version')
+        pending = list(pending[:options['limit']] if options['limit'] else pending)
+
+        self.stdout.write(
+            f"Re-embedding {len(pending)} users to {version} with {options['workers']} workers "
+            f"({checkpoint['migrated']} migrated, {len(checkpoint['failed'])} failed so far)"
+        )
+        if not pending:
+            self._write_snapshots(version)
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=_init_worker,
+            initargs=(version, options['threads']),
+        ) as executor:
+            for offset in range(0, len(pending), options['batch']):
+                batch = dict(pending[offset:offset + options['batch']])
+                futures = [
+                    executor.submit(_embed_user, face_data_id, images)
+                    for face_data_id, images in self._read_images(batch).items()
+                ]
+                for future in as_completed(futures):
+                    face_data_id, embeddings, error = future.result()
+                    self._apply(checkpoint, face_data_id, batch[face_data_id], version, embeddings, error)
+
+                done += len(batch)
+                checkpoint['processed'] += len(batch)
+                self._save_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {done}/{len(pending)} users ({done / elapsed:.1f}/s), "
+                    f"{checkpoint['migrated']} migrated, {len(checkpoint['failed'])} failed"
+                )
+
+        self._write_snapshots(version)
+
+        remaining = FaceData.objects.filter(is_complete=True).exclude(embedding_version=version).count()
+        if remaining:
+            self.stdout.write(self.style.WARNING(
+                f"{remaining} users still on older embeddings; keep FACE_EMBEDDING_PREVIOUS_VERSION set "
+                f"and rerun with --retry-failed (failures in {checkpoint_path})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"All users on {version}; FACE_EMBEDDING_PREVIOUS_VERSION can be unset"
+            ))
+
+    def _read_images(self, batch):
+        """Read each user's stored images in template preference order."""
+        images = {face_data_id: [] for face_data_id in batch}
+        face_images = sorted(
+            FaceImage.objects.filter(face_data_id__in=list(batch)),
+            key=lambda face_image: ANGLE_ORDER.index(face_image.angle)
+            if face_image.angle in ANGLE_ORDER else len(ANGLE_ORDER)
+        )
+        for face_image in face_images:
+            try:
+                with face_image.image.open('rb') as fh:
+                    images[face_image.face_data_id].append((face_image.angle, fh.read()))
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"Cannot read {face_image.image.name}: {e}")
+        return images
+
+    def _apply(self, checkpoint, face_data_id, old_version, version, embeddings, error):
+        if embeddings is None:
+            checkpoint['failed'][str(face_data_id)] = error
+            return
+
+        # Skip users who re-enrolled (or were deleted) while we were embedding
+        updated = FaceData.objects.filter(pk=face_data_id, embedding_version=old_version).update(
+            insightface_embedding=embeddings['insightface'],
+            deepface_embedding=embeddings['deepface'],
+            embedding_version=version,
+            last_updated=timezone.now(),
+        )
+        if updated:
+            checkpoint['migrated'] += 1
+
+    def _write_snapshots(self, version):
+        from apps.face_recognition.gallery import write_snapshot
+        from apps.face_recognition.runtime import get_active_embedding_versions
+
+        for embedding_version in {version, *get_active_embedding_versions()}:
+            snapshot = write_snapshot(embedding_version=embedding_version)
+            self.stdout.write(f"Gallery snapshot {snapshot} written for {embedding_version}")
+
+    def _load_checkpoint(self, path, version):
+        try:
+            with open(path) as fh:
+                checkpoint = json.load(fh)
+            if checkpoint.get('version') == version:
+                return checkpoint
+        except (OSError, ValueError):
+            pass
+        return {'version': version, 'processed': 0, 'migrated': 0, 'failed': {}}
+
+    def _save_checkpoint(self, path, checkpoint):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(checkpoint, fh, indent=2)
+        os.replace(tmp_path, path)
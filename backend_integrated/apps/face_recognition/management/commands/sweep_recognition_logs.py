@@ -0,0 +1,69 @@
+"""
+Apply the recognition log retention policy.
+
+Probe images older than FACE_LOG_IMAGE_COMPACT_DAYS are downscaled and
+recompressed, then logs past their status's FACE_LOG_RETENTION_DAYS are
+folded into daily RecognitionLogRollup rows and deleted. Work is done in
+chunks with a pause between them so the sweep can run beside live
+traffic; an interrupted or time-limited run continues where it stopped.
+
+Usage (e.g. nightly from cron):
+    python manage.py sweep_recognition_logs
+    python manage.py sweep_recognition_logs --max-minutes 20 --chunk-size 200 --pause-ms 500
+    python manage.py sweep_recognition_logs --dry-run
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.face_recognition.retention import SweepBudget, compact_images, expire_logs, get_retention_days
+
+
+class Command(BaseCommand):
+    help = 'Compact old recognition log images and roll up then delete expired logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Logs per chunk (defaults to FACE_LOG_SWEEP_CHUNK_SIZE)')
+        parser.add_argument('--pause-ms', type=int, help='Pause between chunks (defaults to FACE_LOG_SWEEP_PAUSE_MS)')
+        parser.add_argument('--max-minutes', type=float, help='Stop after this long; the next run resumes')
+        parser.add_argument('--skip-images', action='store_true', help='Do not compact probe images')
+        parser.add_argument('--skip-expiry', action='store_true', help='Do not roll up or delete logs')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be compacted and deleted')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size'] or getattr(settings, 'FACE_LOG_SWEEP_CHUNK_SIZE', 500)
+        pause_ms = options['pause_ms'] if options['pause_ms'] is not None else \
+            getattr(settings, 'FACE_LOG_SWEEP_PAUSE_MS', 200)
+        max_seconds = options['max_minutes'] * 60 if options['max_minutes'] else None
+        budget = SweepBudget(chunk_size, pause_ms / 1000, max_seconds)
+        verb = 'would be' if options['dry_run'] else 'were'
+        started = time.perf_counter()
+
+        if not options['skip_images']:
+            compact_days = getattr(settings, 'FACE_LOG_IMAGE_COMPACT_DAYS', 14)
+            result = compact_images(timedelta(days=compact_days), budget, options['dry_run'])
+            self.stdout.write(
+                f"Images older than {compact_days} days: {result['compacted']} {verb} compacted, "
+                f"{result['bytes_saved'] / 1048576:.1f} MB saved"
+            )
+            if not result['complete']:
+                self.stdout.write(self.style.WARNING('Time limit reached during image compaction'))
+                return
+
+        if not options['skip_expiry']:
+            for log_status, days in get_retention_days().items():
+                if not days:
+                    continue
+                result = expire_logs(log_status, timedelta(days=days), budget, options['dry_run'])
+                self.stdout.write(
+                    f"{log_status} logs older than {days} days: {result['deleted']} {verb} rolled up and deleted"
+                )
+                if not result['complete']:
+                    self.stdout.write(self.style.WARNING(f"Time limit reached while expiring {log_status} logs"))
+                    return
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Retention sweep finished [{elapsed:.1f}s]"))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+def tag_existing_embeddings(apps, schema_editor):
+    """Embeddings enrolled before versioning came from the default models."""
+    FaceData = apps.get_model('face_recognition', 'FaceData')
+    FaceData.objects.all().update(embedding_version='buffalo_l+Facenet')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facedata',
+            name='embedding_version',
+            field=models.CharField(blank=True, default='', help_text='Models that produced the embeddings, e.g. buffalo_l+Facenet', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='facedata',
+            index=models.Index(fields=['embedding_version'], name='face_data_embeddi_2aafd9_idx'),
+        ),
+        migrations.RunPython(tag_existing_embeddings, migrations.RunPython.noop),
+    ]
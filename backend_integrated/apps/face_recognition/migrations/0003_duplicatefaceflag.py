@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('face_recognition', '0002_facedata_embedding_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateFaceFlag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('confidence', models.FloatField()),
+                ('similarities', models.JSONField(blank=True, null=True)),
+                ('embedding_version', models.CharField(blank=True, default='', max_length=100)),
+                ('source', models.CharField(choices=[('enrollment', 'Enrollment'), ('batch', 'Batch Scan')], max_length=20)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('confirmed', 'Confirmed Duplicate'), ('dismissed', 'Dismissed')], default='open', max_length=20)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('matched_user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('reviewed_by', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_face_flags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Duplicate Face Flag',
+                'verbose_name_plural': 'Duplicate Face Flags',
+                'db_table': 'duplicate_face_flags',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-created_at'], name='duplicate_f_status_590e21_idx')],
+            },
+        ),
+    ]
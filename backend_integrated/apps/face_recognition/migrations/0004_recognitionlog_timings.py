@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition', '0003_duplicatefaceflag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recognitionlog',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition', '0004_recognitionlog_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recognitionlog',
+            name='image_compacted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='recognitionlog',
+            index=models.Index(fields=['status', 'timestamp'], name='recognition_status_1efaae_idx'),
+        ),
+        migrations.CreateModel(
+            name='RecognitionLogRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed'), ('no_face', 'No Face Detected'), ('low_confidence', 'Low Confidence'), ('multiple_faces', 'Multiple Faces')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('recognized_count', models.IntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('confidence_max', models.FloatField(default=0.0)),
+                ('latency_ms_sum', models.FloatField(default=0.0)),
+                ('latency_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Recognition Log Rollup',
+                'verbose_name_plural': 'Recognition Log Rollups',
+                'db_table': 'recognition_log_rollups',
+                'ordering': ['-date', 'status'],
+                'unique_together': {('date', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('attendance', '0002_initial'),
+        ('face_recognition', '0005_recognitionlog_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recognitionlog',
+            name='department',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recognition_logs', to='academic.department'),
+        ),
+        migrations.AddField(
+            model_name='recognitionlog',
+            name='session',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recognition_logs', to='attendance.classsession'),
+        ),
+        migrations.AddField(
+            model_name='recognitionlog',
+            name='subject',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recognition_logs', to='academic.subject'),
+        ),
+        migrations.AddIndex(
+            model_name='recognitionlog',
+            index=models.Index(fields=['department', '-timestamp'], name='recognition_departm_a8998c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recognitionlog',
+            index=models.Index(fields=['session', '-timestamp'], name='recognition_session_dc2e2a_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:30
+
+import apps.face_recognition.models
+import apps.face_recognition.storage
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition', '0006_recognitionlog_context'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.IntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stored File',
+                'verbose_name_plural': 'Stored Files',
+                'db_table': 'stored_files',
+                'indexes': [models.Index(fields=['refcount', 'released_at'], name='stored_file_refcoun_41576c_idx')],
+            },
+        ),
+        migrations.AlterField(
+            model_name='faceimage',
+            name='image',
+            field=models.ImageField(storage=apps.face_recognition.storage.get_image_storage, upload_to=apps.face_recognition.models.face_image_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='recognitionlog',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=apps.face_recognition.storage.get_image_storage, upload_to='recognition_logs/'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 21:40
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition', '0007_storedfile_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceDataDeletion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.UUIDField()),
+                ('embedding_version', models.CharField(blank=True, default='', max_length=100)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Face Data Deletion',
+                'verbose_name_plural': 'Face Data Deletions',
+                'db_table': 'face_data_deletions',
+                'indexes': [models.Index(fields=['deleted_at'], name='face_data_d_deleted_cf18f0_idx')],
+            },
+        ),
+    ]
@@ -8,6 +8,8 @@ from django.conf import settings
 import uuid
 import os
 
+from .storage import get_image_storage
+
 
 def face_image_upload_path(instance, filename):
     """Generate upload path for face images."""
@@ -37,6 +39,12 @@ class FaceData(models.Model):
     insightface_embedding = models.JSONField(null=True, blank=True)
     deepface_embedding = models.JSONField(null=True, blank=True)
     dlib_embedding = models.JSONField(null=True, blank=True)
+    embedding_version = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Models that produced the embeddings, e.g. buffalo_l+Facenet"
+    )
     
     # Quality metrics
     quality_score = models.FloatField(default=0.0)
@@ -52,6 +60,7 @@ class FaceData(models.Model):
         indexes = [
             # user index automatically created by ForeignKey
             models.Index(fields=['is_complete']),
+            models.Index(fields=['embedding_version']),
         ]
     
     def __str__(self):
@@ -94,7 +103,7 @@ class FaceImage(models.Model):
         related_name='images', db_constraint=False)
     
     angle = models.CharField(max_length=20, choices=ANGLE_CHOICES)
-    image = models.ImageField(upload_to=face_image_upload_path)
+    image = models.ImageField(upload_to=face_image_upload_path, storage=get_image_storage)
     
     # Image quality metrics
     brightness = models.FloatField(default=0.0)
@@ -136,7 +145,8 @@ class RecognitionLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # Recognition attempt details
-    image = models.ImageField(upload_to='recognition_logs/', null=True, blank=True)
+    image = models.ImageField(upload_to='recognition_logs/', storage=get_image_storage, null=True, blank=True)
+    image_compacted = models.BooleanField(default=False)  # downscaled by the retention sweep
     recognized_user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -152,10 +162,33 @@ class RecognitionLog(models.Model):
     deepface_result = models.JSONField(null=True, blank=True)
     dlib_result = models.JSONField(null=True, blank=True)
     
+    # Per-stage latency in ms plus image size and gallery size (see instrumentation.StageTimer)
+    timings = models.JSONField(null=True, blank=True)
+    
     # Context
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     
+    # Denormalized at write time so filtered listings don't join through users
+    department = models.ForeignKey(
+        'academic.Department',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recognition_logs', db_constraint=False)
+    session = models.ForeignKey(
+        'attendance.ClassSession',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recognition_logs', db_constraint=False)
+    subject = models.ForeignKey(
+        'academic.Subject',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recognition_logs', db_constraint=False)
+    
     # Timestamp
     timestamp = models.DateTimeField(auto_now_add=True)
     
@@ -168,6 +201,9 @@ class RecognitionLog(models.Model):
             # recognized_user index automatically created by ForeignKey
             models.Index(fields=['-timestamp']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'timestamp']),
+            models.Index(fields=['department', '-timestamp']),
+            models.Index(fields=['session', '-timestamp']),
         ]
     
     def __str__(self):
@@ -175,6 +211,47 @@ class RecognitionLog(models.Model):
         return f"{user} - {self.get_status_display()} ({self.timestamp})"
 
 
+class RecognitionLogRollup(models.Model):
+    """
+    Daily aggregate of recognition logs removed by the retention sweep.
+    One row per day and status.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=RecognitionLog.STATUS_CHOICES)
+    
+    count = models.IntegerField(default=0)
+    recognized_count = models.IntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+    confidence_max = models.FloatField(default=0.0)
+    
+    # Sum of timings['total'] over logs that have timings
+    latency_ms_sum = models.FloatField(default=0.0)
+    latency_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'recognition_log_rollups'
+        verbose_name = 'Recognition Log Rollup'
+        verbose_name_plural = 'Recognition Log Rollups'
+        ordering = ['-date', 'status']
+        unique_together = [['date', 'status']]
+    
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+    
+    @property
+    def average_confidence(self):
+        return self.confidence_sum / self.count if self.count else 0.0
+    
+    @property
+    def average_latency_ms(self):
+        return self.latency_ms_sum / self.latency_count if self.latency_count else None
+
+
 class FaceRecognitionSettings(models.Model):
     """
     Global settings for face recognition system.
@@ -221,3 +298,116 @@ class FaceRecognitionSettings(models.Model):
         """Get or create settings instance."""
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
+
+
+class DuplicateFaceFlag(models.Model):
+    """
+    Two accounts whose enrolled faces look like the same person.
+    Raised at enrollment completion or by the batch duplicate scan.
+    """
+    
+    SOURCE_CHOICES = [
+        ('enrollment', 'Enrollment'),
+        ('batch', 'Batch Scan'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('confirmed', 'Confirmed Duplicate'),
+        ('dismissed', 'Dismissed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Flagged accounts (user is the newer enrollment for enrollment flags)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='duplicate_face_flags', db_constraint=False)
+    matched_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+', db_constraint=False)
+    
+    confidence = models.FloatField()
+    similarities = models.JSONField(null=True, blank=True)
+    embedding_version = models.CharField(max_length=100, blank=True, default='')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    
+    # Review
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    reviewed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+', db_constraint=False)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'duplicate_face_flags'
+        verbose_name = 'Duplicate Face Flag'
+        verbose_name_plural = 'Duplicate Face Flags'
+        ordering = ['-created_at']
+        indexes = [
+            # user and matched_user indexes automatically created by ForeignKeys
+            models.Index(fields=['status', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} ~ {self.matched_user_id} ({self.confidence:.2f}, {self.get_status_display()})"
+
+
+class StoredFile(models.Model):
+    """
+    Reference count of a file in the content-addressed image storage.
+    Unreferenced files are removed by collect_face_files.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=1)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)  # when refcount last reached zero
+    
+    class Meta:
+        db_table = 'stored_files'
+        verbose_name = 'Stored File'
+        verbose_name_plural = 'Stored Files'
+        indexes = [
+            models.Index(fields=['refcount', 'released_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class FaceDataDeletion(models.Model):
+    """
+    Tombstone of a deleted FaceData row.
+    Galleries replay deletions newer than their watermark from here instead
+    of rescanning every enrolled user; old rows are pruned with snapshots.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    user_id = models.UUIDField()  # no foreign key, the user may be gone too
+    embedding_version = models.CharField(max_length=100, blank=True, default='')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'face_data_deletions'
+        verbose_name = 'Face Data Deletion'
+        verbose_name_plural = 'Face Data Deletions'
+        indexes = [
+            models.Index(fields=['deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} deleted at {self.deleted_at}"
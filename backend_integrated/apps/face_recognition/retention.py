@@ -0,0 +1,166 @@
+"""
+Recognition Log Retention
+Probe image compaction and rollup-then-delete of expired recognition logs
+"""
+
+import io
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RecognitionLog, RecognitionLogRollup
+from .storage import release_file
+
+logger = logging.getLogger(__name__)
+
+
+def get_retention_days() -> Dict[str, int]:
+    """Days each log status is kept (0 = forever)."""
+    return getattr(settings, 'FACE_LOG_RETENTION_DAYS', {})
+
+
+class SweepBudget:
+    """Chunk pacing shared by the sweep steps: a pause between chunks and an overall deadline."""
+
+    def __init__(self, chunk_size: int, pause: float, max_seconds: Optional[float] = None):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.deadline = time.monotonic() + max_seconds if max_seconds else None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def throttle(self) -> None:
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def compact_image(log: RecognitionLog, max_size: int, quality: int) -> int:
+    """
+    Downscale and recompress a log's probe image in place.
+
+    Returns:
+        Bytes saved
+    """
+    from PIL import Image
+
+    storage = log.image.storage
+    old_name = log.image.name
+    with storage.open(old_name, 'rb') as f:
+        old_size = storage.size(old_name)
+        image = Image.open(f)
+        image.load()
+
+    image = image.convert('RGB')
+    image.thumbnail((max_size, max_size))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, optimize=True)
+
+    stem = os.path.splitext(os.path.basename(old_name))[0]
+    log.image.save(f'{stem}.jpg', ContentFile(buffer.getvalue()), save=False)
+    release_file(old_name)
+    return old_size - buffer.tell()
+
+
+def compact_images(older_than: timedelta, budget: SweepBudget, dry_run: bool = False) -> Dict:
+    """
+    Compact probe images of logs older than ``older_than``.
+
+    Each chunk is re-queried from the start: compacted rows drop out of
+    the filter, so an interrupted sweep resumes where it stopped.
+    """
+    cutoff = timezone.now() - older_than
+    pending = RecognitionLog.objects.filter(
+        image_compacted=False, timestamp__lt=cutoff, image__isnull=False
+    ).exclude(image='').order_by('timestamp')
+
+    if dry_run:
+        return {'compacted': pending.count(), 'bytes_saved': 0, 'complete': True}
+
+    max_size = getattr(settings, 'FACE_LOG_IMAGE_MAX_SIZE', 320)
+    quality = getattr(settings, 'FACE_LOG_IMAGE_QUALITY', 70)
+    compacted = 0
+    bytes_saved = 0
+
+    while not budget.exhausted:
+        logs = list(pending[:budget.chunk_size])
+        if not logs:
+            return {'compacted': compacted, 'bytes_saved': bytes_saved, 'complete': True}
+
+        for log in logs:
+            try:
+                bytes_saved += compact_image(log, max_size, quality)
+            except FileNotFoundError:
+                # Drop the reference too, or collect_face_files never sees the name as unused
+                release_file(log.image.name)
+                log.image = None
+            except Exception as e:
+                # Marked anyway so one bad file can't stall the sweep
+                logger.warning(f"Could not compact recognition log image {log.image.name}: {e}")
+            RecognitionLog.objects.filter(id=log.id).update(image=log.image.name or None, image_compacted=True)
+            compacted += 1
+
+        budget.throttle()
+
+    return {'compacted': compacted, 'bytes_saved': bytes_saved, 'complete': False}
+
+
+def add_to_rollups(status: str, rows: List[Dict]) -> None:
+    """Fold log rows of one status into their daily RecognitionLogRollup rows."""
+    by_date = defaultdict(list)
+    for row in rows:
+        by_date[timezone.localtime(row['timestamp']).date()].append(row)
+
+    for date, day_rows in by_date.items():
+        rollup, created = RecognitionLogRollup.objects.get_or_create(date=date, status=status)
+        for row in day_rows:
+            confidence = row['confidence_score'] or 0.0
+            rollup.count += 1
+            rollup.recognized_count += 1 if row['recognized_user_id'] else 0
+            rollup.confidence_sum += confidence
+            rollup.confidence_max = max(rollup.confidence_max, confidence)
+            total_ms = (row['timings'] or {}).get('total')
+            if total_ms is not None:
+                rollup.latency_ms_sum += total_ms
+                rollup.latency_count += 1
+        rollup.save()
+
+
+def expire_logs(status: str, older_than: timedelta, budget: SweepBudget, dry_run: bool = False) -> Dict:
+    """
+    Roll up and delete logs of one status older than ``older_than``.
+
+    Each chunk is folded into the daily rollups and deleted in one
+    transaction. Deleting a log releases its probe image (see signals).
+    """
+    cutoff = timezone.now() - older_than
+    expired = RecognitionLog.objects.filter(status=status, timestamp__lt=cutoff).order_by('timestamp')
+
+    if dry_run:
+        return {'deleted': expired.count(), 'complete': True}
+
+    deleted = 0
+    while not budget.exhausted:
+        rows = list(expired.values(
+            'id', 'timestamp', 'recognized_user_id', 'confidence_score', 'timings'
+        )[:budget.chunk_size])
+        if not rows:
+            return {'deleted': deleted, 'complete': True}
+
+        with transaction.atomic():
+            add_to_rollups(status, rows)
+            RecognitionLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        deleted += len(rows)
+        budget.throttle()
+
+    return {'deleted': deleted, 'complete': False}
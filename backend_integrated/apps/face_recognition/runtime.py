@@ -0,0 +1,488 @@
+"""
+Face Recognition Runtime
+ONNX Runtime session tuning, model variants and per-process model pools
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ONNX Runtime defaults; sessions are only rebuilt when settings differ
+ONNX_SESSION_DEFAULTS = {
+    'intra_op_num_threads': 0,
+    'inter_op_num_threads': 0,
+    'execution_mode': 'sequential',
+    'graph_optimization_level': 'all',
+    'enable_cpu_mem_arena': True,
+    'enable_mem_pattern': True,
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+MODEL_VARIANTS = ('fp32', 'int8')
+
+# InsightFace tasks that have dynamically-quantized int8 variants
+QUANTIZED_TASKS = ('detection', 'recognition')
+
+INT8_SUFFIX = '.int8.onnx'
+
+
+def get_embedding_version(pack: str = None, deepface_model: str = None) -> str:
+    """
+    Version tag of the embedding models, e.g. ``buffalo_l+Facenet``.
+
+    Stored on every FaceData so templates are only ever compared with
+    probes embedded by the same models.
+    """
+    pack = pack or getattr(settings, 'FACE_INSIGHTFACE_PACK', 'buffalo_l')
+    deepface_model = deepface_model or getattr(settings, 'FACE_DEEPFACE_MODEL', 'Facenet')
+    return f'{pack}+{deepface_model}'
+
+
+def parse_embedding_version(version: str) -> tuple:
+    """Split a version tag into (InsightFace pack, DeepFace model)."""
+    pack, _, deepface_model = version.partition('+')
+    return pack, deepface_model
+
+
+def get_active_embedding_versions() -> list:
+    """
+    Embedding versions matching must cover.
+
+    During a re-embedding rollover (FACE_EMBEDDING_PREVIOUS_VERSION set)
+    users not yet migrated are still matched with the previous models.
+    """
+    versions = [get_embedding_version()]
+    previous = getattr(settings, 'FACE_EMBEDDING_PREVIOUS_VERSION', '')
+    if previous and previous not in versions:
+        versions.append(previous)
+    return versions
+
+
+def get_session_config() -> dict:
+    """Return ONNX Runtime session settings merged over the runtime defaults."""
+    config = dict(ONNX_SESSION_DEFAULTS)
+    config.update(getattr(settings, 'FACE_ONNX_SESSION_OPTIONS', {}))
+    return config
+
+
+def build_session_options(config: dict = None):
+    """
+    Build ``onnxruntime.SessionOptions`` from settings.
+
+    Args:
+        config: Session settings, defaults to FACE_ONNX_SESSION_OPTIONS
+
+    Returns:
+        onnxruntime.SessionOptions
+    """
+    import onnxruntime
+
+    config = config or get_session_config()
+    options = onnxruntime.SessionOptions()
+
+    if config['intra_op_num_threads']:
+        options.intra_op_num_threads = config['intra_op_num_threads']
+    if config['inter_op_num_threads']:
+        options.inter_op_num_threads = config['inter_op_num_threads']
+
+    if config['execution_mode'] == 'parallel':
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    else:
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+
+    level = GRAPH_OPTIMIZATION_LEVELS.get(config['graph_optimization_level'], 'ORT_ENABLE_ALL')
+    options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel, level)
+
+    options.enable_cpu_mem_arena = config['enable_cpu_mem_arena']
+    options.enable_mem_pattern = config['enable_mem_pattern']
+
+    return options
+
+
+def quantized_model_path(model_file: str) -> str:
+    """Path of the int8 variant stored next to an fp32 ONNX model."""
+    root, _ = os.path.splitext(model_file)
+    return root + INT8_SUFFIX
+
+
+def resolve_model_file(taskname: str, model_file: str, variant: str) -> str:
+    """
+    Pick the model file to load for a task.
+
+    Falls back to the fp32 model when the int8 file has not been generated.
+    """
+    if variant == 'int8' and taskname in QUANTIZED_TASKS:
+        path = quantized_model_path(model_file)
+        if os.path.exists(path):
+            return path
+        logger.warning(f"int8 {taskname} model not found at {path}, using fp32")
+    return model_file
+
+
+def configure_onnx_sessions(face_app, variant: str = None) -> None:
+    """
+    Rebuild the ONNX Runtime sessions of a prepared FaceAnalysis app
+    with the configured session options and model variant.
+
+    InsightFace does not forward session options to ONNX Runtime, so the
+    sessions are recreated from the model files with the same providers.
+    """
+    variant = variant or getattr(settings, 'FACE_ONNX_MODEL_VARIANT', 'fp32')
+    config = get_session_config()
+
+    if variant == 'fp32' and config == ONNX_SESSION_DEFAULTS:
+        return
+
+    import onnxruntime
+
+    session_options = build_session_options(config)
+
+    for taskname, model in face_app.models.items():
+        model.session = onnxruntime.InferenceSession(
+            resolve_model_file(taskname, model.model_file, variant),
+            sess_options=session_options,
+            providers=model.session.get_providers()
+        )
+
+
+def create_face_analysis(variant: str = None, pack: str = None):
+    """
+    Create and prepare an InsightFace FaceAnalysis app using runtime settings.
+
+    Args:
+        variant: Model variant ('fp32' or 'int8'), defaults to FACE_ONNX_MODEL_VARIANT
+        pack: InsightFace model pack, defaults to FACE_INSIGHTFACE_PACK
+
+    Returns:
+        Prepared insightface.app.FaceAnalysis
+    """
+    import insightface
+
+    kwargs = {}
+    providers = getattr(settings, 'FACE_ONNX_PROVIDERS', None)
+    if providers:
+        kwargs['providers'] = providers
+
+    pack = pack or getattr(settings, 'FACE_INSIGHTFACE_PACK', 'buffalo_l')
+    face_app = insightface.app.FaceAnalysis(name=pack, **kwargs)
+    face_app.prepare(
+        ctx_id=getattr(settings, 'FACE_INSIGHTFACE_CTX_ID', 0),
+        det_size=(640, 640)
+    )
+    configure_onnx_sessions(face_app, variant)
+    return face_app
+
+
+def quantize_face_models(face_app, force: bool = False) -> dict:
+    """
+    Generate dynamically-quantized int8 variants of the detection and
+    recognition models of a FaceAnalysis app.
+
+    Args:
+        face_app: Prepared FaceAnalysis app (fp32)
+        force: Regenerate existing int8 files
+
+    Returns:
+        Dict mapping task name to int8 model path
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    outputs = {}
+    for taskname in QUANTIZED_TASKS:
+        model = face_app.models.get(taskname)
+        if model is None:
+            continue
+
+        output = quantized_model_path(model.model_file)
+        if force or not os.path.exists(output):
+            logger.info(f"Quantizing {taskname} model to {output}")
+            quantize_dynamic(model.model_file, output, weight_type=QuantType.QInt8)
+        outputs[taskname] = output
+
+    return outputs
+
+
+def configure_tensorflow_threads() -> None:
+    """Limit TensorFlow (DeepFace) intra-op threads before its runtime starts."""
+    intra_op_threads = getattr(settings, 'FACE_TF_INTRA_OP_THREADS', 0)
+    if not intra_op_threads:
+        return
+
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    except RuntimeError:
+        # Runtime already initialized in this process; keep existing setting
+        pass
+    except Exception as e:
+        logger.warning(f"Could not configure TensorFlow threads: {e}")
+
+
+def limit_worker_threads(threads: int) -> None:
+    """
+    Cap ONNX Runtime and TensorFlow threads in a batch worker process.
+
+    Call before any model is loaded; N worker processes at the runtime
+    default would each try to use every core.
+    """
+    if not threads:
+        return
+    settings.FACE_ONNX_SESSION_OPTIONS = dict(
+        getattr(settings, 'FACE_ONNX_SESSION_OPTIONS', {}),
+        intra_op_num_threads=threads,
+    )
+    settings.FACE_TF_INTRA_OP_THREADS = threads
+
+
+class InferencePoolTimeout(Exception):
+    """No model replica became free within the checkout timeout."""
+
+
+class InferenceSessionPool:
+    """
+    Per-process pool of model replicas.
+
+    Each request checks out a replica for exclusive use, so threaded
+    workers never call into the same model object concurrently while
+    loaded replicas are reused by every request in the process.
+    Replicas are created lazily up to ``size``. Taking a free replica is a
+    single deque pop with no lock; only an exhausted pool waits on the
+    condition variable.
+    """
+
+    def __init__(self, factory, size: int = 1, timeout: float = 10.0, name: str = 'inference'):
+        self.factory = factory
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.name = name
+
+        self._idle = deque()
+        self._created = 0
+        self._waiters = 0
+        self._condition = threading.Condition()
+
+        # Metrics (fast-path counter is updated without the lock and is approximate)
+        self._fast_checkouts = 0
+        self._slow_checkouts = 0
+        self._contended = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def prewarm(self, count: int = 1) -> None:
+        """Create replicas up front so the first requests do not pay model load."""
+        for _ in range(min(count, self.size)):
+            with self._condition:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                replica = self.factory()
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                raise
+            self._release(replica)
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """
+        Check out a replica for the duration of the ``with`` block.
+
+        Raises:
+            InferencePoolTimeout: If no replica is free within ``timeout`` seconds
+        """
+        replica = self._acquire(timeout)
+        try:
+            yield replica
+        finally:
+            self._release(replica)
+
+    def _acquire(self, timeout: float = None):
+        # Fast path: deque.pop is atomic, no lock needed
+        try:
+            replica = self._idle.pop()
+            self._fast_checkouts += 1
+            return replica
+        except IndexError:
+            pass
+
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+
+        with self._condition:
+            self._slow_checkouts += 1
+
+            # Room to grow: create a new replica outside the lock
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+                self._waiters += 1
+                try:
+                    replica = self._wait_for_replica(started + timeout)
+                finally:
+                    self._waiters -= 1
+
+        if not create:
+            return replica
+
+        try:
+            return self.factory()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def _wait_for_replica(self, deadline: float):
+        """Wait (holding the condition) until a replica is released."""
+        started = time.monotonic()
+        contended = False
+
+        while True:
+            try:
+                replica = self._idle.pop()
+                break
+            except IndexError:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._timeouts += 1
+                raise InferencePoolTimeout(
+                    f"No {self.name} replica free after waiting {time.monotonic() - started:.2f}s"
+                )
+            contended = True
+            self._condition.wait(remaining)
+
+        if contended:
+            waited = time.monotonic() - started
+            self._contended += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        return replica
+
+    def _release(self, replica) -> None:
+        self._idle.append(replica)
+        # Waiters register under the lock before re-checking the deque,
+        # so reading the counter without it cannot miss a sleeper.
+        if self._waiters:
+            with self._condition:
+                self._condition.notify()
+
+    def stats(self) -> dict:
+        """Pool occupancy and contention metrics."""
+        with self._condition:
+            idle = len(self._idle)
+            checkouts = self._fast_checkouts + self._slow_checkouts
+            return {
+                'name': self.name,
+                'size': self.size,
+                'replicas': self._created,
+                'idle': idle,
+                'in_use': self._created - idle,
+                'waiting': self._waiters,
+                'checkouts': checkouts,
+                'contended_checkouts': self._contended,
+                'contention_rate': self._contended / checkouts if checkouts else 0.0,
+                'timeouts': self._timeouts,
+                'wait_seconds_total': self._wait_total,
+                'wait_seconds_avg': self._wait_total / self._contended if self._contended else 0.0,
+                'wait_seconds_max': self._wait_max,
+            }
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_face_analysis_pool(pack: str = None) -> InferenceSessionPool:
+    """
+    Return this process's pool of InsightFace FaceAnalysis replicas for a model pack.
+
+    The first call loads one replica; pools are rebuilt after a fork so
+    gunicorn workers never share sessions created in the master process.
+    """
+    global _pools_pid
+
+    pack = pack or getattr(settings, 'FACE_INSIGHTFACE_PACK', 'buffalo_l')
+    name = f'insightface:{pack}'
+
+    pid = os.getpid()
+    pool = _pools.get(name) if _pools_pid == pid else None
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        if _pools_pid != pid:
+            _pools.clear()
+            _pools_pid = pid
+
+        pool = _pools.get(name)
+        if pool is None:
+            pool = InferenceSessionPool(
+                lambda: create_face_analysis(pack=pack),
+                size=getattr(settings, 'FACE_INFERENCE_POOL_SIZE', 1),
+                timeout=getattr(settings, 'FACE_INFERENCE_POOL_TIMEOUT', 10.0),
+                name=name
+            )
+            pool.prewarm(1)
+            _pools[name] = pool
+
+    return pool
+
+
+_engines = threading.local()
+
+
+def get_face_engine(version: str = None):
+    """
+    Return this thread's FaceRecognitionEngine for an embedding version.
+
+    The face stack (OpenCV, NumPy, InsightFace, DeepFace) is imported on
+    first use, so workers and commands that never process a face never
+    load it. Engines are kept per thread because the OpenCV and dlib
+    detectors they hold are not safe to share; InsightFace replicas come
+    from the process pool.
+
+    Args:
+        version: Embedding version tag, defaults to the current models
+    """
+    version = version or get_embedding_version()
+
+    pid = os.getpid()
+    if getattr(_engines, 'pid', None) != pid:
+        _engines.engines = {}
+        _engines.pid = pid
+
+    engine = _engines.engines.get(version)
+    if engine is None:
+        from .services import FaceRecognitionEngine
+        engine = FaceRecognitionEngine(version)
+        _engines.engines[version] = engine
+    return engine
+
+
+def get_pool_stats() -> list:
+    """Metrics for every inference pool loaded in this process."""
+    if _pools_pid != os.getpid():
+        return []
+    return [pool.stats() for pool in list(_pools.values())]
@@ -3,7 +3,7 @@ Face Recognition Serializers
 """
 
 from rest_framework import serializers
-from .models import FaceData, FaceImage, RecognitionLog, FaceRecognitionSettings
+from .models import FaceData, FaceImage, RecognitionLog, FaceRecognitionSettings, DuplicateFaceFlag
 
 
 class FaceImageSerializer(serializers.ModelSerializer):
@@ -105,7 +105,8 @@ class RecognitionLogSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'recognized_user', 'user_email', 'status', 'status_display',
             'confidence_score', 'insightface_result', 'deepface_result',
-            'dlib_result', 'ip_address', 'timestamp'
+            'dlib_result', 'timings', 'department', 'session', 'subject',
+            'ip_address', 'timestamp'
         ]
         read_only_fields = fields
 
@@ -138,3 +139,31 @@ class FaceRecognitionSettingsSerializer(serializers.ModelSerializer):
             )
         
         return data
+
+
+class DuplicateFaceFlagSerializer(serializers.ModelSerializer):
+    """Serializer for duplicate identity flags."""
+    
+    user_email = serializers.EmailField(source='user.email', read_only=True)
+    matched_user_email = serializers.EmailField(source='matched_user.email', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = DuplicateFaceFlag
+        fields = [
+            'id', 'user', 'user_email', 'matched_user', 'matched_user_email',
+            'confidence', 'similarities', 'embedding_version', 'source',
+            'status', 'status_display', 'reviewed_by', 'reviewed_at', 'notes',
+            'created_at'
+        ]
+        read_only_fields = [
+            'id', 'user', 'matched_user', 'confidence', 'similarities',
+            'embedding_version', 'source', 'reviewed_by', 'reviewed_at', 'created_at'
+        ]
+
+
+class ResolveDuplicateFlagSerializer(serializers.Serializer):
+    """Serializer for resolving a duplicate identity flag."""
+    
+    status = serializers.ChoiceField(choices=['confirmed', 'dismissed'])
+    notes = serializers.CharField(required=False, allow_blank=True)
@@ -7,22 +7,75 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
 import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Dict, List, Optional, Tuple
 import logging
 
+from django.conf import settings
+
+from .runtime import (
+    get_face_analysis_pool, configure_tensorflow_threads,
+    get_embedding_version, parse_embedding_version,
+)
+from .instrumentation import NULL_TIMER
+
 logger = logging.getLogger(__name__)
 
 
+_embedding_executor = None
+_embedding_executor_pid = None
+_embedding_executor_lock = threading.Lock()
+_embedding_slots = None
+
+
+def get_embedding_executor() -> ThreadPoolExecutor:
+    """
+    Return the per-process thread pool used to run embedding backends concurrently.
+    
+    The pool is recreated after a fork so gunicorn workers never share
+    threads inherited from the master process.
+    """
+    global _embedding_executor, _embedding_executor_pid, _embedding_slots
+    
+    pid = os.getpid()
+    if _embedding_executor is None or _embedding_executor_pid != pid:
+        with _embedding_executor_lock:
+            if _embedding_executor is None or _embedding_executor_pid != pid:
+                workers = getattr(settings, 'FACE_EMBEDDING_WORKERS', 2)
+                _embedding_executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='face-embedding'
+                )
+                _embedding_slots = threading.BoundedSemaphore(workers)
+                _embedding_executor_pid = pid
+    return _embedding_executor
+
+
+def acquire_embedding_slot() -> bool:
+    """
+    Reserve a pool thread for one backend run, without waiting.
+    
+    Backends that timed out keep running and keep their slot, so a pool
+    stuck on slow models reports False here instead of queueing more work.
+    """
+    get_embedding_executor()
+    return _embedding_slots.acquire(blocking=False)
+
+
 class FaceDetectionService:
     """
     Face detection using multiple methods.
     Supports: OpenCV, InsightFace, dlib
     """
     
-    def __init__(self):
+    def __init__(self, pack: str = None):
+        self.pack = pack
         self.opencv_cascade = None
-        self.insightface_detector = None
+        self.insightface_pool = None
         self.dlib_detector = None
         self._initialize_detectors()
     
@@ -37,10 +90,8 @@ class FaceDetectionService:
             logger.error(f"Failed to initialize OpenCV detector: {e}")
         
         try:
-            # InsightFace detector
-            import insightface
-            self.insightface_detector = insightface.app.FaceAnalysis()
-            self.insightface_detector.prepare(ctx_id=0, det_size=(640, 640))
+            # InsightFace detector (replicas shared per process)
+            self.insightface_pool = get_face_analysis_pool(self.pack)
             logger.info("InsightFace detector initialized")
         except Exception as e:
             logger.warning(f"InsightFace not available: {e}")
@@ -53,22 +104,25 @@ class FaceDetectionService:
         except Exception as e:
             logger.warning(f"dlib not available: {e}")
     
-    def detect_faces(self, image_data: bytes) -> Dict:
+    def detect_faces(self, image_data: bytes, timer=NULL_TIMER) -> Dict:
         """
         Detect faces in image using multiple detectors.
         
         Args:
             image_data: Raw image bytes
+            timer: StageTimer recording decode/detect durations
             
         Returns:
             Dict with detection results
         """
         # Convert bytes to numpy array
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with timer.stage('decode'):
+            nparr = np.frombuffer(image_data, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if img is None:
             return {'success': False, 'error': 'Invalid image data'}
+        timer.set_image(img.shape)
         
         results = {
             'success': False,
@@ -79,10 +133,11 @@ class FaceDetectionService:
         
         # Try OpenCV detection
         if self.opencv_cascade is not None:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = self.opencv_cascade.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-            )
+            with timer.stage('detect.opencv'):
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                faces = self.opencv_cascade.detectMultiScale(
+                    gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+                )
             if len(faces) > 0:
                 results['success'] = True
                 results['faces_detected'] = len(faces)
@@ -94,10 +149,12 @@ class FaceDetectionService:
                     })
         
         # Try InsightFace detection
-        if self.insightface_detector is not None:
+        if self.insightface_pool is not None:
             try:
-                rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                faces = self.insightface_detector.get(rgb_img)
+                with timer.stage('detect.insightface'):
+                    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                    with self.insightface_pool.checkout() as face_app:
+                        faces = face_app.get(rgb_img)
                 if len(faces) > 0:
                     results['success'] = True
                     results['faces_detected'] = max(results['faces_detected'], len(faces))
@@ -114,33 +171,36 @@ class FaceDetectionService:
         
         return results
     
-    def calculate_image_quality(self, image_data: bytes) -> Dict:
+    def calculate_image_quality(self, image_data: bytes, timer=NULL_TIMER) -> Dict:
         """
         Calculate image quality metrics.
         
         Args:
             image_data: Raw image bytes
+            timer: StageTimer recording decode/quality durations
             
         Returns:
             Dict with quality metrics
         """
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with timer.stage('decode'):
+            nparr = np.frombuffer(image_data, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if img is None:
             return {'success': False, 'error': 'Invalid image'}
         
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Brightness
-        brightness = np.mean(gray) / 255.0
-        
-        # Sharpness (Laplacian variance)
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-        sharpness = laplacian.var() / 1000.0  # Normalize
-        
-        # Contrast
-        contrast = gray.std() / 128.0
+        with timer.stage('quality'):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            
+            # Brightness
+            brightness = np.mean(gray) / 255.0
+            
+            # Sharpness (Laplacian variance)
+            laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+            sharpness = laplacian.var() / 1000.0  # Normalize
+            
+            # Contrast
+            contrast = gray.std() / 128.0
         
         # Overall quality score
         quality_score = (brightness * 0.3 + sharpness * 0.5 + contrast * 0.2)
@@ -159,8 +219,10 @@ class FaceEmbeddingService:
     Generate face embeddings using multiple AI models.
     """
     
-    def __init__(self):
-        self.insightface_model = None
+    def __init__(self, version: str = None):
+        self.version = version or get_embedding_version()
+        self.pack, self.deepface_model = parse_embedding_version(self.version)
+        self.insightface_pool = None
         self.deepface_models = {}
         self.dlib_model = None
         self._initialize_models()
@@ -168,18 +230,16 @@ class FaceEmbeddingService:
     def _initialize_models(self):
         """Initialize embedding models."""
         try:
-            import insightface
-            self.insightface_model = insightface.app.FaceAnalysis()
-            self.insightface_model.prepare(ctx_id=0, det_size=(640, 640))
+            self.insightface_pool = get_face_analysis_pool(self.pack)
             logger.info("InsightFace embedding model initialized")
         except Exception as e:
             logger.warning(f"InsightFace not available: {e}")
         
         try:
+            configure_tensorflow_threads()
             from deepface import DeepFace
             # Pre-load models
-            self.deepface_models['Facenet'] = True
-            self.deepface_models['VGG-Face'] = True
+            self.deepface_models[self.deepface_model] = True
             logger.info("DeepFace models initialized")
         except Exception as e:
             logger.warning(f"DeepFace not available: {e}")
@@ -192,65 +252,153 @@ class FaceEmbeddingService:
         except Exception as e:
             logger.warning(f"dlib not available: {e}")
     
-    def generate_embeddings(self, image_data: bytes) -> Dict:
+    def generate_embeddings(self, image_data: bytes, timer=NULL_TIMER) -> Dict:
         """
         Generate face embeddings using all available models.
         
+        Backends run concurrently on the per-process embedding pool, each
+        with its own timeout counted from when it starts running. When
+        every pool thread is busy (e.g. with backends that timed out
+        earlier) nothing is queued: the primary backend (the first one
+        available) runs inline and its result is discarded if it overran
+        its timeout, and the other backends are skipped. Skipped models and
+        models that miss their deadline are reported in ``timed_out`` and
+        the result carries whatever arrived in time; if none arrived the
+        result is unsuccessful.
+        
         Args:
             image_data: Raw image bytes
+            timer: StageTimer recording decode and per-model ``embed.<name>`` durations
             
         Returns:
             Dict with embeddings from each model
         """
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with timer.stage('decode'):
+            nparr = np.frombuffer(image_data, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if img is None:
             return {'success': False, 'error': 'Invalid image'}
         
         embeddings = {
             'success': True,
+            'version': self.version,
             'insightface': None,
             'deepface': None,
-            'dlib': None
+            'dlib': None,
+            'timed_out': []
         }
         
-        # InsightFace embedding
-        if self.insightface_model is not None:
+        backends = {}
+        if self.insightface_pool is not None:
+            backends['insightface'] = (self._insightface_embedding, img)
+        if self.deepface_models:
+            backends['deepface'] = (self._deepface_embedding, image_data)
+        
+        if not backends:
+            return embeddings
+        
+        executor = get_embedding_executor()
+        primary = next(iter(backends))
+        tasks = {}
+        skipped = []
+        for name, (backend, arg) in backends.items():
+            started = {'event': threading.Event(), 'at': None}
+            if acquire_embedding_slot():
+                tasks[name] = (executor.submit(self._timed_backend, timer, name, backend, arg, started, True), started)
+            elif name != primary:
+                skipped.append(name)
+        
+        if primary not in tasks:
+            # Pool saturated: the primary model runs in the request thread, the others are skipped
+            timer.set('inline', [primary])
+            backend, arg = backends[primary]
+            timeout = self._backend_timeout(primary)
+            started = {'event': threading.Event(), 'at': None}
             try:
-                rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                faces = self.insightface_model.get(rgb_img)
-                if len(faces) > 0:
-                    # Use the first face
-                    embedding = faces[0].embedding
-                    embeddings['insightface'] = embedding.tolist()
+                result = self._timed_backend(timer, primary, backend, arg, started)
+                if time.monotonic() - started['at'] > timeout:
+                    embeddings['timed_out'].append(primary)
+                    timer.set('timed_out', embeddings['timed_out'])
+                    logger.warning(f"{primary} embedding ran inline and overran its timeout, result discarded")
+                else:
+                    embeddings[primary] = result
             except Exception as e:
-                logger.error(f"InsightFace embedding error: {e}")
-        
-        # DeepFace embedding
-        if self.deepface_models:
+                logger.error(f"{primary} embedding error: {e}")
+        if skipped:
+            embeddings['timed_out'].extend(skipped)
+            timer.set('timed_out', embeddings['timed_out'])
+            logger.warning(f"Embedding pool saturated, skipped {', '.join(skipped)}")
+        
+        for name, (future, started) in tasks.items():
+            timeout = self._backend_timeout(name)
             try:
-                from deepface import DeepFace
-                # Save temp image
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
-                    tmp.write(image_data)
-                    tmp_path = tmp.name
-                
-                embedding = DeepFace.represent(
-                    img_path=tmp_path,
-                    model_name='Facenet',
-                    enforce_detection=False
-                )
-                embeddings['deepface'] = embedding[0]['embedding']
-                
-                import os
-                os.unlink(tmp_path)
+                if not started['event'].wait(timeout):
+                    raise FutureTimeoutError()
+                remaining = started['at'] + timeout - time.monotonic()
+                embeddings[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                if future.cancel():
+                    # Never started, so _timed_backend won't free its slot
+                    _embedding_slots.release()
+                embeddings['timed_out'].append(name)
+                timer.set('timed_out', embeddings['timed_out'])
+                logger.warning(f"{name} embedding timed out, using partial result")
             except Exception as e:
-                logger.error(f"DeepFace embedding error: {e}")
+                logger.error(f"{name} embedding error: {e}")
+        
+        if len(embeddings['timed_out']) == len(backends):
+            embeddings['success'] = False
+            embeddings['error'] = 'Face embedding timed out'
         
         return embeddings
     
+    def _timed_backend(self, timer, name: str, backend, arg, started: dict, pooled: bool = False):
+        """Run one backend, recording when it started and its duration from the running thread."""
+        started['at'] = time.monotonic()
+        started['event'].set()
+        try:
+            with timer.stage(f'embed.{name}'):
+                return backend(arg)
+        finally:
+            if pooled:
+                _embedding_slots.release()
+    
+    def _backend_timeout(self, name: str) -> float:
+        """Per-backend embedding timeout in seconds."""
+        timeouts = getattr(settings, 'FACE_EMBEDDING_TIMEOUTS', {})
+        return timeouts.get(name, 5.0)
+    
+    def _insightface_embedding(self, img: np.ndarray) -> Optional[List[float]]:
+        """InsightFace embedding of the first detected face."""
+        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with self.insightface_pool.checkout() as face_app:
+            faces = face_app.get(rgb_img)
+        if len(faces) > 0:
+            # Use the first face
+            return faces[0].embedding.tolist()
+        return None
+    
+    def _deepface_embedding(self, image_data: bytes) -> Optional[List[float]]:
+        """DeepFace embedding of the image with the configured model."""
+        from deepface import DeepFace
+        import tempfile
+        
+        # Save temp image
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
+            tmp.write(image_data)
+            tmp_path = tmp.name
+        
+        try:
+            embedding = DeepFace.represent(
+                img_path=tmp_path,
+                model_name=self.deepface_model,
+                enforce_detection=False
+            )
+            return embedding[0]['embedding']
+        finally:
+            os.unlink(tmp_path)
+    
     def compare_embeddings(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
         Compare two face embeddings.
@@ -282,23 +430,25 @@ class FaceRecognitionEngine:
     Combines detection, embedding, and matching.
     """
     
-    def __init__(self):
-        self.detector = FaceDetectionService()
-        self.embedder = FaceEmbeddingService()
+    def __init__(self, version: str = None):
+        self.version = version or get_embedding_version()
+        self.detector = FaceDetectionService(parse_embedding_version(self.version)[0])
+        self.embedder = FaceEmbeddingService(self.version)
     
-    def enroll_face(self, image_data: bytes, angle: str) -> Dict:
+    def enroll_face(self, image_data: bytes, angle: str, timer=NULL_TIMER) -> Dict:
         """
         Process and enroll a face image.
         
         Args:
             image_data: Raw image bytes
             angle: Face angle (center, up, down, etc.)
+            timer: StageTimer recording per-stage durations
             
         Returns:
             Dict with enrollment result
         """
         # Detect faces
-        detection_result = self.detector.detect_faces(image_data)
+        detection_result = self.detector.detect_faces(image_data, timer)
         
         if not detection_result['success']:
             return {
@@ -315,7 +465,7 @@ class FaceRecognitionEngine:
             }
         
         # Check image quality
-        quality_result = self.detector.calculate_image_quality(image_data)
+        quality_result = self.detector.calculate_image_quality(image_data, timer)
         
         if quality_result.get('quality_score', 0) < 0.4:
             return {
@@ -325,7 +475,7 @@ class FaceRecognitionEngine:
             }
         
         # Generate embeddings
-        embeddings = self.embedder.generate_embeddings(image_data)
+        embeddings = self.embedder.generate_embeddings(image_data, timer)
         
         if not embeddings['success']:
             return {
@@ -342,19 +492,20 @@ class FaceRecognitionEngine:
             'embeddings': embeddings
         }
     
-    def recognize_face(self, image_data: bytes, enrolled_embeddings: Dict) -> Dict:
+    def recognize_face(self, image_data: bytes, enrolled_embeddings: Dict, timer=NULL_TIMER) -> Dict:
         """
         Recognize a face against enrolled data.
         
         Args:
             image_data: Raw image bytes
             enrolled_embeddings: Dict of enrolled embeddings
+            timer: StageTimer recording per-stage durations
             
         Returns:
             Dict with recognition result
         """
         # Detect faces
-        detection_result = self.detector.detect_faces(image_data)
+        detection_result = self.detector.detect_faces(image_data, timer)
         
         if not detection_result['success']:
             return {
@@ -364,7 +515,7 @@ class FaceRecognitionEngine:
             }
         
         # Generate embeddings for input image
-        input_embeddings = self.embedder.generate_embeddings(image_data)
+        input_embeddings = self.embedder.generate_embeddings(image_data, timer)
         
         if not input_embeddings['success']:
             return {
@@ -373,37 +524,39 @@ class FaceRecognitionEngine:
                 'error': 'Failed to generate embeddings'
             }
         
-        # Compare with enrolled embeddings
-        similarities = {}
-        
-        if input_embeddings['insightface'] and enrolled_embeddings.get('insightface'):
-            similarities['insightface'] = self.embedder.compare_embeddings(
-                input_embeddings['insightface'],
-                enrolled_embeddings['insightface']
-            )
-        
-        if input_embeddings['deepface'] and enrolled_embeddings.get('deepface'):
-            similarities['deepface'] = self.embedder.compare_embeddings(
-                input_embeddings['deepface'],
-                enrolled_embeddings['deepface']
-            )
-        
-        # Calculate weighted average
         from apps.face_recognition.models import FaceRecognitionSettings
         settings = FaceRecognitionSettings.get_settings()
         
-        total_score = 0
-        total_weight = 0
-        
-        if 'insightface' in similarities:
-            total_score += similarities['insightface'] * settings.insightface_weight
-            total_weight += settings.insightface_weight
-        
-        if 'deepface' in similarities:
-            total_score += similarities['deepface'] * settings.deepface_weight
-            total_weight += settings.deepface_weight
-        
-        confidence = total_score / total_weight if total_weight > 0 else 0
+        with timer.stage('match'):
+            # Compare with enrolled embeddings
+            similarities = {}
+            
+            if input_embeddings['insightface'] and enrolled_embeddings.get('insightface'):
+                similarities['insightface'] = self.embedder.compare_embeddings(
+                    input_embeddings['insightface'],
+                    enrolled_embeddings['insightface']
+                )
+            
+            if input_embeddings['deepface'] and enrolled_embeddings.get('deepface'):
+                similarities['deepface'] = self.embedder.compare_embeddings(
+                    input_embeddings['deepface'],
+                    enrolled_embeddings['deepface']
+                )
+            
+            # Calculate weighted average
+            total_score = 0
+            total_weight = 0
+            
+            if 'insightface' in similarities:
+                total_score += similarities['insightface'] * settings.insightface_weight
+                total_weight += settings.insightface_weight
+            
+            if 'deepface' in similarities:
+                total_score += similarities['deepface'] * settings.deepface_weight
+                total_weight += settings.deepface_weight
+            
+            confidence = total_score / total_weight if total_weight > 0 else 0
+        timer.set('gallery', 1)
         
         recognized = confidence >= settings.min_confidence_threshold
         
@@ -414,3 +567,81 @@ class FaceRecognitionEngine:
             'similarities': similarities,
             'threshold': settings.min_confidence_threshold
         }
+    
+    def identify_face(self, image_data: bytes, galleries: List, timer=NULL_TIMER) -> Dict:
+        """
+        Identify a face against every enrolled user in one vectorized pass.
+        
+        Each gallery holds the templates of one embedding version. During a
+        re-embedding rollover the probe is embedded once per version, so
+        users not yet migrated are still matched with the previous models.
+        
+        Args:
+            image_data: Raw image bytes
+            galleries: EmbeddingGallery per active embedding version
+            timer: StageTimer recording per-stage durations and gallery size
+            
+        Returns:
+            Dict with the best match and whether it clears the threshold
+        """
+        detection_result = self.detector.detect_faces(image_data, timer)
+        
+        if not detection_result['success']:
+            return {
+                'success': False,
+                'recognized': False,
+                'error': 'No face detected'
+            }
+        
+        from apps.face_recognition.models import FaceRecognitionSettings
+        from .runtime import get_face_engine
+        settings = FaceRecognitionSettings.get_settings()
+        weights = {
+            'insightface': settings.insightface_weight,
+            'deepface': settings.deepface_weight
+        }
+        
+        best = None
+        timer.set('gallery', sum(len(gallery) for gallery in galleries))
+        
+        for gallery in galleries:
+            if len(gallery) == 0:
+                continue
+            
+            if gallery.embedding_version == self.version:
+                embedder = self.embedder
+            else:
+                embedder = get_face_engine(gallery.embedding_version).embedder
+            
+            input_embeddings = embedder.generate_embeddings(image_data, timer)
+            if not input_embeddings['success']:
+                continue
+            
+            with timer.stage('match'):
+                match = gallery.match(
+                    {
+                        'insightface': input_embeddings['insightface'],
+                        'deepface': input_embeddings['deepface']
+                    },
+                    weights
+                )
+            if match and (best is None or match['confidence'] > best['confidence']):
+                best = match
+        
+        if best is None:
+            return {
+                'success': True,
+                'recognized': False,
+                'confidence': 0.0,
+                'similarities': {},
+                'threshold': settings.min_confidence_threshold
+            }
+        
+        return {
+            'success': True,
+            'recognized': best['confidence'] >= settings.min_confidence_threshold,
+            'user_id': best['user_id'],
+            'confidence': best['confidence'],
+            'similarities': best['similarities'],
+            'threshold': settings.min_confidence_threshold
+        }
@@ -0,0 +1,34 @@
+"""
+Face Recognition Signals
+Release content-addressed image references when rows drop them,
+and leave tombstones of deleted face data for the embedding galleries
+"""
+
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import FaceData, FaceDataDeletion, FaceImage, RecognitionLog
+from .storage import release_file
+
+
+@receiver(post_delete, sender=FaceImage)
+@receiver(post_delete, sender=RecognitionLog)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        release_file(instance.image.name)
+
+
+@receiver(pre_save, sender=FaceImage)
+def release_replaced_image(sender, instance, **kwargs):
+    """Release the old file when an existing FaceImage gets a new image (e.g. in the admin)."""
+    if instance._state.adding:
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+    if old_name and old_name != instance.image.name:
+        release_file(old_name)
+
+
+@receiver(post_delete, sender=FaceData)
+def record_face_data_deletion(sender, instance, **kwargs):
+    """Covers cascades from deleted users as well as explicit deletes."""
+    FaceDataDeletion.objects.create(user_id=instance.user_id, embedding_version=instance.embedding_version)
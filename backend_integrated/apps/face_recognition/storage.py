@@ -0,0 +1,153 @@
+"""
+Face Image Storage
+Content-addressed, reference-counted file storage with WebP thumbnails
+"""
+
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that keeps each distinct file once, named by its SHA-256.
+
+    The first component of the upload_to path is kept as a prefix, so
+    ``face_images/<user>/center_1a2b.jpg`` is stored as
+    ``face_images/ab/cd/<sha256>.jpg``. Saving bytes that are already
+    stored returns the existing name. Every save adds a reference in
+    StoredFile and deleting a row releases it. Unreferenced files are
+    removed by ``python manage.py collect_face_files`` after a grace
+    period, not on release.
+
+    New files also get a WebP thumbnail (``<prefix>/thumbs/ab/<sha256>.webp``)
+    for admin pages.
+    """
+
+    def __init__(self, thumbnail_size: int = None, thumbnail_quality: int = 75, **kwargs):
+        super().__init__(**kwargs)
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+
+    def content_name(self, name: str, digest: str) -> str:
+        prefix = name.replace('\\', '/').split('/')[0]
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(prefix, digest[:2], digest[2:4], f'{digest}{ext}')
+
+    def thumbnail_name(self, name: str) -> str:
+        prefix = name.split('/')[0]
+        digest = posixpath.splitext(posixpath.basename(name))[0]
+        return posixpath.join(prefix, 'thumbs', digest[:2], f'{digest}.webp')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+        content.seek(0)
+
+        stored_name = self.content_name(name, sha.hexdigest())
+        if not self.exists(stored_name):
+            # A concurrent writer of the same bytes gets a suffixed copy, which is harmless
+            stored_name = super().save(stored_name, content, max_length)
+            if self.thumbnail_size:
+                self._write_thumbnail(stored_name, content)
+
+        add_reference(stored_name, content.size)
+        return stored_name
+
+    def _write_thumbnail(self, name: str, content) -> None:
+        try:
+            from PIL import Image
+
+            content.seek(0)
+            image = Image.open(content)
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            buffer = io.BytesIO()
+            image.convert('RGB').save(buffer, 'WEBP', quality=self.thumbnail_quality)
+            thumbnail = self.thumbnail_name(name)
+            if not self.exists(thumbnail):
+                FileSystemStorage.save(self, thumbnail, ContentFile(buffer.getvalue()))
+        except Exception as e:
+            logger.warning(f"Could not write thumbnail for {name}: {e}")
+        finally:
+            content.seek(0)
+
+    def thumbnail_url(self, name: str):
+        """URL of the file's thumbnail, or None for files stored before thumbnails existed."""
+        thumbnail = self.thumbnail_name(name)
+        return self.url(thumbnail) if self.exists(thumbnail) else None
+
+    def delete(self, name):
+        super().delete(name)
+        super().delete(self.thumbnail_name(name))
+
+
+_image_storage = None
+
+
+def get_image_storage() -> ContentAddressedStorage:
+    """Storage for FaceImage and RecognitionLog images (callable so settings are read lazily)."""
+    global _image_storage
+
+    if _image_storage is None:
+        _image_storage = ContentAddressedStorage(
+            thumbnail_size=getattr(settings, 'FACE_IMAGE_THUMBNAIL_SIZE', 96),
+            thumbnail_quality=getattr(settings, 'FACE_IMAGE_THUMBNAIL_QUALITY', 75)
+        )
+    return _image_storage
+
+
+def add_reference(name: str, size: int = 0) -> None:
+    """
+    Count one more row pointing at a stored file.
+
+    Counts are read-modify-write and can drift under concurrent writers;
+    collect_face_files re-checks real references before deleting anything.
+    """
+    from .models import StoredFile
+
+    stored, created = StoredFile.objects.get_or_create(name=name, defaults={'size': size})
+    if not created:
+        stored.refcount += 1
+        stored.released_at = None
+        stored.save(update_fields=['refcount', 'released_at'])
+
+
+def release_file(name: str) -> None:
+    """
+    Drop one reference to a stored file.
+
+    Files written before content addressing have no StoredFile row and a
+    single owner, so they are deleted once the transaction commits.
+    """
+    from .models import StoredFile
+
+    if not name:
+        return
+
+    stored = StoredFile.objects.filter(name=name).first()
+    if stored is None:
+        storage = get_image_storage()
+        transaction.on_commit(lambda: FileSystemStorage.delete(storage, name))
+        return
+
+    stored.refcount = max(stored.refcount - 1, 0)
+    if stored.refcount == 0:
+        stored.released_at = timezone.now()
+    stored.save(update_fields=['refcount', 'released_at'])
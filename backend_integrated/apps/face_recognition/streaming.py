@@ -0,0 +1,190 @@
+"""
+Streaming Face Recognition
+Identifies faces in a sequence of camera frames, embedding each tracked face once
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .gallery import get_galleries
+from .runtime import get_face_analysis_pool, parse_embedding_version
+from .tracking import FaceTracker, FrameSampler, boxes_from_detections
+
+logger = logging.getLogger(__name__)
+
+
+def decode_frames(blobs: Iterable[bytes]):
+    """Decode encoded (JPEG/PNG) frames lazily; undecodable frames yield None."""
+    for blob in blobs:
+        yield cv2.imdecode(np.frombuffer(blob, np.uint8), cv2.IMREAD_COLOR)
+
+
+class FrameStreamRecognizer:
+    """
+    Recognizes faces across the frames of one camera stream.
+
+    Detection runs on sampled frames only (see FrameSampler) and faces
+    are followed with an IoU tracker. A track is embedded once it has
+    been seen on ``FACE_STREAM_MIN_HITS`` sampled frames, and again only
+    if the first attempts don't clear the threshold, so a face costs one
+    embedding per track rather than one per frame.
+
+    State is plain data (``to_dict``, restored through ``state``) so a
+    stream can be continued across requests.
+    """
+
+    def __init__(self, allowed_user_ids: Iterable[str] = None, state: Dict = None):
+        self.allowed_user_ids = set(map(str, allowed_user_ids)) if allowed_user_ids is not None else None
+        self.min_hits = getattr(settings, 'FACE_STREAM_MIN_HITS', 2)
+        self.max_attempts = getattr(settings, 'FACE_STREAM_MAX_ATTEMPTS', 3)
+        self.retry_frames = getattr(settings, 'FACE_STREAM_RETRY_FRAMES', 5)
+        self.min_face_size = getattr(settings, 'FACE_STREAM_MIN_FACE_SIZE', 40)
+
+        self.tracker = FaceTracker(
+            iou_threshold=getattr(settings, 'FACE_STREAM_IOU_THRESHOLD', 0.3),
+            max_misses=getattr(settings, 'FACE_STREAM_MAX_MISSES', 3),
+        )
+        self.sampler = FrameSampler(
+            min_interval=getattr(settings, 'FACE_STREAM_MIN_INTERVAL', 1),
+            max_interval=getattr(settings, 'FACE_STREAM_MAX_INTERVAL', 8),
+        )
+        self.frame_index = 0
+        self.confirmed: Dict[str, float] = {}
+        self.stats = {'frames': 0, 'sampled': 0, 'detections': 0, 'embeddings': 0}
+
+        if state:
+            self.frame_index = state['frame_index']
+            self.confirmed = state['confirmed']
+            self.stats = state['stats']
+            self.tracker.load(state['tracker'])
+            self.sampler.load(state['sampler'])
+
+        self._galleries = None
+        self._weights = None
+        self._threshold = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'frame_index': self.frame_index,
+            'confirmed': self.confirmed,
+            'stats': self.stats,
+            'tracker': self.tracker.to_dict(),
+            'sampler': self.sampler.to_dict(),
+        }
+
+    def process_frames(self, frames: Iterable[np.ndarray]) -> List[Dict]:
+        """
+        Process BGR frames in order.
+
+        Returns:
+            Identities confirmed by these frames:
+            [{'user_id', 'confidence', 'similarities', 'track_id', 'frame'}]
+        """
+        identities = []
+        for frame in frames:
+            identities.extend(self.process_frame(frame))
+        return identities
+
+    def process_frame(self, frame: np.ndarray) -> List[Dict]:
+        """Process one BGR frame; see process_frames."""
+        index = self.frame_index
+        self.frame_index += 1
+        self.stats['frames'] += 1
+
+        if frame is None or not self.sampler.should_sample(index):
+            return []
+
+        self.stats['sampled'] += 1
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        with get_face_analysis_pool().checkout() as face_app:
+            bboxes, kpss = face_app.det_model.detect(rgb, max_num=0, metric='default')
+        detections = boxes_from_detections(bboxes, kpss)
+        self.stats['detections'] += len(detections)
+
+        seen = self.tracker.update(detections, index)
+
+        identities = []
+        for track in seen:
+            if not self._needs_embedding(track, index):
+                continue
+            match = self._identify(rgb, track)
+            track.attempts += 1
+            track.last_attempt = index
+            if match is None:
+                continue
+
+            track.user_id = match['user_id']
+            track.confidence = match['confidence']
+            if match['user_id'] in self.confirmed:
+                continue
+
+            self.confirmed[match['user_id']] = match['confidence']
+            identities.append({
+                'user_id': match['user_id'],
+                'confidence': match['confidence'],
+                'similarities': match['similarities'],
+                'track_id': track.track_id,
+                'frame': index,
+            })
+
+        busy = any(
+            not track.identified and track.attempts < self.max_attempts
+            for track in seen
+        )
+        self.sampler.sampled(index, busy)
+        return identities
+
+    def _needs_embedding(self, track, index: int) -> bool:
+        if track.identified or track.kps is None:
+            return False
+        if track.hits < self.min_hits or track.attempts >= self.max_attempts:
+            return False
+        if track.width < self.min_face_size:
+            return False
+        return track.last_attempt is None or index - track.last_attempt >= self.retry_frames
+
+    def _identify(self, rgb: np.ndarray, track) -> Optional[Dict]:
+        """Embed a track's face and match it against the active galleries."""
+        from insightface.app.common import Face
+
+        self._load_matching()
+
+        best = None
+        for gallery in self._galleries:
+            if len(gallery) == 0:
+                continue
+
+            pack = parse_embedding_version(gallery.embedding_version)[0]
+            face = Face(bbox=np.array(track.bbox), kps=track.kps, det_score=track.score)
+            with get_face_analysis_pool(pack).checkout() as face_app:
+                face_app.models['recognition'].get(rgb, face)
+            self.stats['embeddings'] += 1
+
+            match = gallery.match({'insightface': face.embedding.tolist()}, self._weights)
+            if match and (best is None or match['confidence'] > best['confidence']):
+                best = match
+
+        if best is None or best['confidence'] < self._threshold:
+            return None
+        if self.allowed_user_ids is not None and best['user_id'] not in self.allowed_user_ids:
+            logger.info(f"Stream track {track.track_id} matched {best['user_id']} outside the roster")
+            return None
+        return best
+
+    def _load_matching(self) -> None:
+        if self._galleries is not None:
+            return
+
+        from .models import FaceRecognitionSettings
+        recognition_settings = FaceRecognitionSettings.get_settings()
+        self._galleries = get_galleries()
+        self._weights = {
+            'insightface': recognition_settings.insightface_weight,
+            'deepface': recognition_settings.deepface_weight
+        }
+        self._threshold = recognition_settings.min_confidence_threshold
@@ -0,0 +1,196 @@
+"""
+Face Tracking
+IoU tracking and adaptive frame sampling for streamed camera frames
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def iou(a, b) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+class Track:
+    """A face followed across frames; identified at most once."""
+
+    def __init__(self, track_id: int, bbox: List[float], score: float, frame: int):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.score = score
+        self.kps = None
+        self.hits = 1
+        self.misses = 0
+        self.first_frame = frame
+        self.last_frame = frame
+
+        # Identification
+        self.user_id = None
+        self.confidence = 0.0
+        self.attempts = 0
+        self.last_attempt = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'track_id': self.track_id,
+            'bbox': self.bbox,
+            'score': self.score,
+            'hits': self.hits,
+            'misses': self.misses,
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame,
+            'user_id': self.user_id,
+            'confidence': self.confidence,
+            'attempts': self.attempts,
+            'last_attempt': self.last_attempt,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Track':
+        track = cls(data['track_id'], data['bbox'], data['score'], data['first_frame'])
+        for key in ('hits', 'misses', 'last_frame', 'user_id', 'confidence', 'attempts', 'last_attempt'):
+            setattr(track, key, data[key])
+        return track
+
+    @property
+    def identified(self) -> bool:
+        return self.user_id is not None
+
+    @property
+    def width(self) -> float:
+        return self.bbox[2] - self.bbox[0]
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker.
+
+    Detections are matched to live tracks by descending IoU; unmatched
+    detections start new tracks and tracks unseen for more than
+    ``max_misses`` sampled frames are dropped.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 3):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks: List[Track] = []
+        self.next_id = 1
+
+    def update(self, detections: List[Dict], frame: int) -> List[Track]:
+        """
+        Advance the tracker by one sampled frame.
+
+        Args:
+            detections: [{'bbox': [x1, y1, x2, y2], 'score': float, 'kps': array}]
+            frame: Index of the frame the detections come from
+
+        Returns:
+            Tracks seen in this frame
+        """
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            for d, detection in enumerate(detections):
+                overlap = iou(track.bbox, detection['bbox'])
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, t, d))
+        pairs.sort(reverse=True)
+
+        matched_tracks = set()
+        matched_detections = set()
+        seen = []
+        for _, t, d in pairs:
+            if t in matched_tracks or d in matched_detections:
+                continue
+            matched_tracks.add(t)
+            matched_detections.add(d)
+            track = self.tracks[t]
+            detection = detections[d]
+            track.bbox = detection['bbox']
+            track.score = detection['score']
+            track.kps = detection.get('kps')
+            track.hits += 1
+            track.misses = 0
+            track.last_frame = frame
+            seen.append(track)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.kps = None
+                track.misses += 1
+
+        for d, detection in enumerate(detections):
+            if d in matched_detections:
+                continue
+            track = Track(self.next_id, detection['bbox'], detection['score'], frame)
+            track.kps = detection.get('kps')
+            self.next_id += 1
+            self.tracks.append(track)
+            seen.append(track)
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return seen
+
+    def to_dict(self) -> Dict:
+        return {
+            'next_id': self.next_id,
+            'tracks': [track.to_dict() for track in self.tracks],
+        }
+
+    def load(self, data: Optional[Dict]) -> None:
+        if not data:
+            return
+        self.next_id = data['next_id']
+        self.tracks = [Track.from_dict(track) for track in data['tracks']]
+
+
+class FrameSampler:
+    """
+    Decides which frames to run detection on.
+
+    Every ``min_interval`` frames while faces are new or unidentified,
+    backing off (doubling) to ``max_interval`` while the scene is empty
+    or every visible face is already identified.
+    """
+
+    def __init__(self, min_interval: int = 1, max_interval: int = 8):
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.interval = self.min_interval
+        self.next_frame = 0
+
+    def should_sample(self, frame: int) -> bool:
+        return frame >= self.next_frame
+
+    def sampled(self, frame: int, busy: bool) -> None:
+        """Record a sampled frame; ``busy`` if any visible face still needs identifying."""
+        if busy:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self.next_frame = frame + self.interval
+
+    def to_dict(self) -> Dict:
+        return {'interval': self.interval, 'next_frame': self.next_frame}
+
+    def load(self, data: Optional[Dict]) -> None:
+        if data:
+            self.interval = data['interval']
+            self.next_frame = data['next_frame']
+
+
+def boxes_from_detections(bboxes: np.ndarray, kpss: Optional[np.ndarray]) -> List[Dict]:
+    """Convert InsightFace detector output into tracker detections."""
+    detections = []
+    for i, row in enumerate(bboxes):
+        detections.append({
+            'bbox': [float(v) for v in row[:4]],
+            'score': float(row[4]),
+            'kps': kpss[i] if kpss is not None else None,
+        })
+    return detections
@@ -8,6 +8,7 @@ from .views import (
     FaceEnrollmentViewSet,
     FaceRecognitionViewSet,
     RecognitionLogViewSet,
+    DuplicateFaceFlagViewSet,
     FaceRecognitionSettingsViewSet
 )
 
@@ -15,6 +16,7 @@ router = DefaultRouter()
 router.register(r'enroll', FaceEnrollmentViewSet, basename='face-enroll')
 router.register(r'recognize', FaceRecognitionViewSet, basename='face-recognize')
 router.register(r'logs', RecognitionLogViewSet, basename='recognition-logs')
+router.register(r'duplicates', DuplicateFaceFlagViewSet, basename='face-duplicates')
 router.register(r'settings', FaceRecognitionSettingsViewSet, basename='face-settings')
 
 urlpatterns = [
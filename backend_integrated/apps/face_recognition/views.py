@@ -6,18 +6,23 @@ Handles face enrollment and recognition
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.db import transaction
 import logging
+import os
 
-from .models import FaceData, FaceImage, RecognitionLog, FaceRecognitionSettings
+from .models import FaceData, FaceImage, RecognitionLog, FaceRecognitionSettings, DuplicateFaceFlag
 from .serializers import (
     FaceDataSerializer, FaceImageSerializer, FaceEnrollmentSerializer,
     FaceRecognitionSerializer, RecognitionLogSerializer,
-    FaceRecognitionSettingsSerializer
+    FaceRecognitionSettingsSerializer, DuplicateFaceFlagSerializer,
+    ResolveDuplicateFlagSerializer
 )
-from .services import FaceRecognitionEngine
+from .runtime import get_face_engine, get_pool_stats
+from .instrumentation import StageTimer, observe_timings, get_latency_stats
+from .log_writer import enqueue_log, get_log_writer_stats
 
 logger = logging.getLogger(__name__)
 
@@ -28,9 +33,10 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
     """
     permission_classes = [IsAuthenticated]
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.face_engine = FaceRecognitionEngine()
+    @property
+    def face_engine(self):
+        """Face engine, loaded on first use."""
+        return get_face_engine()
     
     def list(self, request):
         """Get current user's face enrollment status."""
@@ -64,7 +70,9 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
         
         # Process with face recognition engine
         try:
-            enrollment_result = self.face_engine.enroll_face(image_data, angle)
+            timer = StageTimer()
+            enrollment_result = self.face_engine.enroll_face(image_data, angle, timer)
+            observe_timings('enroll', timer)
             
             if not enrollment_result['success']:
                 return Response({
@@ -101,17 +109,22 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
                     detection_confidence=enrollment_result['detection_result']['detections'][0]['confidence']
                 )
                 
+                # Embeddings from other models are never kept alongside the new ones
+                embedding_version = enrollment_result['embeddings']['version']
+                replace = angle == 'center' or face_data.embedding_version != embedding_version
+                face_data.embedding_version = embedding_version
+                
                 # Update FaceData embeddings (store best quality embedding for each model)
                 if enrollment_result['embeddings'].get('insightface'):
-                    if not face_data.insightface_embedding or angle == 'center':
+                    if not face_data.insightface_embedding or replace:
                         face_data.insightface_embedding = enrollment_result['embeddings']['insightface']
                 
                 if enrollment_result['embeddings'].get('deepface'):
-                    if not face_data.deepface_embedding or angle == 'center':
+                    if not face_data.deepface_embedding or replace:
                         face_data.deepface_embedding = enrollment_result['embeddings']['deepface']
                 
                 if enrollment_result['embeddings'].get('dlib'):
-                    if not face_data.dlib_embedding or angle == 'center':
+                    if not face_data.dlib_embedding or replace:
                         face_data.dlib_embedding = enrollment_result['embeddings']['dlib']
                 
                 # Update quality scores
@@ -129,6 +142,11 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
                 
                 face_data.save()
             
+            if face_data.is_complete:
+                from .gallery import gallery_changed
+                gallery_changed()
+                self._check_duplicates(face_data)
+            
             # Return updated face data
             face_data.refresh_from_db()
             response_serializer = FaceDataSerializer(face_data)
@@ -166,6 +184,10 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
                 request.user.face_registered_at = timezone.now()
                 request.user.save(update_fields=['is_face_enrolled', 'face_registered_at'])
                 
+                from .gallery import gallery_changed
+                gallery_changed()
+                self._check_duplicates(face_data)
+                
                 return Response({
                     'success': True,
                     'message': 'Face enrollment completed successfully'
@@ -184,6 +206,14 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
                 'error': 'No face data found'
             }, status=status.HTTP_404_NOT_FOUND)
     
+    def _check_duplicates(self, face_data):
+        """Flag other accounts with the same face; never fails the enrollment."""
+        try:
+            from .duplicates import check_enrollment_duplicates
+            check_enrollment_duplicates(face_data)
+        except Exception as e:
+            logger.error(f"Duplicate identity check failed: {e}", exc_info=True)
+    
     @action(detail=False, methods=['delete'])
     def reset_enrollment(self, request):
         """
@@ -199,6 +229,9 @@ class FaceEnrollmentViewSet(viewsets.ViewSet):
             request.user.face_registered_at = None
             request.user.save(update_fields=['is_face_enrolled', 'face_registered_at'])
             
+            from .gallery import gallery_changed
+            gallery_changed()
+            
             return Response({
                 'success': True,
                 'message': 'Face enrollment reset successfully'
@@ -216,9 +249,10 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
     """
     permission_classes = [IsAuthenticated]
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.face_engine = FaceRecognitionEngine()
+    @property
+    def face_engine(self):
+        """Face engine, loaded on first use."""
+        return get_face_engine()
     
     @action(detail=False, methods=['post'])
     def recognize(self, request):
@@ -232,12 +266,13 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
         
         image_file = serializer.validated_data['image']
         image_data = image_file.read()
+        timer = StageTimer()
         
         try:
-            # Get all enrolled users' face data
-            all_face_data = FaceData.objects.filter(is_complete=True).select_related('user')
+            from .gallery import get_galleries
+            galleries = get_galleries()
             
-            if not all_face_data.exists():
+            if sum(len(gallery) for gallery in galleries) == 0:
                 return Response({
                     'success': False,
                     'recognized': False,
@@ -247,17 +282,15 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
             best_match = None
             best_confidence = 0
             
-            # Compare with each enrolled user
-            for face_data in all_face_data:
-                enrolled_embeddings = {
-                    'insightface': face_data.insightface_embedding,
-                    'deepface': face_data.deepface_embedding,
-                    'dlib': face_data.dlib_embedding
-                }
-                
-                recognition_result = self.face_engine.recognize_face(image_data, enrolled_embeddings)
-                
-                if recognition_result.get('recognized') and recognition_result['confidence'] > best_confidence:
+            # Compare with every enrolled user at once
+            recognition_result = self.face_engine.identify_face(image_data, galleries, timer)
+            
+            if recognition_result.get('recognized'):
+                with timer.stage('db'):
+                    face_data = FaceData.objects.select_related('user').filter(
+                        user_id=recognition_result['user_id'], is_complete=True
+                    ).first()
+                if face_data:
                     best_confidence = recognition_result['confidence']
                     best_match = {
                         'user': face_data.user,
@@ -268,6 +301,7 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
             # Log recognition attempt
             log_data = {
                 'recognized_user': best_match['user'] if best_match else None,
+                'department_id': best_match['user'].department_id if best_match else None,
                 'status': 'success' if best_match else 'failed',
                 'confidence_score': best_confidence,
                 'ip_address': request.META.get('REMOTE_ADDR'),
@@ -277,7 +311,10 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
             if best_match:
                 log_data['insightface_result'] = best_match['similarities']
             
-            RecognitionLog.objects.create(**log_data)
+            log_data['timings'] = timer.as_dict()
+            with timer.stage('log_enqueue'):
+                enqueue_log(RecognitionLog(**log_data))
+            observe_timings('recognize', timer)
             
             if best_match:
                 return Response({
@@ -306,12 +343,13 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
             logger.error(f"Face recognition error: {e}", exc_info=True)
             
             # Log failed attempt
-            RecognitionLog.objects.create(
+            enqueue_log(RecognitionLog(
                 status='failed',
                 confidence_score=0,
+                timings=timer.as_dict(),
                 ip_address=request.META.get('REMOTE_ADDR'),
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            ))
             
             return Response({
                 'success': False,
@@ -320,31 +358,85 @@ class FaceRecognitionViewSet(viewsets.ViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class RecognitionLogPagination(CursorPagination):
+    """Newest first, paged by cursor so no page needs a count or a skip."""
+    ordering = '-timestamp'
+    page_size = 20
+
+
 class RecognitionLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing recognition logs.
     Admin only.
+    
+    Filters: ?session=<uuid> (uses the session/timestamp index)
     """
     queryset = RecognitionLog.objects.all().select_related('recognized_user')
     serializer_class = RecognitionLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RecognitionLogPagination
+    filter_backends = []
     
     def get_queryset(self):
         """Filter logs based on user role."""
         user = self.request.user
         
         if user.role == 'admin':
-            return RecognitionLog.objects.all().select_related('recognized_user')
+            queryset = RecognitionLog.objects.all()
         elif user.role in ['hod', 'faculty']:
-            # Show logs for their department
-            return RecognitionLog.objects.filter(
-                recognized_user__department=user.department
-            ).select_related('recognized_user')
+            # Show logs for their department (denormalized on the log)
+            queryset = RecognitionLog.objects.filter(department_id=user.department_id)
         else:
             # Students see only their own logs
-            return RecognitionLog.objects.filter(
-                recognized_user=user
-            )
+            queryset = RecognitionLog.objects.filter(recognized_user=user)
+        
+        session_id = self.request.query_params.get('session')
+        if session_id:
+            queryset = queryset.filter(session_id=session_id)
+        
+        return queryset.select_related('recognized_user')
+
+
+class DuplicateFaceFlagViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for reviewing duplicate identity flags.
+    Admin only.
+    """
+    serializer_class = DuplicateFaceFlagSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        if self.request.user.role != 'admin':
+            return DuplicateFaceFlag.objects.none()
+        
+        queryset = DuplicateFaceFlag.objects.all().select_related('user', 'matched_user')
+        flag_status = self.request.query_params.get('status')
+        if flag_status:
+            queryset = queryset.filter(status=flag_status)
+        return queryset
+    
+    @action(detail=True, methods=['post'])
+    def resolve(self, request, pk=None):
+        """
+        Confirm or dismiss a flag.
+        POST /api/face/duplicates/{id}/resolve/
+        Body: {status: 'confirmed'|'dismissed', notes: str}
+        """
+        flag = self.get_object()
+        
+        serializer = ResolveDuplicateFlagSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        flag.status = serializer.validated_data['status']
+        flag.notes = serializer.validated_data.get('notes', flag.notes)
+        flag.reviewed_by = request.user
+        flag.reviewed_at = timezone.now()
+        flag.save(update_fields=['status', 'notes', 'reviewed_by', 'reviewed_at'])
+        
+        return Response({
+            'success': True,
+            'flag': DuplicateFaceFlagSerializer(flag).data
+        })
 
 
 class FaceRecognitionSettingsViewSet(viewsets.ViewSet):
@@ -360,6 +452,25 @@ class FaceRecognitionSettingsViewSet(viewsets.ViewSet):
         serializer = FaceRecognitionSettingsSerializer(settings)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def runtime(self, request):
+        """
+        Inference pool occupancy, stage latency histograms and log writer
+        counters for this worker process.
+        GET /api/face/settings/runtime/
+        """
+        if request.user.role != 'admin':
+            return Response({
+                'error': 'Only administrators can view runtime metrics'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            'pid': os.getpid(),
+            'pools': get_pool_stats(),
+            'latency': get_latency_stats(),
+            'log_writer': get_log_writer_stats()
+        })
+    
     def update(self, request, pk=None):
         """Update settings."""
         if request.user.role != 'admin':
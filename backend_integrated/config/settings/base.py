@@ -259,6 +259,100 @@ FACE_RECOGNITION_MIN_CONFIDENCE = float(os.getenv('FACE_RECOGNITION_MIN_CONFIDEN
 ENABLE_MULTI_MODEL_RECOGNITION = os.getenv('ENABLE_MULTI_MODEL_RECOGNITION', 'True') == 'True'
 FACE_ENROLLMENT_REQUIRED_ANGLES = int(os.getenv('FACE_ENROLLMENT_REQUIRED_ANGLES', 9))
 
+# Embedding models (FaceData.embedding_version is '<pack>+<deepface model>')
+FACE_INSIGHTFACE_PACK = os.getenv('FACE_INSIGHTFACE_PACK', 'buffalo_l')
+FACE_DEEPFACE_MODEL = os.getenv('FACE_DEEPFACE_MODEL', 'Facenet')
+FACE_EMBEDDING_PREVIOUS_VERSION = os.getenv('FACE_EMBEDDING_PREVIOUS_VERSION', '')  # still matched during a rollover
+
+# Face Embedding Runtime
+FACE_EMBEDDING_WORKERS = int(os.getenv('FACE_EMBEDDING_WORKERS', 2))
+FACE_EMBEDDING_TIMEOUTS = {
+    'insightface': float(os.getenv('FACE_INSIGHTFACE_TIMEOUT', 3.0)),
+    'deepface': float(os.getenv('FACE_DEEPFACE_TIMEOUT', 5.0)),
+}
+FACE_TF_INTRA_OP_THREADS = int(os.getenv('FACE_TF_INTRA_OP_THREADS', 0))  # 0 = TensorFlow default
+
+# ONNX Runtime (InsightFace)
+FACE_INSIGHTFACE_CTX_ID = int(os.getenv('FACE_INSIGHTFACE_CTX_ID', 0))  # -1 = CPU only
+FACE_ONNX_PROVIDERS = [p for p in os.getenv('FACE_ONNX_PROVIDERS', '').split(',') if p]
+FACE_INFERENCE_POOL_SIZE = int(os.getenv('FACE_INFERENCE_POOL_SIZE', 1))  # model replicas per process
+FACE_INFERENCE_POOL_TIMEOUT = float(os.getenv('FACE_INFERENCE_POOL_TIMEOUT', 10.0))  # seconds to wait for a replica
+FACE_ONNX_MODEL_VARIANT = os.getenv('FACE_ONNX_MODEL_VARIANT', 'fp32')  # fp32 or int8
+FACE_ONNX_SESSION_OPTIONS = {
+    'intra_op_num_threads': int(os.getenv('FACE_ONNX_INTRA_OP_THREADS', 0)),  # 0 = ONNX Runtime default
+    'inter_op_num_threads': int(os.getenv('FACE_ONNX_INTER_OP_THREADS', 0)),
+    'execution_mode': os.getenv('FACE_ONNX_EXECUTION_MODE', 'sequential'),  # sequential or parallel
+    'graph_optimization_level': os.getenv('FACE_ONNX_GRAPH_OPTIMIZATION', 'all'),  # disable, basic, extended, all
+    'enable_cpu_mem_arena': os.getenv('FACE_ONNX_CPU_MEM_ARENA', 'True') == 'True',
+    'enable_mem_pattern': os.getenv('FACE_ONNX_MEM_PATTERN', 'True') == 'True',
+}
+
+# Face Gallery (memory-mapped snapshot shared by all workers)
+FACE_GALLERY_DIR = Path(os.getenv('FACE_GALLERY_DIR') or BASE_DIR / 'gallery')
+FACE_GALLERY_REFRESH_SECONDS = int(os.getenv('FACE_GALLERY_REFRESH_SECONDS', 60))  # delta replay interval
+FACE_GALLERY_SNAPSHOT_MIN_INTERVAL = int(os.getenv('FACE_GALLERY_SNAPSHOT_MIN_INTERVAL', 300))  # seconds between rewrites
+FACE_GALLERY_SNAPSHOT_KEEP = int(os.getenv('FACE_GALLERY_SNAPSHOT_KEEP', 2))
+FACE_GALLERY_TOMBSTONE_DAYS = int(os.getenv('FACE_GALLERY_TOMBSTONE_DAYS', 7))  # deleted face data kept for replay
+
+# Duplicate identity check (gallery confidence between two enrolled users)
+FACE_DUPLICATE_THRESHOLD = float(os.getenv('FACE_DUPLICATE_THRESHOLD', 0.85))
+FACE_DUPLICATE_MAX_MATCHES = int(os.getenv('FACE_DUPLICATE_MAX_MATCHES', 5))  # users flagged per enrollment
+
+# Camera streams (frame sampling and face tracking)
+FACE_STREAM_MIN_INTERVAL = int(os.getenv('FACE_STREAM_MIN_INTERVAL', 1))  # frames between detections while identifying
+FACE_STREAM_MAX_INTERVAL = int(os.getenv('FACE_STREAM_MAX_INTERVAL', 8))  # frames between detections when idle
+FACE_STREAM_IOU_THRESHOLD = float(os.getenv('FACE_STREAM_IOU_THRESHOLD', 0.3))
+FACE_STREAM_MAX_MISSES = int(os.getenv('FACE_STREAM_MAX_MISSES', 3))  # sampled frames before a track is dropped
+FACE_STREAM_MIN_HITS = int(os.getenv('FACE_STREAM_MIN_HITS', 2))  # sightings before a track is embedded
+FACE_STREAM_MAX_ATTEMPTS = int(os.getenv('FACE_STREAM_MAX_ATTEMPTS', 3))  # embeddings per unidentified track
+FACE_STREAM_RETRY_FRAMES = int(os.getenv('FACE_STREAM_RETRY_FRAMES', 5))
+FACE_STREAM_MIN_FACE_SIZE = int(os.getenv('FACE_STREAM_MIN_FACE_SIZE', 40))  # pixels
+FACE_STREAM_STATE_TTL = int(os.getenv('FACE_STREAM_STATE_TTL', 600))  # seconds a stream is kept between chunks
+
+# Recognition logs (buffered per process, bulk-inserted by a background thread)
+FACE_LOG_BATCH_SIZE = int(os.getenv('FACE_LOG_BATCH_SIZE', 100))
+FACE_LOG_FLUSH_MS = int(os.getenv('FACE_LOG_FLUSH_MS', 1000))  # max wait before a partial batch is written
+FACE_LOG_MAX_QUEUED = int(os.getenv('FACE_LOG_MAX_QUEUED', 10000))  # optional logs are dropped beyond this
+FACE_LOG_SAMPLE_RATE = float(os.getenv('FACE_LOG_SAMPLE_RATE', 1.0))  # share of attempts logged (attendance logs always kept)
+
+# Face and probe image storage (content-addressed; python manage.py collect_face_files removes unreferenced files)
+FACE_IMAGE_THUMBNAIL_SIZE = int(os.getenv('FACE_IMAGE_THUMBNAIL_SIZE', 96))  # pixels, WebP thumbnails for admin pages
+FACE_IMAGE_THUMBNAIL_QUALITY = int(os.getenv('FACE_IMAGE_THUMBNAIL_QUALITY', 75))
+FACE_STORAGE_GC_GRACE_HOURS = int(os.getenv('FACE_STORAGE_GC_GRACE_HOURS', 24))  # unreferenced files kept this long
+
+# Recognition log retention (python manage.py sweep_recognition_logs)
+FACE_LOG_RETENTION_DAYS = {  # per status, 0 = keep forever; expired logs are rolled up per day first
+    'success': int(os.getenv('FACE_LOG_RETENTION_SUCCESS_DAYS', 365)),
+    'failed': int(os.getenv('FACE_LOG_RETENTION_FAILED_DAYS', 90)),
+    'low_confidence': int(os.getenv('FACE_LOG_RETENTION_LOW_CONFIDENCE_DAYS', 90)),
+    'no_face': int(os.getenv('FACE_LOG_RETENTION_NO_FACE_DAYS', 30)),
+    'multiple_faces': int(os.getenv('FACE_LOG_RETENTION_MULTIPLE_FACES_DAYS', 30)),
+}
+FACE_LOG_IMAGE_COMPACT_DAYS = int(os.getenv('FACE_LOG_IMAGE_COMPACT_DAYS', 14))  # probe images downscaled after this
+FACE_LOG_IMAGE_MAX_SIZE = int(os.getenv('FACE_LOG_IMAGE_MAX_SIZE', 320))  # pixels, longest side
+FACE_LOG_IMAGE_QUALITY = int(os.getenv('FACE_LOG_IMAGE_QUALITY', 70))  # JPEG quality
+FACE_LOG_SWEEP_CHUNK_SIZE = int(os.getenv('FACE_LOG_SWEEP_CHUNK_SIZE', 500))
+FACE_LOG_SWEEP_PAUSE_MS = int(os.getenv('FACE_LOG_SWEEP_PAUSE_MS', 200))  # between chunks
+
+# Attendance session finalization (absentees marked when a session ends)
+ATTENDANCE_FINALIZE_INLINE_LIMIT = int(os.getenv('ATTENDANCE_FINALIZE_INLINE_LIMIT', 300))  # more absentees run in the background
+ATTENDANCE_FINALIZE_CHUNK_SIZE = int(os.getenv('ATTENDANCE_FINALIZE_CHUNK_SIZE', 500))  # records per bulk insert
+ATTENDANCE_FINALIZE_STALE_SECONDS = int(os.getenv('ATTENDANCE_FINALIZE_STALE_SECONDS', 600))  # 'running' without progress, then resumable
+# Write-behind face marks are queued in worker memory: a restart or kill loses what is still
+# queued, and such marks report 'failed' after ATTENDANCE_MARK_QUEUED_DEADLINE so clients retry
+ATTENDANCE_WRITE_BEHIND = os.getenv('ATTENDANCE_WRITE_BEHIND', 'False') == 'True'  # queue face marks, reply 202
+ATTENDANCE_MARK_QUEUED_DEADLINE = int(os.getenv('ATTENDANCE_MARK_QUEUED_DEADLINE', 60))  # seconds
+ATTENDANCE_MARK_MAX_QUEUED = int(os.getenv('ATTENDANCE_MARK_MAX_QUEUED', 5000))  # per process, then written inline
+ATTENDANCE_MARK_STATUS_TTL = int(os.getenv('ATTENDANCE_MARK_STATUS_TTL', 3600))  # seconds a mark status is kept
+# Kiosk offline sync: "device_id:secret,device_id:secret" (bundles are HMAC-SHA256 signed)
+ATTENDANCE_KIOSK_SECRETS = dict(
+    pair.split(':', 1) for pair in os.getenv('ATTENDANCE_KIOSK_SECRETS', '').split(',') if ':' in pair
+)
+ATTENDANCE_KIOSK_MAX_MARKS = int(os.getenv('ATTENDANCE_KIOSK_MAX_MARKS', 200))  # per bundle
+ATTENDANCE_KIOSK_MAX_AGE_HOURS = int(os.getenv('ATTENDANCE_KIOSK_MAX_AGE_HOURS', 72))  # older captures are rejected
+ATTENDANCE_KIOSK_REQUIRE_PROBE = os.getenv('ATTENDANCE_KIOSK_REQUIRE_PROBE', 'True') == 'True'
+ATTENDANCE_ROSTER_CACHE_TTL = int(os.getenv('ATTENDANCE_ROSTER_CACHE_TTL', 3600))  # seconds, capped at 60 on a per-process cache
+
 # File Upload Settings
 MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10485760))  # 10 MB
 ALLOWED_IMAGE_EXTENSIONS = os.getenv('ALLOWED_IMAGE_EXTENSIONS', 'jpg,jpeg,png').split(',')
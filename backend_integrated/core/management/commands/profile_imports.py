@@ -0,0 +1,95 @@
+"""
+Import-time profile of the Django process.
+
+Runs ``python -X importtime`` in a fresh interpreter that sets up Django
+and imports the given modules, then reports wall time, peak memory and the
+most expensive packages. Heavy face-recognition dependencies are flagged.
+
+Usage:
+    python manage.py profile_imports
+    python manage.py profile_imports --module apps.attendance.views --top 30
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Packages that only face-processing code paths should load
+FACE_PACKAGES = ('cv2', 'numpy', 'insightface', 'onnxruntime', 'deepface', 'tensorflow', 'dlib', 'PIL')
+
+PROBE = '''
+import importlib, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print('elapsed', time.perf_counter() - started)
+print('maxrss', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+class Command(BaseCommand):
+    help = 'Profile import time and memory of Django startup plus the given modules'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', action='append', dest='modules',
+            help='Module to import after django.setup() (repeatable, default: ROOT_URLCONF)'
+        )
+        parser.add_argument('--top', type=int, default=20, help='Number of packages to list')
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF]
+
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, *modules],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Import probe failed:\n{result.stderr[-2000:]}")
+
+        summary = dict(line.split() for line in result.stdout.splitlines() if line.startswith(('elapsed', 'maxrss')))
+        self_us = defaultdict(int)
+
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_time, name = self._parse(line)
+            self_us[name.split('.')[0]] += self_time
+
+        self._report(modules, summary, self_us, options['top'])
+
+    @staticmethod
+    def _parse(line):
+        """Parse "import time: <self us> | <cumulative us> | <module>"."""
+        self_time, _, name = line[len('import time:'):].split('|')
+        return int(self_time), name.strip()
+
+    def _report(self, modules, summary, self_us, top):
+        maxrss_kb = int(summary.get('maxrss', 0))
+        if sys.platform == 'darwin':
+            maxrss_kb //= 1024
+
+        self.stdout.write(f"Modules: {', '.join(modules)}")
+        self.stdout.write(f"Startup wall time: {float(summary.get('elapsed', 0)) * 1000:.0f} ms")
+        self.stdout.write(f"Peak RSS: {maxrss_kb / 1024:.1f} MB")
+        self.stdout.write(f"Total import time: {sum(self_us.values()) / 1000:.0f} ms\n")
+
+        self.stdout.write(f"{'package':<30} {'self ms':>10}")
+        for name, micros in sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f"{name:<30} {micros / 1000:>10.1f}")
+
+        loaded = [name for name in FACE_PACKAGES if name in self_us]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"\nFace dependencies loaded: {', '.join(loaded)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNo face dependencies loaded'))